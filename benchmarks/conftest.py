@@ -0,0 +1,29 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.mock_server import MockSigpacServer
+
+FIXTURES_DIR = Path(__file__).parents[1] / "tests" / "fixtures"
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--sigpac-latency",
+        type=float,
+        default=0.0,
+        help="Latency in seconds of the local SIGPAC stand-in",
+    )
+
+
+@pytest.fixture(scope="session")
+def sigpac_server(request):
+    latency = request.config.getoption("--sigpac-latency")
+    with MockSigpacServer(FIXTURES_DIR / "sigpac", latency=latency) as server:
+        yield server
+
+
+@pytest.fixture(scope="session")
+def registries():
+    return json.loads((FIXTURES_DIR / "registries.json").read_text())
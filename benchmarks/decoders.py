@@ -0,0 +1,36 @@
+"""Compares the JSON decoders supported by the transport over the recorded tile fixtures
+
+python benchmarks/decoders.py [--repeat N]
+"""
+
+import argparse
+import timeit
+from pathlib import Path
+
+from sigpac_tools.transport import JSON_DECODERS, available_json_decoders
+
+FIXTURES_DIR = Path(__file__).parents[1] / "tests" / "fixtures" / "sigpac"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50, metavar="INT")
+    args = parser.parse_args()
+
+    decoders = available_json_decoders()
+    print(f"{'fixture':<45} {'size':>9} " + " ".join(f"{d:>10}" for d in decoders))
+    for path in sorted(FIXTURES_DIR.rglob("*.geojson")):
+        content = path.read_bytes()
+        timings = []
+        for name in decoders:
+            decode = JSON_DECODERS[name]()
+            best = min(
+                timeit.repeat(lambda: decode(content), number=1, repeat=args.repeat)
+            )
+            timings.append(f"{best * 1000:>8.2f}ms")
+        name = str(path.relative_to(FIXTURES_DIR))[-45:]
+        print(f"{name:<45} {len(content):>9} " + " ".join(timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""HTTP/2 (cleartext, prior knowledge) variant of the local SIGPAC stand-in, to benchmark the HTTP/2 client
+
+Requires the `h2` library. Requests are answered from the same recorded responses as `MockSigpacServer`, after the same
+latency, and the responses of a connection are multiplexed as they become ready.
+"""
+
+import heapq
+import select
+import socket
+import threading
+import time
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+
+class H2SigpacServer:
+    """Serves the recorded SIGPAC responses over HTTP/2 in a background thread per connection
+
+    Parameters
+    ----------
+    fixtures_dir : str | Path
+        Directory with the recorded responses
+    latency : float
+        Seconds to wait before answering every request
+    """
+
+    def __init__(self, fixtures_dir: str | Path, latency: float = 0.0):
+        self.fixtures_dir = Path(fixtures_dir).resolve()
+        self.latency = latency
+        self._socket = socket.create_server(("127.0.0.1", 0))
+        self._socket.settimeout(0.5)
+        self._thread = None
+        self._running = False
+
+    @property
+    def url(self) -> str:
+        host, port = self._socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def resolve(self, request_path: str) -> Path | None:
+        """Returns the recorded response for the given request path, as `MockSigpacServer.resolve`"""
+        relative = unquote(urlsplit(request_path).path).lstrip("/")
+        path = (self.fixtures_dir / relative).resolve()
+        if not path.is_relative_to(self.fixtures_dir) or not path.is_file():
+            return None
+        return path
+
+    def _accept(self) -> None:
+        while self._running:
+            try:
+                connection, _ = self._socket.accept()
+            except TimeoutError:
+                continue
+            except OSError:
+                return
+            threading.Thread(
+                target=self._serve, args=(connection,), daemon=True
+            ).start()
+
+    def _serve(self, sock: socket.socket) -> None:
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+        scheduled, pending = [], {}
+        with sock:
+            while self._running:
+                timeout = (
+                    max(0.0, scheduled[0][0] - time.monotonic()) if scheduled else 0.5
+                )
+                readable, _, _ = select.select([sock], [], [], timeout)
+                if readable:
+                    data = sock.recv(65535)
+                    if not data:
+                        return
+                    for event in conn.receive_data(data):
+                        if isinstance(event, h2.events.RequestReceived):
+                            path = self.resolve(dict(event.headers)[":path"])
+                            status, body = (
+                                (200, path.read_bytes()) if path else (404, b"null")
+                            )
+                            heapq.heappush(
+                                scheduled,
+                                (
+                                    time.monotonic() + self.latency,
+                                    event.stream_id,
+                                    status,
+                                    body,
+                                ),
+                            )
+                        elif isinstance(event, h2.events.ConnectionTerminated):
+                            return
+
+                while scheduled and scheduled[0][0] <= time.monotonic():
+                    _, stream_id, status, body = heapq.heappop(scheduled)
+                    conn.send_headers(
+                        stream_id,
+                        [
+                            (":status", str(status)),
+                            ("content-type", "application/json"),
+                            ("content-length", str(len(body))),
+                        ],
+                    )
+                    pending[stream_id] = body
+
+                # Send as much of every response as the flow control windows allow
+                for stream_id, body in list(pending.items()):
+                    while body:
+                        size = min(
+                            conn.local_flow_control_window(stream_id),
+                            conn.max_outbound_frame_size,
+                            len(body),
+                        )
+                        if size <= 0:
+                            break
+                        conn.send_data(stream_id, body[:size])
+                        body = body[size:]
+                    if body:
+                        pending[stream_id] = body
+                    else:
+                        conn.end_stream(stream_id)
+                        del pending[stream_id]
+                sock.sendall(conn.data_to_send())
+
+    def __enter__(self) -> "H2SigpacServer":
+        self._running = True
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._running = False
+        self._thread.join()
+        self._socket.close()
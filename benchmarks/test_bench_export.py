@@ -0,0 +1,59 @@
+"""Writing and reading back the features of a tile as indented GeoJSON and as the columnar binary format"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.export import ColumnarReader, write_features
+
+TILE = json.loads(
+    (
+        Path(__file__).parents[1]
+        / "tests"
+        / "fixtures"
+        / "sigpac"
+        / "vectorsdg"
+        / "vector"
+        / "recinto@3857"
+        / "15.15930.20057.geojson"
+    ).read_text()
+)
+
+
+@pytest.fixture
+def features():
+    return TILE["features"] * 20
+
+
+class TestBenchExport:
+    def test_write_geojson(self, benchmark, features, tmp_path):
+        def write():
+            with open(tmp_path / "features.geojson", "w") as f:
+                json.dump(
+                    {"type": "FeatureCollection", "features": features}, f, indent=2
+                )
+
+        benchmark(write)
+
+    def test_write_columnar(self, benchmark, features, tmp_path):
+        benchmark(write_features, tmp_path / "features.sgc", features)
+
+    def test_read_geojson(self, benchmark, features, tmp_path):
+        path = tmp_path / "features.geojson"
+        path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+
+        def read_one():
+            return json.loads(path.read_text())["features"][1000]
+
+        assert benchmark(read_one) == features[1000]
+
+    def test_read_columnar(self, benchmark, features, tmp_path):
+        path = tmp_path / "features.sgc"
+        write_features(path, features)
+
+        def read_one():
+            with ColumnarReader(path) as reader:
+                return reader[1000]
+
+        assert benchmark(read_one) == features[1000]
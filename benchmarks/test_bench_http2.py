@@ -0,0 +1,57 @@
+"""Compares the HTTP/2 client with pooled HTTP/1.1 fetching many tiles concurrently from the local stand-ins
+
+    python -m pytest benchmarks/test_bench_http2.py [--sigpac-latency SECONDS]
+
+The HTTP/2 benchmarks require httpx and h2 (`pip install .[http2]`) and are skipped without them.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.transport import fetch, set_http_client
+
+FIXTURES_DIR = Path(__file__).parents[1] / "tests" / "fixtures" / "sigpac"
+TILE_PATH = "/vectorsdg/vector/recinto@3857/15.15930.20057.geojson"
+CONCURRENCY = 32
+REQUESTS = 256
+
+
+def fetch_many(base_url: str) -> list[int]:
+    with ThreadPoolExecutor(CONCURRENCY) as executor:
+        return [
+            status
+            for status, _, _ in executor.map(fetch, [base_url + TILE_PATH] * REQUESTS)
+        ]
+
+
+@pytest.fixture(autouse=True)
+def reset_client():
+    yield
+    set_http_client("requests")
+
+
+@pytest.fixture(scope="module")
+def h2_server(request):
+    pytest.importorskip("h2")
+    from h2_server import H2SigpacServer
+
+    latency = request.config.getoption("--sigpac-latency")
+    with H2SigpacServer(FIXTURES_DIR, latency=latency) as server:
+        yield server
+
+
+class TestBenchHttpClients:
+    @pytest.mark.parametrize("connections", [4, CONCURRENCY])
+    def test_pooled_http1(self, benchmark, sigpac_server, connections):
+        set_http_client("requests", connections=connections)
+        statuses = benchmark(fetch_many, sigpac_server.url)
+        assert statuses == [200] * REQUESTS
+
+    @pytest.mark.parametrize("connections", [1, 4])
+    def test_http2(self, benchmark, h2_server, connections):
+        pytest.importorskip("httpx")
+        set_http_client("httpx", connections=connections, http1=False)
+        statuses = benchmark(fetch_many, h2_server.url)
+        assert statuses == [200] * REQUESTS
@@ -0,0 +1,44 @@
+"""Per-call logging overhead of the registry validation with the different logging configurations"""
+
+import sys
+
+import pytest
+import structlog
+
+from sigpac_tools import _logging, configure_logging
+from sigpac_tools.utils import validate_cadastral_registry
+
+REGISTRY = "29008A008005720000EQ"
+
+
+@pytest.fixture(autouse=True)
+def restore_logging():
+    """Restores the structlog configuration and the level replaced by `configure_logging` for the next benchmarks"""
+    level = _logging._level
+    config = structlog.get_config()
+    yield
+    _logging._level = level
+    structlog.configure(**config)
+    # The fast configuration caches the loggers assembled under it, drop them so they are assembled again
+    for name, module in list(sys.modules.items()):
+        if name.startswith("sigpac_tools"):
+            logger = getattr(module, "logger", None)
+            if isinstance(logger, _logging._LazyLogger):
+                logger._logger = None
+
+
+class TestBenchLogging:
+    def test_default(self, benchmark, capsys):
+        benchmark(validate_cadastral_registry, REGISTRY)
+
+    def test_fast(self, benchmark, capsys):
+        configure_logging("INFO", fast=True)
+        benchmark(validate_cadastral_registry, REGISTRY)
+
+    def test_fast_warning(self, benchmark):
+        configure_logging("WARNING", fast=True)
+        benchmark(validate_cadastral_registry, REGISTRY)
+
+    def test_off(self, benchmark):
+        configure_logging("OFF")
+        benchmark(validate_cadastral_registry, REGISTRY)
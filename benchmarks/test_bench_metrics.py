@@ -0,0 +1,21 @@
+"""Overhead of the instrumentation with and without hooks registered"""
+
+from sigpac_tools import metrics
+from sigpac_tools.metrics import PrometheusHook
+
+
+def instrumented():
+    with metrics.span("feature.scan", layer="parcela") as span:
+        span.set("features", 1)
+
+
+class TestBenchMetrics:
+    def test_disabled(self, benchmark):
+        benchmark(instrumented)
+
+    def test_prometheus(self, benchmark):
+        hook = metrics.add_hook(PrometheusHook())
+        try:
+            benchmark(instrumented)
+        finally:
+            metrics.remove_hook(hook)
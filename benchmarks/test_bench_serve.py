@@ -0,0 +1,49 @@
+"""End to end benchmarks of the HTTP service against the local SIGPAC stand-in"""
+
+import asyncio
+import threading
+
+import pytest
+import requests
+
+from sigpac_tools.cache import disable_cache
+from sigpac_tools.serve import SigpacService
+
+
+@pytest.fixture(scope="module")
+def service_url(sigpac_server):
+    service = SigpacService(max_workers=8)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(service.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    host, port = server.sockets[0].getsockname()[:2]
+    yield f"http://{host}:{port}"
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    service.close()
+    disable_cache()
+
+
+@pytest.fixture(scope="module")
+def session():
+    with requests.Session() as session:
+        yield session
+
+
+class TestBenchServe:
+    def test_find_warm(self, benchmark, service_url, session, registries):
+        def find():
+            return session.get(
+                f"{service_url}/find", params={"registry": registries[0]}
+            )
+
+        assert benchmark(find).status_code == 200
+
+    def test_geometry_warm(self, benchmark, service_url, session):
+        params = {"layer": "recinto", "lat": 37.384, "lon": -4.98, "reference": 1}
+
+        def geometry():
+            return session.get(f"{service_url}/geometry", params=params)
+
+        assert benchmark(geometry).status_code == 200
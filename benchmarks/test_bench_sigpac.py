@@ -0,0 +1,100 @@
+"""End to end benchmarks against the local SIGPAC stand-in
+
+    python -m pytest benchmarks [--sigpac-latency SECONDS]
+
+Requires pytest-benchmark (`pip install .[bench]`). The reported OPS column is the number of calls per second.
+"""
+
+import pytest
+
+from sigpac_tools.anotate import get_metadata
+from sigpac_tools.archive import TileArchive, build_archive
+from sigpac_tools.cache import configure_cache, disable_cache
+from sigpac_tools.find import find_from_cadastral_registry
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.search import search
+
+pytestmark = pytest.mark.usefixtures("sigpac_server")
+
+
+class TestBenchSearch:
+    def test_provinces(self, benchmark):
+        result = benchmark(search, {"community": 1})
+        assert result["features"]
+
+    def test_parcels_of_polygon(self, benchmark):
+        result = benchmark(search, {"province": 14, "municipality": 48, "polygon": 5})
+        assert result["features"]
+
+
+class TestBenchGetMetadata:
+    @pytest.mark.parametrize("layer", ["parcela", "recinto"])
+    def test_get_metadata(self, benchmark, layer):
+        data = {
+            "province": 14,
+            "municipality": 48,
+            "polygon": 5,
+            "parcel": 1,
+            "enclosure": 1,
+        }
+        assert benchmark(get_metadata, layer, data)
+
+
+class TestBenchGeometryFromCoords:
+    @pytest.mark.parametrize("layer", ["parcela", "recinto"])
+    def test_reference(self, benchmark, layer):
+        assert benchmark(geometry_from_coords, layer, 37.384, -4.98, 1)
+
+    @pytest.mark.parametrize("layer", ["parcela", "recinto"])
+    def test_cached_reference(self, benchmark, layer):
+        configure_cache(["tile"])
+        try:
+            assert benchmark(geometry_from_coords, layer, 37.384, -4.98, 1)
+        finally:
+            disable_cache(["tile"])
+
+    @pytest.mark.parametrize("layer", ["parcela", "recinto"])
+    def test_archived_reference(self, benchmark, tmp_path, layer):
+        path = tmp_path / "tiles.sigpac"
+        build_archive(path, (-4.981, 37.383, -4.975, 37.39), layers=(layer,))
+        with TileArchive(path):
+            assert benchmark(geometry_from_coords, layer, 37.384, -4.98, 1)
+
+    def test_whole_tile(self, benchmark):
+        result = benchmark(geometry_from_coords, "recinto", 37.384, -4.98, None)
+        assert result["features"]
+
+
+class TestBenchFind:
+    def test_find_from_cadastral_registry(self, benchmark, registries):
+        geometry, metadata = benchmark(find_from_cadastral_registry, registries[0])
+        assert geometry and metadata
+
+    def test_find_many(self, benchmark, registries):
+        def find_all():
+            return [find_from_cadastral_registry(registry) for registry in registries]
+
+        assert len(benchmark(find_all)) == len(registries)
+
+
+class TestBenchPipeline:
+    def test_geometries_from_coords(self, benchmark):
+        from sigpac_tools.pipeline import geometries_from_coords
+
+        points = [(37.384, -4.98, reference) for reference in range(1, 145)]
+        results = benchmark(geometries_from_coords, "parcela", points, 4)
+        assert all(results)
+
+
+class TestBenchReverse:
+    def test_references_from_coords(self, benchmark):
+        import random
+
+        from sigpac_tools.reverse import references_from_coords
+
+        rnd = random.Random(0)
+        lats = [rnd.uniform(37.3789, 37.3876) for _ in range(10000)]
+        lons = [rnd.uniform(-4.9878, -4.9768) for _ in range(10000)]
+        references_from_coords(lats, lons)
+        results = benchmark(references_from_coords, lats, lons)
+        assert any(results)
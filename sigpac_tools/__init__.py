@@ -1 +1,5 @@
+from sigpac_tools._logging import configure_logging
+
 __version__ = "1.0.0"
+
+__all__ = ["configure_logging"]
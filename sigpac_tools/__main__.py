@@ -1,11 +1,20 @@
 import argparse
-import structlog
+import contextlib
 
-logger = structlog.get_logger()
+from sigpac_tools._logging import LEVELS, get_logger
+
+logger = get_logger()
 
 
 def get_parser():
     parser = argparse.ArgumentParser(description="SIGPAC Tools")
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Profile the command and write the report (CPU, memory and time per phase) to this JSON file",
+        required=False,
+        metavar="PATH",
+    )
 
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
     subparsers.required = True
@@ -85,6 +94,34 @@ def get_parser():
         required=False,
         metavar="INT",
     )
+    geom_parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="Simplify the geometry to this tolerance in EPSG:3857 units (about 0.72-0.81 m in Spain)",
+        required=False,
+        metavar="FLOAT",
+    )
+    geom_parser.add_argument(
+        "--precision",
+        type=int,
+        help="Round the coordinates to this number of decimals",
+        required=False,
+        metavar="INT",
+    )
+    geom_parser.add_argument(
+        "--zoom",
+        type=int,
+        default=15,
+        help="Zoom level of the tile to search in",
+        metavar="INT",
+    )
+    geom_parser.add_argument(
+        "--archive",
+        type=str,
+        help="Tile archive to resolve the location from, without network access",
+        required=False,
+        metavar="PATH",
+    )
 
     # Get metadata command
 
@@ -157,6 +194,141 @@ def get_parser():
         required=True,
         metavar="STRING",
     )
+    find_parser.add_argument(
+        "--parcel-index",
+        type=str,
+        help="Index of parcel locations to skip the search with, updated with the parcels found",
+        required=False,
+        metavar="PATH",
+    )
+
+    # Serve command
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Serve the SIGPAC tools over a local HTTP API"
+    )
+    serve_parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Host to listen on",
+        metavar="STRING",
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=8080, help="Port to listen on", metavar="INT"
+    )
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="Number of threads running the SIGPAC requests",
+        metavar="INT",
+    )
+    serve_parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=None,
+        help="Maximum number of responses of every cache",
+        metavar="INT",
+    )
+    serve_parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=3600,
+        help="Seconds a cached response is fresh",
+        metavar="FLOAT",
+    )
+    serve_parser.add_argument(
+        "--cache-bundle",
+        type=str,
+        default=None,
+        help="Bundle of cached responses to warm the caches with",
+        metavar="PATH",
+    )
+
+    # Export cache command
+
+    export_cache_parser = subparsers.add_parser(
+        "export-cache",
+        help="Fetch the SIGPAC tiles, searches and metadata of an area and export them as a cache bundle",
+    )
+    export_cache_parser.add_argument(
+        "--bbox",
+        type=float,
+        nargs=4,
+        help="Area to export: min longitude, min latitude, max longitude, max latitude",
+        metavar="FLOAT",
+        required=True,
+    )
+    export_cache_parser.add_argument(
+        "--layers",
+        nargs="+",
+        choices=["parcela", "recinto"],
+        default=["parcela", "recinto"],
+        help="Layers to export",
+        metavar="STRING",
+    )
+    export_cache_parser.add_argument(
+        "--kinds",
+        nargs="+",
+        choices=["tile", "metadata", "search"],
+        default=["tile", "metadata", "search"],
+        help="Kinds of responses to export",
+        metavar="STRING",
+    )
+    export_cache_parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        help="File of the bundle",
+        required=True,
+        metavar="PATH",
+    )
+    export_cache_parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of threads fetching the responses",
+        metavar="INT",
+    )
+
+    # Build tile archive command
+
+    archive_parser = subparsers.add_parser(
+        "build-archive",
+        help="Pack the SIGPAC tiles of an area into an archive for offline use",
+    )
+    archive_parser.add_argument(
+        "--bbox",
+        type=float,
+        nargs=4,
+        help="Area to archive: min longitude, min latitude, max longitude, max latitude",
+        metavar="FLOAT",
+        required=True,
+    )
+    archive_parser.add_argument(
+        "--layers",
+        nargs="+",
+        choices=["parcela", "recinto"],
+        default=["parcela", "recinto"],
+        help="Layers to archive",
+        metavar="STRING",
+    )
+    archive_parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        help="File of the archive",
+        required=True,
+        metavar="PATH",
+    )
+    archive_parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of threads fetching the tiles",
+        metavar="INT",
+    )
 
     return parser
 
@@ -164,6 +336,15 @@ def get_parser():
 def main():
     args, _ = get_parser().parse_known_args()
 
+    if args.profile:
+        from sigpac_tools.profiling import Profiler
+
+        with Profiler(args.profile):
+            return run_command(args)
+    return run_command(args)
+
+
+def run_command(args: argparse.Namespace):
     match args.command:
         case "search":
             from sigpac_tools.search import search
@@ -177,7 +358,8 @@ def main():
                 "parcel": args.parcel,
             }
             search_res = search(data)
-            logger.info(f"Search results:\n{json.dumps(search_res, indent=2)}")
+            if logger.is_enabled_for(LEVELS["INFO"]):
+                logger.info(f"Search results:\n{json.dumps(search_res, indent=2)}")
             return search_res
 
         case "geometry":
@@ -188,10 +370,24 @@ def main():
             lat = args.lat
             lon = args.lon
             reference = args.reference
-            geom = geometry_from_coords(layer, lat, lon, reference)
-            logger.info(
-                f"Geometry for coords ({lat}, {lon}):\n{json.dumps(geom, indent=2)}"
-            )
+            with contextlib.ExitStack() as stack:
+                if args.archive:
+                    from sigpac_tools.archive import TileArchive
+
+                    stack.enter_context(TileArchive(args.archive))
+                geom = geometry_from_coords(
+                    layer,
+                    lat,
+                    lon,
+                    reference,
+                    tolerance=args.tolerance,
+                    precision=args.precision,
+                    zoom=args.zoom,
+                )
+            if logger.is_enabled_for(LEVELS["INFO"]):
+                logger.info(
+                    f"Geometry for coords ({lat}, {lon}):\n{json.dumps(geom, indent=2)}"
+                )
             return geom
 
         case "get-metadata":
@@ -209,21 +405,56 @@ def main():
                 "enclosure": args.enclosure,
             }
             metadata = get_metadata(layer, data)
-            logger.info(f"Metadata:\n{json.dumps(metadata, indent=2)}")
+            if logger.is_enabled_for(LEVELS["INFO"]):
+                logger.info(f"Metadata:\n{json.dumps(metadata, indent=2)}")
             return metadata
         case "find":
             from sigpac_tools.find import find_from_cadastral_registry
             import json
 
             registry = args.registry
-            geom, metadata = find_from_cadastral_registry(registry)
-            logger.info(
-                f"Geometry for cadastral registry {registry}:\n{json.dumps(geom, indent=2)}"
+            with contextlib.ExitStack() as stack:
+                if args.parcel_index:
+                    from sigpac_tools.parcel_index import ParcelIndex
+
+                    stack.enter_context(ParcelIndex(args.parcel_index))
+                geom, metadata = find_from_cadastral_registry(registry)
+            if logger.is_enabled_for(LEVELS["INFO"]):
+                logger.info(
+                    f"Geometry for cadastral registry {registry}:\n{json.dumps(geom, indent=2)}"
+                )
+                logger.info(
+                    f"Metadata for cadastral registry {registry}:\n{json.dumps(metadata, indent=2)}"
+                )
+            return geom, metadata
+        case "build-archive":
+            from sigpac_tools.archive import build_archive
+
+            return build_archive(
+                args.output,
+                tuple(args.bbox),
+                layers=tuple(args.layers),
+                workers=args.workers,
             )
-            logger.info(
-                f"Metadata for cadastral registry {registry}:\n{json.dumps(metadata, indent=2)}"
+        case "export-cache":
+            from sigpac_tools.bundle import export_bundle, warm_caches
+
+            bbox = tuple(args.bbox)
+            warm_caches(
+                bbox, args.kinds, layers=tuple(args.layers), workers=args.workers
+            )
+            return export_bundle(args.output, kinds=args.kinds, bbox=bbox)
+        case "serve":
+            from sigpac_tools.serve import serve
+
+            serve(
+                host=args.host,
+                port=args.port,
+                max_workers=args.workers,
+                cache_size=args.cache_size,
+                cache_ttl=args.cache_ttl,
+                cache_bundle=args.cache_bundle,
             )
-            return geom, metadata
         case _:
             raise ValueError("Invalid command")
 
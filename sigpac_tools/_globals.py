@@ -1,5 +1,7 @@
-# URL from SIGPAC service
-BASE_URL = "https://sigpac.mapa.gob.es"
+import os
+
+# URL from SIGPAC service. It can be overridden with the SIGPAC_BASE_URL environment variable (e.g. to use a local stand-in server)
+BASE_URL = os.environ.get("SIGPAC_BASE_URL", "https://sigpac.mapa.gob.es")
 
 
 # Provinces divided into communities
@@ -0,0 +1,132 @@
+import os
+
+# Same values as the standard library logging levels
+LEVELS = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+    "OFF": 100,
+}
+
+# Events below this level are dropped before reaching structlog
+_level = LEVELS.get(
+    os.environ.get("SIGPAC_LOG_LEVEL", "DEBUG").upper(), LEVELS["DEBUG"]
+)
+
+
+class _LazyLogger:
+    """Logger proxy that defers the import of structlog until the first log call
+
+    Events under the configured level are dropped by the proxy itself, so they cost a comparison. Events should be passed as a
+    constant message plus key-value pairs (`logger.info("Tile fetched", x=x, y=y)`), which structlog only renders when emitted.
+    """
+
+    __slots__ = ("_name", "_logger")
+
+    def __init__(self, name: str | None = None):
+        self._name = name
+        self._logger = None
+
+    def _get(self):
+        if self._logger is None:
+            import structlog
+
+            self._logger = structlog.get_logger(self._name)
+        return self._logger
+
+    def is_enabled_for(self, level: int) -> bool:
+        """Returns whether events of the given level are emitted. Use it to guard events whose values are expensive to compute"""
+        return level >= _level
+
+    def debug(self, event: str, **kw) -> None:
+        if _level <= 10:
+            self._get().debug(event, **kw)
+
+    def info(self, event: str, **kw) -> None:
+        if _level <= 20:
+            self._get().info(event, **kw)
+
+    def warning(self, event: str, **kw) -> None:
+        if _level <= 30:
+            self._get().warning(event, **kw)
+
+    def error(self, event: str, **kw) -> None:
+        if _level <= 40:
+            self._get().error(event, **kw)
+
+    def exception(self, event: str, **kw) -> None:
+        if _level <= 40:
+            self._get().exception(event, **kw)
+
+    def critical(self, event: str, **kw) -> None:
+        if _level <= 50:
+            self._get().critical(event, **kw)
+
+    def __getattr__(self, attr: str):
+        return getattr(self._get(), attr)
+
+
+def get_logger(name: str | None = None) -> _LazyLogger:
+    """Returns a logger that only imports and configures structlog when it is first used
+
+    Parameters
+    ----------
+    name : str | None
+        Name of the logger
+
+    Returns
+    -------
+    _LazyLogger
+        Proxy to the structlog logger
+    """
+    return _LazyLogger(name)
+
+
+def configure_logging(level: str | int = "INFO", fast: bool = False) -> None:
+    """Configures the logging of `sigpac_tools`
+
+    Parameters
+    ----------
+    level : str | int
+        Minimum level of the emitted events ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL" or "OFF").
+        With "OFF" every event is dropped by the logger proxies and structlog is never imported, which is the cheapest setting for bulk runs.
+        The level can also be set with the SIGPAC_LOG_LEVEL environment variable
+    fast : bool
+        If `True`, structlog is configured with a cached logger that filters by level and renders plain key-value lines,
+        avoiding the per-call processing of the default development configuration. This replaces the global structlog configuration
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    KeyError
+        If the level is not supported
+    """
+    global _level
+
+    if isinstance(level, str):
+        if level.upper() not in LEVELS:
+            raise KeyError(
+                f"Logging level not supported. Supported levels: {list(LEVELS)}"
+            )
+        level = LEVELS[level.upper()]
+    _level = level
+
+    if fast and level < LEVELS["OFF"]:
+        import structlog
+
+        structlog.configure(
+            processors=[
+                structlog.processors.add_log_level,
+                structlog.processors.KeyValueRenderer(
+                    key_order=["level", "event"], drop_missing=True
+                ),
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(level),
+            logger_factory=structlog.PrintLoggerFactory(),
+            cache_logger_on_first_use=True,
+        )
@@ -1,9 +1,8 @@
-import requests
-import structlog
+from sigpac_tools import _globals, metrics
+from sigpac_tools._logging import get_logger
+from sigpac_tools.transport import get_json
 
-from sigpac_tools._globals import BASE_URL
-
-logger = structlog.get_logger()
+logger = get_logger()
 
 
 def __query(
@@ -59,12 +58,12 @@ def __query(
             raise KeyError(
                 "Layer not supported. Supported layers: ['parcela', 'recinto']"
             )
-    
-    url = f"{BASE_URL}/fega/serviciosvisorsigpac/layerinfo/{layer}/{id}"
-    response = requests.get(url)
-    return response.json()
+
+    url = f"{_globals.BASE_URL}/fega/serviciosvisorsigpac/layerinfo/{layer}/{id}"
+    return get_json(url)
 
 
+@metrics.timed("anotate")
 def get_metadata(layer: str, data: dict):
     """Get the metadata of the given location from the SIGPAC database
 
@@ -115,7 +114,11 @@ def get_metadata(layer: str, data: dict):
         raise ValueError("Enclosure not specified")
 
     logger.info(
-        f"Searching for the metadata of the location (province {prov}, municipality {muni}, polygon {polg}, parcel {parc}) in the SIGPAC database..."
+        "Searching for the metadata of the location in the SIGPAC database",
+        province=prov,
+        municipality=muni,
+        polygon=polg,
+        parcel=parc,
     )
 
     res = __query(
@@ -134,6 +137,12 @@ def get_metadata(layer: str, data: dict):
         )
     else:
         logger.info(
-            f"Metadata of the location (province {prov}, municipality {muni}, polygon {polg}, parcel {parc}{f', enclosure {encl}' if layer == 'recinto' else ''}) found in the SIGPAC database."
+            "Metadata of the location found in the SIGPAC database",
+            layer=layer,
+            province=prov,
+            municipality=muni,
+            polygon=polg,
+            parcel=parc,
+            enclosure=encl,
         )
     return res
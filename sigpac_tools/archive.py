@@ -0,0 +1,305 @@
+"""Packed archive of SIGPAC vector tiles for offline lookups
+
+An archive covers a rectangle of tiles of one zoom level for one or more layers. The file starts with a header, followed by
+a dense index with the (offset, length) of every tile of every layer as little-endian uint64 pairs, and by the tile bodies.
+
+- header: magic `SIGPACT1`, version (uint16), zoom (uint8), flags (uint8, 1 if the bodies are zlib compressed), x_min,
+  y_min, width and height of the tile rectangle (uint32) and the length of the layer names (uint32), followed by the layer
+  names as a JSON list padded to a multiple of 8 bytes
+- index: entry `(layer * height + (y - y_min)) * width + (x - x_min)` holds the tile (x, y) of the layer. A length of 0
+  marks a tile that is not in the archive
+
+Tiles are looked up in O(1) from the memory-mapped index, without opening a file per tile.
+"""
+
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from sigpac_tools import _globals, metrics, transport
+from sigpac_tools._logging import get_logger
+from sigpac_tools.utils import lng_lat_to_tile
+
+logger = get_logger()
+
+MAGIC = b"SIGPACT1"
+VERSION = 1
+
+# Zoom level of the SIGPAC vector tiles
+ZOOM = 15
+
+_HEADER = struct.Struct("<8sHBBIIIII")
+_COMPRESSED = 1
+_TILE_URL = re.compile(r"/vectorsdg/vector/(\w+)@3857/(\d+)\.(\d+)\.(\d+)\.geojson$")
+
+
+def tile_range(
+    bbox: tuple[float, float, float, float], zoom: int = ZOOM
+) -> tuple[int, int, int, int]:
+    """Returns the tiles that cover the given bounding box
+
+    Parameters
+    ----------
+    bbox : tuple[float, float, float, float]
+        (min longitude, min latitude, max longitude, max latitude) of the area
+    zoom : int
+        Zoom level of the tiles
+
+    Returns
+    -------
+    tuple[int, int, int, int]
+        (x_min, y_min, x_max, y_max) of the tiles, inclusive
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError(
+            "The bounding box must be (min lon, min lat, max lon, max lat)"
+        )
+    x_min, y_min = lng_lat_to_tile(min_lon, min_lat, zoom)
+    x_max, y_max = lng_lat_to_tile(max_lon, max_lat, zoom)
+    return x_min, y_min, x_max, y_max
+
+
+def build_archive(
+    path: str | Path,
+    bbox: tuple[float, float, float, float],
+    layers: tuple[str, ...] = ("parcela", "recinto"),
+    workers: int = 8,
+    compress: bool = True,
+) -> dict:
+    """Fetches every tile of the given area and packs them into an archive
+
+    Tiles are fetched with `transport.get_content`, so they are taken from the caches when these are enabled. At most
+    `2 * workers` tiles are in flight, and every tile is written as soon as it arrives, so memory does not grow with the
+    area. Tiles that do not exist in SIGPAC, or whose body is not a valid tile, are left out of the archive.
+
+    Parameters
+    ----------
+    path : str | Path
+        File of the archive. It is replaced once the archive is complete
+    bbox : tuple[float, float, float, float]
+        (min longitude, min latitude, max longitude, max latitude) of the area
+    layers : tuple[str, ...]
+        Layers to archive ("parcela", "recinto")
+    workers : int
+        Number of threads fetching the tiles
+    compress : bool
+        If `True`, tile bodies are compressed with zlib
+
+    Returns
+    -------
+    dict
+        Number of "tiles" in the archive, "missing" tiles and "bytes" of the archive
+    """
+    for layer in layers:
+        if layer not in ("parcela", "recinto"):
+            raise KeyError(
+                f'Layer "{layer}" not supported. Supported layers: "parcela", "recinto"'
+            )
+    x_min, y_min, x_max, y_max = tile_range(bbox)
+    width, height = x_max - x_min + 1, y_max - y_min + 1
+    names = json.dumps(list(layers)).encode()
+    names += b" " * (-len(names) % 8)
+    index = array("Q", bytes(16 * width * height * len(layers)))
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        ZOOM,
+        _COMPRESSED if compress else 0,
+        x_min,
+        y_min,
+        width,
+        height,
+        len(names),
+    )
+    header += b"\0" * (-len(header) % 8)
+
+    base_url = _globals.BASE_URL
+
+    def fetch(cell: tuple[int, str, int, int]) -> tuple[int, bytes | None]:
+        i, layer, x, y = cell
+        with transport.priority("bulk"):
+            content = transport.get_content(
+                f"{base_url}/vectorsdg/vector/{layer}@3857/{ZOOM}.{x}.{y}.geojson"
+            )
+        try:
+            tile = transport.decode_json(content) if content else None
+        except Exception as e:
+            logger.warning(
+                "Undecodable tile left out of the archive",
+                layer=layer,
+                x=x,
+                y=y,
+                error=str(e),
+            )
+            return i, None
+        if not isinstance(tile, dict) or "features" not in tile:
+            return i, None
+        return i, zlib.compress(content) if compress else content
+
+    cells = (
+        ((li * height + (y - y_min)) * width + (x - x_min), layer, x, y)
+        for li, layer in enumerate(layers)
+        for y in range(y_min, y_max + 1)
+        for x in range(x_min, x_max + 1)
+    )
+    total = width * height * len(layers)
+    path = Path(path)
+    temporary = path.with_name(path.name + ".tmp")
+    tiles = 0
+
+    def write(futures) -> None:
+        nonlocal tiles
+        for future in futures:
+            i, body = future.result()
+            if body is None:
+                continue
+            index[2 * i], index[2 * i + 1] = f.tell(), len(body)
+            f.write(body)
+            tiles += 1
+
+    with metrics.span("archive.build", tiles=total):
+        with open(temporary, "wb") as f, ThreadPoolExecutor(workers) as executor:
+            f.write(header + names)
+            index_offset = f.tell()
+            f.write(index.tobytes())
+            pending = set()
+            for cell in cells:
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    write(done)
+                pending.add(executor.submit(fetch, cell))
+            write(pending)
+            f.seek(index_offset)
+            if sys.byteorder == "big":
+                index.byteswap()
+            f.write(index.tobytes())
+        os.replace(temporary, path)
+
+    summary = {
+        "tiles": tiles,
+        "missing": total - tiles,
+        "bytes": path.stat().st_size,
+    }
+    logger.info("Tile archive built", path=str(path), **summary)
+    return summary
+
+
+class TileArchive:
+    """Memory-mapped reader of the tile archives written by `build_archive`
+
+    Used as a context manager, the archive is registered as a source of `transport` until the block exits, so that
+    `geometry_from_coords` resolves the tiles it holds without network access:
+
+        with TileArchive("andalucia.tiles"):
+            geometry_from_coords("parcela", 37.384, -4.98, 1)
+
+    Parameters
+    ----------
+    path : str | Path
+        File of the archive
+
+    Raises
+    ------
+    ValueError
+        If the file is not a tile archive
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size or self._mmap[:8] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a SIGPAC tile archive")
+        (
+            _,
+            version,
+            self.zoom,
+            flags,
+            self.x_min,
+            self.y_min,
+            self.width,
+            self.height,
+            names_length,
+        ) = _HEADER.unpack_from(self._mmap)
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Tile archive version {version} not supported")
+        self.compressed = bool(flags & _COMPRESSED)
+        start = _HEADER.size + (-_HEADER.size % 8)
+        self.layers = json.loads(self._mmap[start : start + names_length])
+        index_offset = start + names_length
+        cells = self.width * self.height * len(self.layers)
+        if sys.byteorder == "big":
+            self._index = array(
+                "Q", self._mmap[index_offset : index_offset + 16 * cells]
+            )
+            self._index.byteswap()
+        else:
+            self._index = memoryview(self._mmap)[
+                index_offset : index_offset + 16 * cells
+            ].cast("Q")
+
+    def get(self, layer: str, x: int, y: int) -> bytes | None:
+        """Returns the raw GeoJSON body of the tile, `None` if it is not in the archive
+
+        Parameters
+        ----------
+        layer : str
+            Layer of the tile ("parcela", "recinto")
+        x : int
+            X coordinate of the tile
+        y : int
+            Y coordinate of the tile
+
+        Returns
+        -------
+        bytes | None
+            Raw body of the tile
+        """
+        if layer not in self.layers:
+            return None
+        column, row = x - self.x_min, y - self.y_min
+        if not (0 <= column < self.width and 0 <= row < self.height):
+            return None
+        i = (self.layers.index(layer) * self.height + row) * self.width + column
+        offset, length = self._index[2 * i], self._index[2 * i + 1]
+        if not length:
+            return None
+        body = self._mmap[offset : offset + length]
+        return zlib.decompress(body) if self.compressed else body
+
+    def lookup(self, url: str) -> bytes | None:
+        """Returns the body of the tile requested by the given SIGPAC URL, `None` if the URL is not a tile of the archive"""
+        match = _TILE_URL.search(url)
+        if match is None or int(match[2]) != self.zoom:
+            return None
+        return self.get(match[1], int(match[3]), int(match[4]))
+
+    def __contains__(self, tile: tuple[str, int, int]) -> bool:
+        layer, x, y = tile
+        return self.get(layer, x, y) is not None
+
+    def close(self) -> None:
+        """Closes the archive"""
+        index = getattr(self, "_index", None)
+        if isinstance(index, memoryview):
+            index.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "TileArchive":
+        transport.add_source(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        transport.remove_source(self)
+        self.close()
@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sigpac_tools import _globals, metrics, transport
+from sigpac_tools._logging import get_logger
+from sigpac_tools.archive import ZOOM, tile_range
+from sigpac_tools.models import geojson_rings
+from sigpac_tools.reverse import REFERENCE_KEYS
+from sigpac_tools.utils import tile_bounds, transform_coords
+
+logger = get_logger()
+
+# Coarsest zoom level tried by `features_in_area`
+MIN_ZOOM = 12
+
+
+def _fetch_tile(layer: str, tile: tuple[int, int, int]) -> list[dict] | None:
+    """Returns the features of the tile, `None` if the service does not serve it"""
+    zoom, x, y = tile
+    url = f"{_globals.BASE_URL}/vectorsdg/vector/{layer}@3857/{zoom}.{x}.{y}.geojson"
+    with transport.priority("bulk"):
+        content = transport.get_content(url)
+    collection = transport.decode_json(content) if content else None
+    if not isinstance(collection, dict) or "features" not in collection:
+        return None
+    return collection["features"]
+
+
+def _children(
+    tile: tuple[int, int, int], bbox: tuple[float, float, float, float]
+) -> list[tuple[int, int, int]]:
+    """Returns the tiles of the next zoom level inside the tile that cover the bounding box"""
+    zoom, x, y = tile
+    x_min, y_min, x_max, y_max = tile_range(bbox, zoom + 1)
+    return [
+        (zoom + 1, cx, cy)
+        for cy in range(max(2 * y, y_min), min(2 * y + 1, y_max) + 1)
+        for cx in range(max(2 * x, x_min), min(2 * x + 1, x_max) + 1)
+    ]
+
+
+def _is_clipped(feature: dict, bounds: tuple[float, float, float, float]) -> bool:
+    """Returns whether the feature goes beyond the bounds of its tile, so the tile only has part of it"""
+    for ring in geojson_rings(feature["geometry"]):
+        for x, y, *_ in ring:
+            if x < bounds[0] or x > bounds[2] or y < bounds[1] or y > bounds[3]:
+                return True
+    return False
+
+
+def _merge(pieces: list[dict]) -> dict:
+    """Joins the pieces of a feature clipped by several tiles into a MultiPolygon feature"""
+    polygons = []
+    for piece in pieces:
+        geometry = piece["geometry"]
+        if geometry["type"] == "MultiPolygon":
+            polygons.extend(geometry["coordinates"])
+        else:
+            polygons.append(geometry["coordinates"])
+    return {
+        "type": "Feature",
+        "properties": pieces[0]["properties"],
+        "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+    }
+
+
+@metrics.timed("area")
+def features_in_area(
+    layer: str,
+    bbox: tuple[float, float, float, float],
+    min_zoom: int = MIN_ZOOM,
+    max_zoom: int = ZOOM,
+    max_features: int | None = None,
+    precision: int | None = None,
+    workers: int = 8,
+) -> dict:
+    """Gets every feature of the layer in the given area, with as few tile requests as possible
+
+    The area is covered with the tiles of `min_zoom`, and every tile that the service does not serve complete is replaced by
+    its four children of the next zoom level, up to `max_zoom`. A tile is incomplete if the service does not serve it at
+    that zoom level or if it has `max_features` features or more, as the service may leave features out of crowded tiles. The
+    tiles of every zoom level are fetched concurrently.
+
+    Features are clipped to the bounds of every tile, so the features crossing the border of a tile are taken from a tile
+    that has them whole when there is one, and otherwise their pieces are joined into a MultiPolygon.
+
+    Parameters
+    ----------
+    layer : str
+        Layer to get the features from ("parcela", "recinto")
+    bbox : tuple[float, float, float, float]
+        (min longitude, min latitude, max longitude, max latitude) of the area
+    min_zoom : int
+        Coarsest zoom level tried
+    max_zoom : int
+        Finest zoom level, whose tiles are used as they are
+    max_features : int | None
+        If set, tiles with this number of features or more are considered truncated
+    precision : int | None
+        If set, the coordinates are rounded to this number of decimals
+    workers : int
+        Number of threads fetching the tiles
+
+    Returns
+    -------
+    dict
+        GeoJSON FeatureCollection in EPSG:4326 with the features of every tile intersecting the area, once per reference
+
+    Raises
+    ------
+    ValueError
+        If the zoom levels or the bounding box are not valid
+    KeyError
+        If the layer is not supported
+    """
+    if layer not in ["parcela", "recinto"]:
+        raise KeyError(
+            f'Layer "{layer}" not supported. Supported layers: "parcela", "recinto"'
+        )
+    if not 0 < min_zoom <= max_zoom:
+        raise ValueError("The zoom levels must be 0 < min_zoom <= max_zoom")
+
+    x_min, y_min, x_max, y_max = tile_range(bbox, min_zoom)
+    pending = [
+        (min_zoom, x, y)
+        for y in range(y_min, y_max + 1)
+        for x in range(x_min, x_max + 1)
+    ]
+    complete, pieces = {}, {}
+    requests = {}
+    with ThreadPoolExecutor(workers) as executor:
+        while pending:
+            zoom = pending[0][0]
+            requests[zoom] = len(pending)
+            with metrics.span("area.fetch", zoom=zoom, tiles=len(pending)):
+                results = list(
+                    executor.map(lambda tile: _fetch_tile(layer, tile), pending)
+                )
+            refine = []
+            for tile, features in zip(pending, results):
+                truncated = features is None or (
+                    max_features is not None and len(features) >= max_features
+                )
+                if truncated and zoom < max_zoom:
+                    refine.extend(_children(tile, bbox))
+                    continue
+                if features is None:
+                    logger.warning("Tile not found", zoom=zoom, x=tile[1], y=tile[2])
+                    continue
+                bounds = tile_bounds(tile[1], tile[2], zoom)
+                for feature in features:
+                    if not feature.get("geometry"):
+                        continue
+                    properties = feature["properties"]
+                    key = tuple(properties.get(k) for k in REFERENCE_KEYS)
+                    if _is_clipped(feature, bounds):
+                        pieces.setdefault(key, []).append(feature)
+                    else:
+                        complete[key] = feature
+            pending = refine
+
+    with metrics.span("reprojection", layer=layer):
+        features = list(complete.values())
+        for key, clipped in pieces.items():
+            if key not in complete:
+                features.append(clipped[0] if len(clipped) == 1 else _merge(clipped))
+        for feature in features:
+            geometry = feature["geometry"]
+            polygons = (
+                geometry["coordinates"]
+                if geometry["type"] == "MultiPolygon"
+                else [geometry["coordinates"]]
+            )
+            for polygon in polygons:
+                transform_coords(
+                    {"geometry": {"coordinates": polygon}}, "epsg:4326", None, precision
+                )
+            geometry["CRS"] = "epsg:4326"
+
+    logger.info(
+        "Area features found",
+        layer=layer,
+        features=len(features),
+        requests=sum(requests.values()),
+        requests_by_zoom=requests,
+    )
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,270 @@
+"""Memory-bounded batch execution
+
+Batch results are kept by position in a `SpillBuffer`. Past its memory budget, the buffered results are sorted by position
+and written to a temporary segment file, and the results are read back in order by merging the segments, holding a single
+result of every segment in memory. A segment is a gzip stream of records, each one the position (uint64) and length (uint32)
+of the result, little-endian, followed by the result serialized with `pickle`.
+"""
+
+import gzip
+import heapq
+import os
+import pickle
+import struct
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from sigpac_tools import metrics
+from sigpac_tools._logging import get_logger
+from sigpac_tools.transport import priority
+
+logger = get_logger()
+
+# Bytes of serialized results held in memory by default before spilling them to disk
+DEFAULT_MEMORY_BUDGET = 64 * 2**20
+
+_RECORD = struct.Struct("<QI")
+
+# Estimated bytes taken by every buffered result besides its serialized value
+_ENTRY_OVERHEAD = 96
+
+
+def _read_segment(path: Path) -> Iterator[tuple[int, bytes]]:
+    with gzip.open(path, "rb") as f:
+        while header := f.read(_RECORD.size):
+            index, length = _RECORD.unpack(header)
+            yield index, f.read(length)
+
+
+class SpillBuffer:
+    """Results of a batch by position, held in memory up to a budget and spilled to temporary segment files beyond it
+
+    Results can be stored in any order and are iterated in the order of their positions, with `None` for the positions
+    that were not stored.
+
+    Parameters
+    ----------
+    memory_budget : int
+        Bytes of serialized results held in memory before they are spilled to disk
+    directory : str | Path | None
+        Directory of the temporary segment files, the system temporary directory by default
+    """
+
+    def __init__(
+        self,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        directory: str | Path | None = None,
+    ):
+        if memory_budget <= 0:
+            raise ValueError("The memory budget must be positive")
+        self.memory_budget = memory_budget
+        self.directory = directory
+        self.segments = []
+        self.spilled_bytes = 0
+        self._buffer = {}
+        self._size = 0
+        self._length = 0
+        self._lock = threading.Lock()
+
+    def __setitem__(self, index: int, value: Any) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            previous = self._buffer.pop(index, None)
+            if previous is not None:
+                self._size -= len(previous) + _ENTRY_OVERHEAD
+            self._buffer[index] = data
+            self._size += len(data) + _ENTRY_OVERHEAD
+            self._length = max(self._length, index + 1)
+            if self._size > self.memory_budget:
+                self._spill()
+
+    def _spill(self) -> None:
+        """Writes the buffered results to a new segment, sorted by position"""
+        with metrics.span("batch.spill", results=len(self._buffer)):
+            descriptor, name = tempfile.mkstemp(
+                prefix="sigpac-", suffix=".spill", dir=self.directory
+            )
+            os.close(descriptor)
+            path = Path(name)
+            with gzip.open(path, "wb", compresslevel=1) as f:
+                for index in sorted(self._buffer):
+                    data = self._buffer[index]
+                    f.write(_RECORD.pack(index, len(data)))
+                    f.write(data)
+            self.segments.append(path)
+            self.spilled_bytes += path.stat().st_size
+            metrics.increment("batch.spilled", len(self._buffer))
+            self._buffer = {}
+            self._size = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Any]:
+        with self._lock:
+            buffered = sorted(self._buffer.items())
+            segments = list(self.segments)
+            length = self._length
+        expected = 0
+        # Newest first, so that the last value stored for a position comes first among the equal positions
+        runs = [buffered, *(_read_segment(path) for path in reversed(segments))]
+        for index, data in heapq.merge(*runs, key=lambda record: record[0]):
+            if index < expected:
+                continue
+            while expected < index:
+                yield None
+                expected += 1
+            yield pickle.loads(data)
+            expected += 1
+        while expected < length:
+            yield None
+            expected += 1
+
+    def close(self) -> None:
+        """Removes the segment files"""
+        for path in self.segments:
+            path.unlink(missing_ok=True)
+        self.segments = []
+        self._buffer = {}
+        self._size = 0
+
+    def __enter__(self) -> "SpillBuffer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def run_batch(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    workers: int = 8,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    directory: str | Path | None = None,
+) -> Iterator[Any]:
+    """Applies the function to every item concurrently and yields the results in the order of the items
+
+    At most `2 * workers` items are in flight, results are kept in a `SpillBuffer` and streamed from it once every item is
+    done, and the segment files are removed when the generator finishes or is closed. The SIGPAC requests of the function
+    run with the "bulk" priority (see `transport.set_concurrency`). Items whose function raises an exception are logged
+    and yield `None`.
+
+    Parameters
+    ----------
+    func : Callable[[Any], Any]
+        Function applied to every item. Its results must be serializable with `pickle`
+    items : Iterable[Any]
+        Items of the batch, consumed lazily
+    workers : int
+        Number of threads running the function
+    memory_budget : int
+        Bytes of results held in memory before they are spilled to disk
+    directory : str | Path | None
+        Directory of the temporary segment files
+
+    Yields
+    ------
+    Any
+        Result of every item, in order
+    """
+
+    def call(item: Any) -> Any:
+        with priority("bulk"):
+            return func(item)
+
+    buffer = SpillBuffer(memory_budget, directory)
+    summary = {"items": 0, "failed": 0}
+    try:
+        executor = ThreadPoolExecutor(workers, thread_name_prefix="sigpac-batch")
+        with metrics.span("batch", workers=workers) as span, executor:
+            pending = {}
+            for index, item in enumerate(items):
+                if len(pending) >= 2 * workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _store(buffer, pending.pop(future), future, summary)
+                pending[executor.submit(call, item)] = (index, item)
+            for future in list(pending):
+                _store(buffer, pending.pop(future), future, summary)
+            span.set("items", summary["items"])
+            span.set("segments", len(buffer.segments))
+        logger.info(
+            "Batch done",
+            segments=len(buffer.segments),
+            spilled_bytes=buffer.spilled_bytes,
+            **summary,
+        )
+        yield from buffer
+    finally:
+        buffer.close()
+
+
+def _store(buffer: SpillBuffer, entry: tuple, future, summary: dict) -> None:
+    index, item = entry
+    summary["items"] += 1
+    try:
+        buffer[index] = future.result()
+    except Exception as e:
+        logger.warning("Batch item failed", item=item, error=str(e))
+        summary["failed"] += 1
+        buffer[index] = None
+
+
+def metadata_batch(
+    layer: str,
+    records: Iterable[dict],
+    workers: int = 8,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> Iterator[dict | None]:
+    """Gets the metadata of many locations with `anotate.get_metadata`, see `run_batch`
+
+    Parameters
+    ----------
+    layer : str
+        Layer to search from ("parcela", "recinto")
+    records : Iterable[dict]
+        Data of every location, as passed to `get_metadata`
+    workers : int
+        Number of concurrent requests
+    memory_budget : int
+        Bytes of results held in memory before they are spilled to disk
+
+    Yields
+    ------
+    dict | None
+        Metadata of every location, in order. `None` for the locations that failed
+    """
+    from sigpac_tools.anotate import get_metadata
+
+    return run_batch(
+        lambda data: get_metadata(layer, data), records, workers, memory_budget
+    )
+
+
+def find_batch(
+    registries: Iterable[str],
+    workers: int = 8,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> Iterator[tuple[dict, dict] | None]:
+    """Resolves many cadastral registries with `find.find_from_cadastral_registry`, see `run_batch`
+
+    Parameters
+    ----------
+    registries : Iterable[str]
+        Cadastral registries to resolve
+    workers : int
+        Number of concurrent lookups
+    memory_budget : int
+        Bytes of results held in memory before they are spilled to disk
+
+    Yields
+    ------
+    tuple[dict, dict] | None
+        Geometry and metadata of every registry, in order. `None` for the registries not found or not valid
+    """
+    from sigpac_tools.find import find_from_cadastral_registry
+
+    return run_batch(find_from_cadastral_registry, registries, workers, memory_budget)
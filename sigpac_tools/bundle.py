@@ -0,0 +1,448 @@
+"""Bundles of cached SIGPAC responses, to warm start the caches of new processes
+
+A bundle holds the entries of the tile, search and metadata caches in a single file:
+
+- header: magic `SIGPACB1`, version (uint16), creation timestamp (float64), length of the index (uint64) and BLAKE2b-256
+  digest of the index
+- index: zlib compressed JSON list with the kind, the path (the URL without `BASE_URL`), the validators, the expiration
+  timestamp, the offset and length of the compressed body and the CRC32 of the body of every entry
+- bodies: zlib compressed raw responses, one after the other
+
+Bodies are compressed one by one, so a memory-mapped bundle serves any response without reading the rest.
+"""
+
+import json
+import mmap
+import os
+import re
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from hashlib import blake2b
+from pathlib import Path
+
+from sigpac_tools import _globals, metrics, transport
+from sigpac_tools._globals import PROVINCES_BY_COMMUNITY
+from sigpac_tools._logging import get_logger
+from sigpac_tools.cache import (
+    DEFAULT_MAXSIZE,
+    CachedResponse,
+    configure_cache,
+    get_cache,
+)
+
+logger = get_logger()
+
+MAGIC = b"SIGPACB1"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sH6xdQ32s")
+_TILE = re.compile(r"/vectorsdg/vector/\w+@3857/15\.(\d+)\.(\d+)\.geojson$")
+_SEARCH = re.compile(r"/query/(\w+)/(\d+)")
+_METADATA = re.compile(r"/layerinfo/\w+/(\d+),")
+
+
+def _relative(url: str) -> str:
+    """Returns the URL without the current `BASE_URL`, so that bundles do not depend on it"""
+    return url[len(_globals.BASE_URL) :] if url.startswith(_globals.BASE_URL) else url
+
+
+def _absolute(path: str) -> str:
+    return _globals.BASE_URL + path if path.startswith("/") else path
+
+
+def _in_region(
+    kind: str,
+    path: str,
+    tiles: tuple[int, int, int, int] | None,
+    provinces: set[int] | None,
+) -> bool:
+    """Returns whether the response of the path belongs to the region: its tiles and provinces"""
+    if kind == "tile":
+        match = _TILE.search(path)
+        if tiles is None or match is None:
+            return tiles is None
+        x, y = int(match[1]), int(match[2])
+        return tiles[0] <= x <= tiles[2] and tiles[1] <= y <= tiles[3]
+    if provinces is None:
+        return True
+    if kind == "search":
+        match = _SEARCH.search(path)
+        if match is None:
+            return False
+        code = int(match[2])
+        if match[1] == "provincias":
+            return bool(provinces & set(PROVINCES_BY_COMMUNITY.get(code, ())))
+        return code in provinces
+    match = _METADATA.search(path)
+    return match is not None and int(match[1]) in provinces
+
+
+def export_bundle(
+    path: str | Path,
+    kinds: list[str] | None = None,
+    bbox: tuple[float, float, float, float] | None = None,
+    provinces: list[int] | None = None,
+) -> dict:
+    """Writes the entries of the enabled caches to a bundle
+
+    Parameters
+    ----------
+    path : str | Path
+        File of the bundle. It is replaced once the bundle is complete
+    kinds : list[str] | None
+        Kinds of caches to export ("tile", "metadata", "search"), all the enabled ones by default
+    bbox : tuple[float, float, float, float] | None
+        If set, only the tiles of this area (min longitude, min latitude, max longitude, max latitude) are exported
+    provinces : list[int] | None
+        If set, only the searches and metadata of these provinces are exported
+
+    Returns
+    -------
+    dict
+        Number of exported "entries" and "bytes" of the bundle
+    """
+    from sigpac_tools.archive import tile_range
+
+    tiles = tile_range(bbox) if bbox is not None else None
+    provinces = set(provinces) if provinces is not None else None
+    path = Path(path)
+    temporary = path.with_name(path.name + ".tmp")
+    index, offset = [], 0
+    with metrics.span("bundle.export"), open(temporary, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        for kind in kinds or ["tile", "metadata", "search"]:
+            cache = get_cache(kind)
+            if cache is None:
+                continue
+            for url, response, expires in cache.items():
+                relative = _relative(url)
+                if not _in_region(kind, relative, tiles, provinces):
+                    continue
+                body = zlib.compress(response.content)
+                f.write(body)
+                index.append(
+                    {
+                        "kind": kind,
+                        "path": relative,
+                        "etag": response.etag,
+                        "last_modified": response.last_modified,
+                        "expires": expires,
+                        "offset": offset,
+                        "length": len(body),
+                        "crc": zlib.crc32(response.content),
+                    }
+                )
+                offset += len(body)
+        encoded = zlib.compress(json.dumps(index).encode())
+        f.write(encoded)
+        f.seek(0)
+        f.write(
+            _HEADER.pack(
+                MAGIC,
+                VERSION,
+                time.time(),
+                len(encoded),
+                blake2b(encoded, digest_size=32).digest(),
+            )
+        )
+    os.replace(temporary, path)
+
+    summary = {"entries": len(index), "bytes": path.stat().st_size}
+    logger.info("Cache bundle exported", path=str(path), **summary)
+    return summary
+
+
+class CacheBundle:
+    """Memory-mapped reader of the bundles written by `export_bundle`
+
+    Used as a context manager, the bundle is registered as a source of `transport` until the block exits, so its fresh
+    responses are served without filling the caches. `import_bundle` loads them into the caches instead.
+
+    Parameters
+    ----------
+    path : str | Path
+        File of the bundle
+
+    Raises
+    ------
+    ValueError
+        If the file is not a bundle or its index is corrupted
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size or self._mmap[:8] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a SIGPAC cache bundle")
+        _, version, self.created_at, length, digest = _HEADER.unpack_from(self._mmap)
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Cache bundle version {version} not supported")
+        encoded = self._mmap[len(self._mmap) - length :]
+        if blake2b(encoded, digest_size=32).digest() != digest:
+            self.close()
+            raise ValueError(f"The index of the cache bundle {self.path} is corrupted")
+        self.entries = json.loads(zlib.decompress(encoded))
+        self._by_path = {entry["path"]: entry for entry in self.entries}
+
+    def read(self, entry: dict) -> bytes:
+        """Returns the raw body of an entry of `entries`
+
+        Raises
+        ------
+        ValueError
+            If the body does not match its checksum
+        """
+        start = _HEADER.size + entry["offset"]
+        try:
+            content = zlib.decompress(self._mmap[start : start + entry["length"]])
+        except zlib.error:
+            content = None
+        if content is None or zlib.crc32(content) != entry["crc"]:
+            raise ValueError(f"The response of {entry['path']} is corrupted")
+        return content
+
+    def lookup(self, url: str) -> bytes | None:
+        """Returns the body of the fresh response to the URL, `None` if the bundle does not have it or it has expired"""
+        entry = self._by_path.get(_relative(url))
+        if entry is None or (
+            entry["expires"] is not None and entry["expires"] < time.time()
+        ):
+            return None
+        return self.read(entry)
+
+    def close(self) -> None:
+        """Closes the bundle"""
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "CacheBundle":
+        transport.add_source(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        transport.remove_source(self)
+        self.close()
+
+
+def import_bundle(path: str | Path, max_age: float | None = None) -> dict:
+    """Loads the entries of a bundle into the caches, enabling the caches that are not enabled
+
+    Every entry keeps its expiration time. Expired entries are only imported if they have a validator, so they can be
+    revalidated with a conditional request, and entries already cached with a later expiration time are kept.
+
+    Parameters
+    ----------
+    path : str | Path
+        File of the bundle
+    max_age : float | None
+        If set, bundles created more than this number of seconds ago are rejected
+
+    Returns
+    -------
+    dict
+        Number of "imported" entries, "kept" cached entries and "expired" entries left out
+
+    Raises
+    ------
+    ValueError
+        If the bundle is corrupted, created in the future or older than `max_age`
+    """
+    now = time.time()
+    summary = {"imported": 0, "kept": 0, "expired": 0}
+    with metrics.span("bundle.import"):
+        bundle = CacheBundle(path)
+        try:
+            age = now - bundle.created_at
+            if age < -60:
+                raise ValueError(f"The cache bundle {path} was created in the future")
+            if max_age is not None and age > max_age:
+                raise ValueError(
+                    f"The cache bundle {path} is {age:.0f} seconds old, older than {max_age} seconds"
+                )
+            for entry in bundle.entries:
+                kind = entry["kind"]
+                expires = entry["expires"]
+                expired = expires is not None and expires < now
+                if expired and not (entry["etag"] or entry["last_modified"]):
+                    summary["expired"] += 1
+                    continue
+                cache = get_cache(kind)
+                if cache is None:
+                    configure_cache([kind])
+                    cache = get_cache(kind)
+                url = _absolute(entry["path"])
+                current = cache.peek(url)
+                if current is not None and (
+                    current[1] is None
+                    or (expires is not None and current[1] >= expires)
+                ):
+                    summary["kept"] += 1
+                    continue
+                response = CachedResponse(
+                    bundle.read(entry), entry["etag"], entry["last_modified"]
+                )
+                cache.set(url, response, expires=expires)
+                summary["imported"] += 1
+        finally:
+            bundle.close()
+    logger.info("Cache bundle imported", path=str(path), **summary)
+    return summary
+
+
+def _reserve(kind: str, count: int) -> None:
+    """Enables the cache of the kind if needed and grows it so that `count` more responses fit without evictions"""
+    cache = get_cache(kind)
+    if cache is None:
+        configure_cache([kind])
+        cache = get_cache(kind)
+    cache.maxsize = max(cache.maxsize, len(cache) + count)
+
+
+def warm_caches(
+    bbox: tuple[float, float, float, float],
+    kinds: list[str] | None = None,
+    layers: tuple[str, ...] = ("parcela", "recinto"),
+    workers: int = 8,
+) -> dict:
+    """Fetches the responses of an area into the caches, to export them with `export_bundle`
+
+    The tiles of the layers that cover the area are fetched first. The searches and metadata are then the ones of the
+    features found in the tiles: the polygons of their municipalities, the parcels of their polygons and the enclosures of
+    their parcels, and the metadata of every parcel of the "parcela" tiles and every enclosure of the "recinto" tiles. The
+    caches of the kinds are enabled if needed and grown to hold every response of the area, so that none of them is
+    evicted before the export.
+
+    Parameters
+    ----------
+    bbox : tuple[float, float, float, float]
+        (min longitude, min latitude, max longitude, max latitude) of the area
+    kinds : list[str] | None
+        Kinds of responses to cache ("tile", "metadata", "search"), all of them by default. The tiles are fetched anyway
+        to find the searches and metadata of the area, but they are only cached with "tile"
+    layers : tuple[str, ...]
+        Layers of the tiles ("parcela", "recinto")
+    workers : int
+        Number of threads fetching the responses
+
+    Returns
+    -------
+    dict
+        Number of responses requested of every kind
+
+    Raises
+    ------
+    KeyError
+        If a kind or a layer is not supported
+    """
+    from sigpac_tools.anotate import get_metadata
+    from sigpac_tools.archive import ZOOM, tile_range
+    from sigpac_tools.search import search
+
+    kinds = kinds or ["tile", "metadata", "search"]
+    for kind in kinds:
+        if kind not in DEFAULT_MAXSIZE:
+            raise KeyError(
+                f"Cache kind not supported. Supported kinds: {list(DEFAULT_MAXSIZE)}"
+            )
+    for layer in layers:
+        if layer not in ("parcela", "recinto"):
+            raise KeyError(
+                f'Layer "{layer}" not supported. Supported layers: "parcela", "recinto"'
+            )
+
+    x_min, y_min, x_max, y_max = tile_range(bbox)
+    tiles = [
+        (
+            layer,
+            f"{_globals.BASE_URL}/vectorsdg/vector/{layer}@3857/{ZOOM}.{x}.{y}.geojson",
+        )
+        for layer in layers
+        for y in range(y_min, y_max + 1)
+        for x in range(x_min, x_max + 1)
+    ]
+    if "tile" in kinds:
+        _reserve("tile", len(tiles))
+    features = "search" in kinds or "metadata" in kinds
+
+    def fetch_tile(tile: tuple[str, str]) -> list[tuple[str, dict]]:
+        layer, url = tile
+        with transport.priority("bulk"):
+            content = transport.get_content(url)
+        if not features or not content:
+            return []
+        try:
+            collection = transport.decode_json(content)
+        except Exception as e:
+            logger.warning("Undecodable tile", url=url, error=str(e))
+            return []
+        if not isinstance(collection, dict):
+            return []
+        return [
+            (layer, feature["properties"])
+            for feature in collection.get("features", [])
+            if feature.get("properties")
+        ]
+
+    searches, metadata = set(), set()
+    with metrics.span("bundle.warm", tiles=len(tiles)):
+        with ThreadPoolExecutor(workers) as executor:
+            for found in executor.map(fetch_tile, tiles):
+                for layer, p in found:
+                    location = (p["provincia"], p["municipio"], p["poligono"])
+                    searches.update([location[:2], location, (*location, p["parcela"])])
+                    key = (
+                        p["provincia"],
+                        p["municipio"],
+                        p.get("agregado", 0),
+                        p.get("zona", 0),
+                        p["poligono"],
+                        p["parcela"],
+                    )
+                    if layer == "recinto":
+                        key += (p["recinto"],)
+                    metadata.add((layer, key))
+
+            lookups = []
+            if "search" in kinds:
+                _reserve("search", len(searches))
+                keys = ("province", "municipality", "polygon", "parcel")
+                lookups += [(search, dict(zip(keys, key))) for key in searches]
+            if "metadata" in kinds:
+                _reserve("metadata", len(metadata))
+                keys = (
+                    "province",
+                    "municipality",
+                    "aggregate",
+                    "zone",
+                    "polygon",
+                    "parcel",
+                    "enclosure",
+                )
+                lookups += [
+                    (partial(get_metadata, layer), dict(zip(keys, key)))
+                    for layer, key in metadata
+                ]
+
+            def lookup(call: tuple) -> None:
+                function, data = call
+                try:
+                    with transport.priority("bulk"):
+                        function(data)
+                except (ValueError, KeyError) as e:
+                    logger.warning("Lookup of the area failed", error=str(e), **data)
+
+            list(executor.map(lookup, lookups))
+
+    summary = {
+        "tile": len(tiles) if "tile" in kinds else 0,
+        "search": len(searches) if "search" in kinds else 0,
+        "metadata": len(metadata) if "metadata" in kinds else 0,
+    }
+    logger.info("Caches warmed", **summary)
+    return summary
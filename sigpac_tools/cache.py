@@ -0,0 +1,218 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Default sizes (number of responses) of the caches enabled by `configure_cache`
+DEFAULT_MAXSIZE = {"tile": 2048, "metadata": 8192, "search": 4096}
+
+# Kinds of cached responses, by the path of the SIGPAC service that produces them
+CACHE_KINDS = {
+    "/vectorsdg/": "tile",
+    "/layerinfo/": "metadata",
+    "/query/": "search",
+}
+
+_caches = {}
+
+
+class CachedResponse:
+    """Raw body of a cached response and the validators to revalidate it with a conditional request
+
+    Parameters
+    ----------
+    content : bytes
+        Raw body of the response
+    etag : str | None
+        Value of the ETag header of the response
+    last_modified : str | None
+        Value of the Last-Modified header of the response
+    """
+
+    __slots__ = ("content", "etag", "last_modified")
+
+    def __init__(
+        self, content: bytes, etag: str | None = None, last_modified: str | None = None
+    ):
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def conditional_headers(self) -> dict:
+        """Returns the headers of a conditional request for the response, empty if it has no validators"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries, the least recently used entry is evicted when it is exceeded
+    ttl : float | None
+        Seconds an entry is fresh, `None` for entries that never expire
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the fresh value stored for the key, or `default` if there is not one"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def peek(self, key) -> tuple | None:
+        """Returns the (value, expires) pair of the entry of the key, fresh or not, or `None` if there is not one"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires: float | None = ...) -> None:
+        """Stores the value for the key
+
+        Parameters
+        ----------
+        key : Hashable
+            Key of the entry
+        value : Any
+            Value to store
+        expires : float | None
+            Timestamp when the entry expires. By default, `ttl` seconds from now
+        """
+        if expires is ...:
+            expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Removes the entry of the key and returns its value"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def items(self) -> list[tuple]:
+        """Returns the (key, value, expires) triplets of the stored entries, fresh or not"""
+        with self._lock:
+            return [
+                (key, value, expires) for key, (value, expires) in self._data.items()
+            ]
+
+    def clear(self) -> None:
+        """Removes every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, ...) is not ...
+
+
+def cache_kind(url: str) -> str | None:
+    """Returns the kind of cache ("tile", "metadata" or "search") for the responses of the given URL
+
+    Parameters
+    ----------
+    url : str
+        URL of the request
+
+    Returns
+    -------
+    str | None
+        Kind of the cache, `None` if the responses of the URL are not cached
+    """
+    for marker, kind in CACHE_KINDS.items():
+        if marker in url:
+            return kind
+    return None
+
+
+def configure_cache(
+    kinds: list[str] | None = None,
+    maxsize: int | None = None,
+    ttl: float | None = 3600,
+) -> None:
+    """Enables the in-memory caches of the SIGPAC responses shared by every lookup of the process
+
+    Responses are cached as the raw response bytes, so the callers always get a freshly decoded document that they can modify.
+    The compact models (see `sigpac_tools.models`) are not cached either: they are built from the decoded document on every
+    hit. The raw body is smaller than its compact model, the bulk pipeline reprojects the coordinates of the compact
+    geometries in place, so a cached model would have to be copied on every hit anyway, and a hit already skips the
+    network, which is where the time of a lookup goes.
+    Expired responses are kept until they are evicted, and revalidated with a conditional request if they have an ETag or
+    Last-Modified validator: a 304 answer refreshes them without downloading the body again.
+
+    Parameters
+    ----------
+    kinds : list[str] | None
+        Kinds of responses to cache ("tile", "metadata", "search"), all of them by default
+    maxsize : int | None
+        Maximum number of responses of every cache, see `DEFAULT_MAXSIZE` for the default sizes
+    ttl : float | None
+        Seconds a cached response is fresh, `None` to never expire them
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    KeyError
+        If a kind is not supported
+    """
+    for kind in kinds or DEFAULT_MAXSIZE:
+        if kind not in DEFAULT_MAXSIZE:
+            raise KeyError(
+                f"Cache kind not supported. Supported kinds: {list(DEFAULT_MAXSIZE)}"
+            )
+        _caches[kind] = TTLCache(maxsize or DEFAULT_MAXSIZE[kind], ttl)
+
+
+def disable_cache(kinds: list[str] | None = None) -> None:
+    """Disables (and empties) the given caches, all of them by default
+
+    Parameters
+    ----------
+    kinds : list[str] | None
+        Kinds of the caches to disable
+    """
+    for kind in kinds or list(_caches):
+        _caches.pop(kind, None)
+
+
+def get_cache(kind: str) -> TTLCache | None:
+    """Returns the cache of the given kind, `None` if it is not enabled
+
+    Parameters
+    ----------
+    kind : str
+        Kind of the cache ("tile", "metadata", "search")
+
+    Returns
+    -------
+    TTLCache | None
+        Cache of the given kind
+    """
+    return _caches.get(kind)
@@ -0,0 +1,121 @@
+import hashlib
+import json
+
+from sigpac_tools.models import FeatureCollection
+
+# Properties that identify a parcel or an enclosure, from the coarsest to the finest. Search results are identified by "id"
+IDENTITY_KEYS = (
+    "provincia",
+    "municipio",
+    "agregado",
+    "zona",
+    "poligono",
+    "parcela",
+    "recinto",
+    "id",
+)
+
+
+def feature_identity(properties: dict) -> tuple:
+    """Returns the identity of a feature: the (key, value) pairs of its identifying properties
+
+    Parameters
+    ----------
+    properties : dict
+        Properties of the feature
+
+    Returns
+    -------
+    tuple
+        (key, value) pairs of the properties of `IDENTITY_KEYS` present in the feature
+    """
+    return tuple((key, properties[key]) for key in IDENTITY_KEYS if key in properties)
+
+
+def _features_by_identity(snapshot: dict | FeatureCollection | None) -> dict:
+    if isinstance(snapshot, FeatureCollection):
+        snapshot = snapshot.to_geojson()
+    features = {}
+    for feature in (snapshot or {}).get("features", []):
+        features[feature_identity(feature.get("properties") or {})] = feature
+    return features
+
+
+def diff(
+    old: dict | FeatureCollection | None, new: dict | FeatureCollection | None
+) -> dict[str, list[dict]]:
+    """Reports the parcels or enclosures that changed between two snapshots of the same tile or search result
+
+    Features are matched by their identifying properties (see `IDENTITY_KEYS`), and a matched feature has changed if its
+    geometry or any of its properties differ.
+
+    Parameters
+    ----------
+    old : dict | FeatureCollection | None
+        Previous snapshot, as a GeoJSON feature collection or a compact `FeatureCollection`
+    new : dict | FeatureCollection | None
+        Current snapshot
+
+    Returns
+    -------
+    dict[str, list[dict]]
+        Identifying properties of the "added", "removed" and "changed" features
+    """
+    before, after = _features_by_identity(old), _features_by_identity(new)
+    return {
+        "added": [dict(key) for key in after if key not in before],
+        "removed": [dict(key) for key in before if key not in after],
+        "changed": [
+            dict(key)
+            for key, feature in after.items()
+            if key in before and before[key] != feature
+        ],
+    }
+
+
+def fingerprint(document) -> str:
+    """Returns a fingerprint of a JSON document that does not depend on the order of its keys
+
+    Parameters
+    ----------
+    document : Any
+        JSON document
+
+    Returns
+    -------
+    str
+        Hexadecimal BLAKE2b digest of the canonical JSON of the document
+    """
+    canonical = json.dumps(document, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def field_changes(old, new, prefix: str = "") -> dict[str, list]:
+    """Reports the fields that differ between two versions of a JSON document
+
+    Nested objects are compared field by field, other values (lists included) as a whole.
+
+    Parameters
+    ----------
+    old : Any
+        Previous version of the document
+    new : Any
+        Current version of the document
+    prefix : str
+        Path of the documents, prepended to the paths of the fields
+
+    Returns
+    -------
+    dict[str, list]
+        [old value, new value] of every changed field, by its dotted path. Missing fields are reported as `None`
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return {} if old == new else {prefix or ".": [old, new]}
+    changes = {}
+    for key in {**old, **new}:
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if key not in new or key not in old:
+            changes[path] = [old.get(key), new.get(key)]
+        elif old[key] != new[key]:
+            changes.update(field_changes(old[key], new[key], path))
+    return changes
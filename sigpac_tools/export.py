@@ -0,0 +1,380 @@
+"""Compact columnar binary format for located geometries
+
+A file is made of the 8 bytes magic `SIGPACC1`, a sequence of chunks, a UTF-8 JSON footer, the length of the footer as a
+little-endian uint64 and the magic again. Every chunk holds up to `chunk_size` features as contiguous little-endian
+buffers, each one starting at a multiple of 8 bytes, and the footer lists the offset, length and type of every buffer:
+
+- `types` (uint8): index of the geometry type of every feature in `GEOMETRY_TYPES`, 255 for features without geometry
+- `dims` (uint8): number of coordinates of every position
+- `coord_index` (uint64, features + 1): first coordinate of every feature in `coords`
+- `coords` (float64): coordinates of every position, one after the other
+- `ring_index` (uint64, features + 1): first entry of every feature in `ring_offsets`
+- `ring_offsets` (uint32): `Geometry.ring_offsets` of every feature, relative to the first position of the feature
+- `part_index` (uint64, features + 1) and `part_offsets` (uint32): the same for `Geometry.part_offsets`
+- one column per property key, `pv:<key>` (uint8, 0 if the feature lacks the property, 1 if it has a value and 2 if
+  it is null) plus either `p:<key>` (int64 or float64) or `po:<key>` (uint64, features + 1) and `p:<key>` (UTF-8 bytes)
+  for strings and JSON encoded values. The prefixes keep the property buffers apart from the geometry buffers and from
+  each other, whatever the property keys are
+
+The footer is `{"metadata": {...}, "chunks": [{"count": n, "columns": {key: kind}, "buffers": {name: [offset, length, typecode]}}]}`.
+"""
+
+import json
+import mmap
+import sys
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Iterable
+
+from sigpac_tools.models import GEOMETRY_DEPTH, Feature, Geometry
+
+MAGIC = b"SIGPACC1"
+
+# Geometry types, by their code in the `types` buffer
+GEOMETRY_TYPES = list(GEOMETRY_DEPTH)
+
+_NO_GEOMETRY = 255
+
+
+def _column_kind(values: list) -> str:
+    """Returns the kind of column ("int", "float", "str", "json") that stores the given non-null values
+
+    Columns mixing ints and floats, or with ints out of the int64 range, are stored as JSON to keep every value as it was
+    """
+    if all(type(v) is int for v in values):
+        return "int" if all(-(2**63) <= v < 2**63 for v in values) else "json"
+    if all(type(v) is float for v in values):
+        return "float"
+    if all(type(v) is str for v in values):
+        return "str"
+    return "json"
+
+
+class ColumnarWriter:
+    """Streams features to a columnar binary file, holding at most `chunk_size` features in memory
+
+    Parameters
+    ----------
+    path : str | Path
+        File to write
+    chunk_size : int
+        Maximum number of features of every chunk
+    metadata : dict | None
+        JSON metadata stored in the footer, e.g. {"crs": "epsg:4326"}
+    """
+
+    def __init__(
+        self, path: str | Path, chunk_size: int = 65536, metadata: dict | None = None
+    ):
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.metadata = metadata or {}
+        self._file = open(self.path, "wb")
+        self._file.write(MAGIC)
+        self._chunks = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self._types = array("B")
+        self._dims = array("B")
+        self._coord_index = array("Q", [0])
+        self._coords = array("d")
+        self._ring_index = array("Q", [0])
+        self._ring_offsets = array("I")
+        self._part_index = array("Q", [0])
+        self._part_offsets = array("I")
+        self._properties = []
+
+    def write(self, feature: dict | Feature | Geometry | None) -> None:
+        """Appends a feature: a GeoJSON feature or geometry, a compact `Feature` or `Geometry`, or `None`
+
+        Geometries are stored as features without properties and `None` as a feature without geometry nor properties.
+        """
+        if isinstance(feature, dict) and feature.get("type") != "Feature":
+            feature = Geometry.from_geojson(feature)
+        if isinstance(feature, Geometry) or feature is None:
+            geometry, properties = feature, None
+        elif isinstance(feature, Feature):
+            geometry, properties = feature.geometry, feature.properties
+            if properties is not None and not isinstance(properties, dict):
+                properties = properties.to_dict()
+        else:
+            geometry = feature.get("geometry")
+            geometry = Geometry.from_geojson(geometry) if geometry else None
+            properties = feature.get("properties")
+
+        if geometry is None:
+            self._types.append(_NO_GEOMETRY)
+            self._dims.append(0)
+        else:
+            self._types.append(GEOMETRY_TYPES.index(geometry.type))
+            self._dims.append(geometry.dims)
+            self._coords.extend(geometry.coords)
+            if geometry.ring_offsets is not None:
+                self._ring_offsets.fromlist(geometry.ring_offsets.tolist())
+            if geometry.part_offsets is not None:
+                self._part_offsets.fromlist(geometry.part_offsets.tolist())
+        self._coord_index.append(len(self._coords))
+        self._ring_index.append(len(self._ring_offsets))
+        self._part_index.append(len(self._part_offsets))
+        self._properties.append(properties or {})
+
+        if len(self._types) >= self.chunk_size:
+            self.flush()
+
+    def _write_buffer(self, buffers: dict, name: str, data: array | bytes) -> None:
+        position = self._file.tell()
+        if position % 8:
+            self._file.write(b"\0" * (8 - position % 8))
+            position = self._file.tell()
+        if isinstance(data, array):
+            typecode = data.typecode
+            if sys.byteorder == "big":
+                data = array(typecode, data)
+                data.byteswap()
+            data = data.tobytes()
+        else:
+            typecode = "B"
+        self._file.write(data)
+        buffers[name] = [position, len(data), typecode]
+
+    def flush(self) -> None:
+        """Writes the buffered features as a chunk"""
+        count = len(self._types)
+        if not count:
+            return
+        buffers = {}
+        for name in (
+            "types",
+            "dims",
+            "coord_index",
+            "coords",
+            "ring_index",
+            "ring_offsets",
+            "part_index",
+            "part_offsets",
+        ):
+            self._write_buffer(buffers, name, getattr(self, f"_{name}"))
+
+        columns = {}
+        keys = {key: None for properties in self._properties for key in properties}
+        for key in keys:
+            values = [properties.get(key) for properties in self._properties]
+            present = [v for v in values if v is not None]
+            kind = columns[key] = _column_kind(present)
+            valid = array(
+                "B",
+                [
+                    0 if key not in properties else 1 if value is not None else 2
+                    for properties, value in zip(self._properties, values)
+                ],
+            )
+            self._write_buffer(buffers, f"pv:{key}", valid)
+            if kind in ("int", "float"):
+                typecode, empty = ("q", 0) if kind == "int" else ("d", 0.0)
+                column = array(typecode, [empty if v is None else v for v in values])
+                self._write_buffer(buffers, f"p:{key}", column)
+            else:
+                offsets, data = array("Q", [0]), bytearray()
+                for v in values:
+                    if v is not None:
+                        data += (v if kind == "str" else json.dumps(v)).encode()
+                    offsets.append(len(data))
+                self._write_buffer(buffers, f"po:{key}", offsets)
+                self._write_buffer(buffers, f"p:{key}", bytes(data))
+
+        self._chunks.append({"count": count, "columns": columns, "buffers": buffers})
+        self._reset()
+
+    def close(self) -> None:
+        """Writes the last chunk and the footer and closes the file"""
+        if self._file.closed:
+            return
+        self.flush()
+        footer = json.dumps({"metadata": self.metadata, "chunks": self._chunks})
+        footer = footer.encode()
+        self._file.write(footer)
+        self._file.write(len(footer).to_bytes(8, "little"))
+        self._file.write(MAGIC)
+        self._file.close()
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_features(
+    path: str | Path,
+    features: Iterable[dict | Feature | Geometry | None],
+    chunk_size: int = 65536,
+    metadata: dict | None = None,
+) -> int:
+    """Writes the features to a columnar binary file, see `ColumnarWriter`
+
+    Parameters
+    ----------
+    path : str | Path
+        File to write
+    features : Iterable[dict | Feature | Geometry | None]
+        Features to write. The iterable is consumed lazily, chunk by chunk
+    chunk_size : int
+        Maximum number of features of every chunk
+    metadata : dict | None
+        JSON metadata stored in the footer
+
+    Returns
+    -------
+    int
+        Number of features written
+    """
+    count = 0
+    with ColumnarWriter(path, chunk_size, metadata) as writer:
+        for feature in features:
+            writer.write(feature)
+            count += 1
+    return count
+
+
+class ColumnarReader:
+    """Memory-mapped reader of the columnar binary files written by `ColumnarWriter`
+
+    Opening a file only parses its footer, and every feature is decoded on access from the mapped buffers.
+
+    Parameters
+    ----------
+    path : str | Path
+        File to read
+
+    Raises
+    ------
+    ValueError
+        If the file is not a columnar binary file
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._buffers = {}
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if len(self._mmap) < 24 or self._view[:8] != MAGIC or self._view[-8:] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a columnar SIGPAC file")
+        length = int.from_bytes(self._view[-16:-8], "little")
+        footer = json.loads(bytes(self._view[-16 - length : -16]))
+        self.metadata = footer["metadata"]
+        self._chunks = footer["chunks"]
+        self._starts = [0]
+        for chunk in self._chunks:
+            self._starts.append(self._starts[-1] + chunk["count"])
+
+    def _buffer(self, chunk: int, name: str) -> memoryview:
+        key = (chunk, name)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            offset, length, typecode = self._chunks[chunk]["buffers"][name]
+            buffer = self._view[offset : offset + length]
+            if typecode != "B" and sys.byteorder == "big":
+                swapped = array(typecode)
+                swapped.frombytes(buffer)
+                swapped.byteswap()
+                buffer = memoryview(swapped)
+            elif typecode != "B":
+                buffer = buffer.cast(typecode)
+            self._buffers[key] = buffer
+        return buffer
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Feature index out of range")
+        chunk = bisect_right(self._starts, index) - 1
+        return chunk, index - self._starts[chunk]
+
+    def geometry(self, index: int) -> Geometry | None:
+        """Returns the compact geometry of the feature at the given index"""
+        chunk, i = self._locate(index)
+        code = self._buffer(chunk, "types")[i]
+        if code == _NO_GEOMETRY:
+            return None
+        coord_index = self._buffer(chunk, "coord_index")
+        ring_index = self._buffer(chunk, "ring_index")
+        part_index = self._buffer(chunk, "part_index")
+        rings = self._buffer(chunk, "ring_offsets")[ring_index[i] : ring_index[i + 1]]
+        parts = self._buffer(chunk, "part_offsets")[part_index[i] : part_index[i + 1]]
+        return Geometry(
+            GEOMETRY_TYPES[code],
+            array(
+                "d", self._buffer(chunk, "coords")[coord_index[i] : coord_index[i + 1]]
+            ),
+            array("L", rings) if len(rings) else None,
+            array("L", parts) if len(parts) else None,
+            self._buffer(chunk, "dims")[i],
+            {"CRS": self.metadata["crs"]} if "crs" in self.metadata else None,
+        )
+
+    def properties(self, index: int) -> dict:
+        """Returns the properties of the feature at the given index"""
+        chunk, i = self._locate(index)
+        properties = {}
+        for key, kind in self._chunks[chunk]["columns"].items():
+            valid = self._buffer(chunk, f"pv:{key}")[i]
+            if valid != 1:
+                if valid == 2:
+                    properties[key] = None
+                continue
+            if kind in ("int", "float"):
+                properties[key] = self._buffer(chunk, f"p:{key}")[i]
+            else:
+                offsets = self._buffer(chunk, f"po:{key}")
+                data = self._buffer(chunk, f"p:{key}")
+                value = bytes(data[offsets[i] : offsets[i + 1]])
+                properties[key] = value.decode() if kind == "str" else json.loads(value)
+        return properties
+
+    def feature(self, index: int, compact: bool = False) -> dict | Feature:
+        """Returns the feature at the given index
+
+        Parameters
+        ----------
+        index : int
+            Index of the feature
+        compact : bool
+            If `True`, returns a compact `Feature` instead of a GeoJSON feature
+
+        Returns
+        -------
+        dict | Feature
+            Feature at the given index
+        """
+        feature = Feature(self.geometry(index), self.properties(index))
+        return feature if compact else feature.to_geojson()
+
+    def __getitem__(self, index: int) -> dict:
+        return self.feature(index)
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.feature(index)
+
+    def close(self) -> None:
+        """Releases the mapped buffers and closes the file"""
+        for buffer in self._buffers.values():
+            buffer.release()
+        self._buffers = {}
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "ColumnarReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,14 +1,12 @@
-import structlog
-
-from sigpac_tools.search import search
-from sigpac_tools.anotate import get_metadata
-from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools import metrics, parcel_index
+from sigpac_tools._logging import get_logger
 from sigpac_tools.utils import read_cadastral_registry
 
 
-logger = structlog.get_logger()
+logger = get_logger()
 
 
+@metrics.timed("find")
 def find_from_cadastral_registry(cadastral_reg: str):
     """
     Find the geometry and metadata of a cadastral reference in the SIGPAC database. The reference must be rural. Urban references are not supported.
@@ -47,22 +45,41 @@ def find_from_cadastral_registry(cadastral_reg: str):
     NotImplementedError
         If the reference is urban
     """
-    reg = read_cadastral_registry(cadastral_reg)
-
-    # Search for coordinates
+    # The lookup modules are imported here so that parsing a registry does not load the HTTP and projection stack
+    from sigpac_tools.search import search
+    from sigpac_tools.anotate import get_metadata
+    from sigpac_tools.locate import geometry_from_coords
 
-    search_data = search(reg)
-    if search_data["features"] == []:
-        raise ValueError(
-            f"The cadastral reference {cadastral_reg} does not exist in the SIGPAC database. Please check the if the reference is correct and try again. Urban references are not supported."
-        )
-
-    coords_x = []
-    coords_y = []
-    for feat in search_data["features"]:
-        coords_x.append((feat["properties"]["x1"] + feat["properties"]["x2"]) / 2)
-        coords_y.append((feat["properties"]["y1"] + feat["properties"]["y2"]) / 2)
-    coords = [sum(coords_x) / len(coords_x), sum(coords_y) / len(coords_y)]
+    reg = read_cadastral_registry(cadastral_reg)
+    parcel = (reg["province"], reg["municipality"], reg["polygon"], reg["parcel"])
+
+    # Search for coordinates. With an active parcel index, the location is taken from it, and on a miss the parcels of the
+    # whole polygon are searched, so that the following lookups of the polygon do not search again
+
+    bbox = parcel_index.lookup(*parcel)
+    if bbox is None and parcel_index.active():
+        search({k: v for k, v in reg.items() if k != "parcel"})
+        bbox = parcel_index.lookup(*parcel)
+        if bbox is None:
+            raise ValueError(
+                f"The cadastral reference {cadastral_reg} does not exist in the SIGPAC database. Please check the if the reference is correct and try again. Urban references are not supported."
+            )
+
+    if bbox is not None:
+        coords = [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2]
+    else:
+        search_data = search(reg)
+        if search_data["features"] == []:
+            raise ValueError(
+                f"The cadastral reference {cadastral_reg} does not exist in the SIGPAC database. Please check the if the reference is correct and try again. Urban references are not supported."
+            )
+
+        coords_x = []
+        coords_y = []
+        for feat in search_data["features"]:
+            coords_x.append((feat["properties"]["x1"] + feat["properties"]["x2"]) / 2)
+            coords_y.append((feat["properties"]["y1"] + feat["properties"]["y2"]) / 2)
+        coords = [sum(coords_x) / len(coords_x), sum(coords_y) / len(coords_y)]
 
     # Get geometry
 
@@ -0,0 +1,172 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, TypeVar
+
+from sigpac_tools import metrics
+
+T = TypeVar("T")
+
+# Default number of threads running the hedged requests when there is no concurrency limit
+DEFAULT_MAX_WORKERS = 32
+
+
+class RequestHedger:
+    """Sends a duplicate of the requests that are slower than a percentile of the observed latency
+
+    The latency of the successful requests is tracked per kind (tile, metadata, search). Once a kind has `min_samples`
+    samples, its requests are run in a background thread, and if a request has not answered after the `percentile` of the
+    latency of its kind, a duplicate is sent and the first successful response wins. The other one is cancelled if it has
+    not started, and its response discarded otherwise. Duplicates are capped to a `budget` fraction of the requests.
+
+    Latencies and the delay before a duplicate are measured from the moment a request starts running in a thread of the
+    hedger, so the requests waiting for a free thread are not hedged because of the local queueing.
+
+    Every duplicate increments the "hedge.sent" counter and every duplicate that answered first "hedge.won". Requests that
+    were not duplicated because the budget was spent increment "hedge.skipped".
+
+    Parameters
+    ----------
+    percentile : float
+        Percentile (0-1) of the latency after which a duplicate is sent
+    budget : float
+        Maximum fraction of the requests that can be duplicated
+    min_delay : float
+        Minimum seconds to wait before sending a duplicate
+    min_samples : int
+        Number of latency samples of a kind needed before its requests are hedged
+    window : int
+        Number of recent latency samples kept per kind
+    max_workers : int
+        Number of threads running the hedged requests. `transport.set_concurrency` sizes it to the concurrency limit
+
+    Raises
+    ------
+    ValueError
+        If the percentile is not between 0 and 1 or the budget is negative
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget: float = 0.05,
+        min_delay: float = 0.01,
+        min_samples: int = 20,
+        window: int = 1000,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        if not 0 < percentile < 1:
+            raise ValueError("The percentile must be between 0 and 1")
+        if budget < 0:
+            raise ValueError("The budget must not be negative")
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.max_workers = max_workers
+        self._samples = {}
+        self._requests = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="sigpac-hedge"
+        )
+
+    def delay(self, kind: str) -> float | None:
+        """Returns the seconds after which a request of the given kind is duplicated, `None` while there are too few samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(kind, ()))
+        if len(samples) < max(self.min_samples, 1):
+            return None
+        position = min(len(samples) - 1, int(self.percentile * len(samples)))
+        return max(self.min_delay, samples[position])
+
+    def _record(self, kind: str, latency: float) -> None:
+        with self._lock:
+            if kind not in self._samples:
+                self._samples[kind] = deque(maxlen=self.window)
+            self._samples[kind].append(latency)
+
+    def _submit(
+        self, request: Callable[[], T], kind: str
+    ) -> tuple[Future, threading.Event]:
+        """Runs the request in a thread of the hedger, returning its future and the event set once it starts running"""
+        started = threading.Event()
+        # The request runs with the context of the caller, e.g. its priority class
+        context = contextvars.copy_context()
+
+        def call() -> T:
+            started.set()
+            start = time.perf_counter()
+            result = context.run(request)
+            self._record(kind, time.perf_counter() - start)
+            return result
+
+        return self._executor.submit(call), started
+
+    def resize(self, max_workers: int) -> None:
+        """Replaces the threads of the hedger with a pool of the given size. Running requests finish in the previous pool"""
+        previous = self._executor
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="sigpac-hedge"
+        )
+        previous.shutdown(wait=False)
+
+    def run(self, request: Callable[[], T], kind: str = "default") -> T:
+        """Runs the request, hedging it if it is slower than the percentile of its kind
+
+        Parameters
+        ----------
+        request : Callable[[], T]
+            Idempotent request, that can be run twice
+        kind : str
+            Kind of the request, whose latency samples are used
+
+        Returns
+        -------
+        T
+            Result of the first successful run. If both runs fail, the error of the first one is raised
+        """
+        with self._lock:
+            self._requests += 1
+        delay = self.delay(kind)
+        if delay is None:
+            start = time.perf_counter()
+            result = request()
+            self._record(kind, time.perf_counter() - start)
+            return result
+
+        primary, started = self._submit(request, kind)
+        # The time waiting for a free thread does not count toward the delay
+        started.wait()
+        if wait([primary], timeout=delay).done:
+            return primary.result()
+        with self._lock:
+            allowed = self._hedges + 1 <= self.budget * self._requests
+            if allowed:
+                self._hedges += 1
+        if not allowed:
+            metrics.increment("hedge.skipped", kind=kind)
+            return primary.result()
+
+        metrics.increment("hedge.sent", kind=kind)
+        hedge, _ = self._submit(request, kind)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (primary, hedge):
+                if future in done and future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is hedge:
+                        metrics.increment("hedge.won", kind=kind)
+                    return future.result()
+        return primary.result()
+
+    def close(self) -> None:
+        """Stops the threads of the hedger once the running requests finish"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,205 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+from sigpac_tools import metrics
+from sigpac_tools._logging import get_logger
+from sigpac_tools.changes import field_changes, fingerprint
+from sigpac_tools.transport import priority
+
+logger = get_logger()
+
+# Keys of the `get_metadata` data that identify a record, in the order of the SIGPAC identifiers
+RECORD_KEYS = (
+    "province",
+    "municipality",
+    "aggregate",
+    "zone",
+    "polygon",
+    "parcel",
+    "enclosure",
+)
+
+# Key of the `get_metadata` data of every identifying property of the SIGPAC features (see `changes.IDENTITY_KEYS`)
+PROPERTY_KEYS = {
+    "provincia": "province",
+    "municipio": "municipality",
+    "agregado": "aggregate",
+    "zona": "zone",
+    "poligono": "polygon",
+    "parcela": "parcel",
+    "recinto": "enclosure",
+}
+
+
+def record_from_identity(identity: dict) -> dict:
+    """Translates the identifying properties of a feature, as reported by `changes.diff`, to `get_metadata` data
+
+    Parameters
+    ----------
+    identity : dict
+        Identifying properties of the feature ("provincia", "municipio", ...). `get_metadata` data is returned as is
+
+    Returns
+    -------
+    dict
+        Data of the record ("province", "municipality", ...)
+    """
+    return {PROPERTY_KEYS.get(key, key): value for key, value in identity.items()}
+
+
+def record_key(layer: str, data: dict) -> str:
+    """Returns the key of a record in the store: the layer and the SIGPAC identifier of the location
+
+    Parameters
+    ----------
+    layer : str
+        Layer of the record ("parcela", "recinto")
+    data : dict
+        Data of the record, as passed to `get_metadata`
+
+    Returns
+    -------
+    str
+        Key of the record, e.g. "parcela/14,48,0,0,5,1"
+    """
+    keys = RECORD_KEYS if layer == "recinto" else RECORD_KEYS[:-1]
+    defaults = {"aggregate": 0, "zone": 0}
+    return f"{layer}/" + ",".join(str(data.get(k, defaults.get(k))) for k in keys)
+
+
+class MetadataStore:
+    """Stored `get_metadata` responses, updated incrementally
+
+    Every response is stored with its fingerprint and the time it was fetched. `update` only fetches again the records that
+    are new, past the freshness window, from another campaign or flagged by change detection, and reports the fields that
+    changed. The store is kept in a JSON file.
+
+    Parameters
+    ----------
+    path : str | Path
+        JSON file of the store. It is created on the first `save` if it does not exist
+    max_age : float | None
+        Seconds a stored response is fresh, `None` to only fetch new, flagged or outdated campaign records
+    """
+
+    def __init__(self, path: str | Path, max_age: float | None = 30 * 24 * 3600):
+        self.path = Path(path)
+        self.max_age = max_age
+        self.entries = {}
+        if self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def get(self, layer: str, data: dict) -> dict | None:
+        """Returns the stored metadata of the record, `None` if it is not stored"""
+        entry = self.entries.get(record_key(layer, data))
+        return entry["metadata"] if entry else None
+
+    def save(self) -> None:
+        """Writes the store to its file, replacing it atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_text(json.dumps(self.entries), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+    def is_stale(
+        self,
+        layer: str,
+        data: dict,
+        campaign: str | None = None,
+        now: float | None = None,
+    ) -> bool:
+        """Returns whether the record has to be fetched: it is not stored, past the freshness window or from another campaign"""
+        entry = self.entries.get(record_key(layer, data))
+        if entry is None:
+            return True
+        if campaign is not None and entry["metadata"].get("vigencia") != campaign:
+            return True
+        now = time.time() if now is None else now
+        return self.max_age is not None and now - entry["fetched_at"] > self.max_age
+
+    def update(
+        self,
+        layer: str,
+        records: Iterable[dict],
+        flagged: Iterable[dict] = (),
+        campaign: str | None = None,
+        fetch: Callable[[str, dict], dict] | None = None,
+    ) -> list[dict]:
+        """Fetches the metadata of the stale or flagged records and returns the change log
+
+        Parameters
+        ----------
+        layer : str
+            Layer of the records ("parcela", "recinto")
+        records : Iterable[dict]
+            Data of the records, as passed to `get_metadata`
+        flagged : Iterable[dict]
+            Records to fetch even if they are fresh, e.g. the "changed" features reported by `changes.diff`
+        campaign : str | None
+            Current SIGPAC campaign ("vigencia"). Records stored from another campaign are fetched again
+        fetch : Callable[[str, dict], dict] | None
+            Function that fetches the metadata of a record, `get_metadata` by default
+
+        Returns
+        -------
+        list[dict]
+            "key", "layer", "record", "status" ("added", "changed") and "fields" (the [old, new] values of every changed
+            field) of every record whose metadata changed
+        """
+        if fetch is None:
+            from sigpac_tools.anotate import get_metadata as fetch
+
+        flagged_keys = {
+            record_key(layer, record_from_identity(identity)) for identity in flagged
+        }
+        now = time.time()
+        changelog = []
+        counts = {"fetched": 0, "skipped": 0, "changed": 0, "failed": 0}
+        try:
+            for data in records:
+                key = record_key(layer, data)
+                if key not in flagged_keys and not self.is_stale(
+                    layer, data, campaign, now
+                ):
+                    counts["skipped"] += 1
+                    continue
+                try:
+                    with priority("bulk"):
+                        metadata = fetch(layer, dict(data))
+                except Exception as e:
+                    logger.warning("Metadata not updated", key=key, error=str(e))
+                    counts["failed"] += 1
+                    continue
+                counts["fetched"] += 1
+
+                digest = fingerprint(metadata)
+                previous = self.entries.get(key)
+                self.entries[key] = {
+                    "metadata": metadata,
+                    "fingerprint": digest,
+                    "fetched_at": now,
+                }
+                if previous is not None and previous["fingerprint"] == digest:
+                    continue
+                counts["changed"] += 1
+                changelog.append(
+                    {
+                        "key": key,
+                        "layer": layer,
+                        "record": dict(data),
+                        "status": "added" if previous is None else "changed",
+                        "fields": field_changes(
+                            previous["metadata"] if previous else {}, metadata
+                        ),
+                    }
+                )
+        finally:
+            self.save()
+            for name, value in counts.items():
+                if value:
+                    metrics.increment(f"incremental.{name}", value, layer=layer)
+        logger.info("Metadata store updated", layer=layer, **counts)
+        return changelog
@@ -1,16 +1,23 @@
-import requests
-import structlog
+from typing import Iterable
 
-from sigpac_tools._globals import BASE_URL
+from sigpac_tools import _globals, metrics
+from sigpac_tools._logging import get_logger
+from sigpac_tools.models import FeatureCollection, Geometry
+from sigpac_tools.simplify import vertex_owners
+from sigpac_tools.transport import get_json, iter_json_items
 from sigpac_tools.utils import lng_lat_to_tile, transform_coords
 
-logger = structlog.get_logger()
+logger = get_logger()
 
 
 def __locate_in_feature_collection(
-    reference: int, layer: str, featureCollection: dict
+    reference: int,
+    layer: str,
+    features: Iterable[dict],
+    tolerance: float | None = None,
+    precision: int | None = None,
 ) -> dict | None:
-    """Locates the given reference in the feature collection given the layer to search from
+    """Locates the given reference in the features of a collection given the layer to search from
 
     Parameters
     ----------
@@ -18,24 +25,49 @@ def __locate_in_feature_collection(
         Reference to search
     layer : str
         Layer to search from ("parcela", "recinto")
-    featureCollection : dict
-        Geojson feature collection to search from
+    features : Iterable[dict]
+        Geojson features to search from. The scan stops at the found feature, so they can be streamed. With a tolerance, they
+        must be a list of all the features of the collection
+    tolerance : float | None
+        If set, the geometry is simplified to this tolerance in EPSG:3857 units, preserving the borders shared with the other
+        features
+    precision : int | None
+        If set, the coordinates are rounded to this number of decimals
 
     Returns:
     dict | None
         Geojson geometry of the found reference. If not found, returns `None`
     """
-    for feature in featureCollection["features"]:
-        if feature["properties"][layer] == reference:
-            projection = "epsg:4326"
-            transform_coords(feature, "epsg:4326")
-            geom = feature["geometry"]
-            geom["CRS"] = projection
-            return geom
-    return None
-
-
-def geometry_from_coords(layer: str, lat: float, lon: float, reference: int) -> dict:
+    with metrics.span("feature.scan", layer=layer) as span:
+        scanned = 0
+        for scanned, feature in enumerate(features, 1):
+            if feature["properties"][layer] == reference:
+                break
+        else:
+            span.set("features", scanned)
+            return None
+        span.set("features", scanned)
+
+    projection = "epsg:4326"
+    with metrics.span("reprojection", layer=layer):
+        owners = vertex_owners(features) if tolerance else None
+        transform_coords(feature, "epsg:4326", tolerance, precision, owners)
+    geom = feature["geometry"]
+    geom["CRS"] = projection
+    return geom
+
+
+@metrics.timed("locate")
+def geometry_from_coords(
+    layer: str,
+    lat: float,
+    lon: float,
+    reference: int,
+    compact: bool = False,
+    tolerance: float | None = None,
+    precision: int | None = None,
+    zoom: int = 15,
+) -> dict | Geometry | FeatureCollection:
     """Gets the geometry of the given coordinates and reference in the given layer
 
     Parameters
@@ -48,10 +80,21 @@ def geometry_from_coords(layer: str, lat: float, lon: float, reference: int) ->
         Longitude of the location
     reference : int
         Reference to search for
+    compact : bool
+        If `True`, returns the compact model (`Geometry` or `FeatureCollection`) instead of the GeoJSON dictionaries
+    tolerance : float | None
+        If set, the geometry is simplified with the Douglas-Peucker algorithm to this tolerance in EPSG:3857 units, which are
+        about 0.72-0.81 m on the ground at the latitudes of Spain (1 unit is cos(latitude) meters). Borders shared with other
+        features of the layer are simplified the same way in all of them, so neighbouring geometries still match
+    precision : int | None
+        If set, the coordinates are rounded to this number of decimals (6 decimals are about 10 cm)
+    zoom : int
+        Zoom level of the tile to search in. Coarser tiles hold more features, so fewer requests cover an area, but the
+        service may not serve them (see `area.features_in_area`)
 
     Returns
     -------
-    dict
+    dict | Geometry | FeatureCollection
         Geojson geometry of the found reference
 
     Raises
@@ -64,33 +107,64 @@ def geometry_from_coords(layer: str, lat: float, lon: float, reference: int) ->
     if not layer or not lat or not lon:
         raise ValueError("Layer, latitude or longitude not specified")
 
-    tile_x, tile_y = lng_lat_to_tile(lon, lat, 15)
-
-    response = requests.get(
-        f"{BASE_URL}/vectorsdg/vector/{layer}@3857/15.{tile_x}.{tile_y}.geojson"
-    )
+    with metrics.span("tile.lookup", layer=layer):
+        tile_x, tile_y = lng_lat_to_tile(lon, lat, zoom)
+        url = f"{_globals.BASE_URL}/vectorsdg/vector/{layer}@3857/{zoom}.{tile_x}.{tile_y}.geojson"
 
-    geojson_features = response.json()
+        # Without simplification only the requested feature is needed, so a tile fetched from the network is streamed and
+        # the scan stops at it
+        streamed = bool(reference) and not tolerance and layer in ["parcela", "recinto"]
+        geojson_features = None if streamed else get_json(url)
 
     if not reference:
         logger.info(
-            f"No reference specified. Returning all features in the layer {layer} for coordinates ({lat}, {lon})"
+            "No reference specified. Returning all features in the layer",
+            layer=layer,
+            lat=lat,
+            lon=lon,
         )
+        if compact and geojson_features is not None:
+            return FeatureCollection.from_geojson(geojson_features)
         return geojson_features
 
     if layer in ["parcela", "recinto"]:
-        logger.info(f"Searching for reference {reference} in the layer {layer}...")
-        result = __locate_in_feature_collection(
-            reference=reference, layer=layer, featureCollection=geojson_features
+        logger.info(
+            "Searching for reference in the layer", reference=reference, layer=layer
+        )
+        features = (
+            iter_json_items(url, "features")
+            if streamed
+            else geojson_features["features"]
         )
+        try:
+            result = __locate_in_feature_collection(
+                reference=reference,
+                layer=layer,
+                features=features,
+                tolerance=tolerance,
+                precision=precision,
+            )
+        finally:
+            if streamed:
+                features.close()
         if not result:
             logger.warning(
-                f"Reference '{reference}' not found in the layer '{layer}' at coordinates ({lat}, {lon})"
+                "Reference not found in the layer",
+                reference=reference,
+                layer=layer,
+                lat=lat,
+                lon=lon,
             )
         else:
             logger.info(
-                f"Reference '{reference}' found in the layer '{layer}' at coordinates ({lat}, {lon})"
+                "Reference found in the layer",
+                reference=reference,
+                layer=layer,
+                lat=lat,
+                lon=lon,
             )
+            if compact:
+                return Geometry.from_geojson(result)
         return result
 
     else:
@@ -0,0 +1,353 @@
+import functools
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets exposed by the Prometheus hook
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_hooks = []
+
+
+class MetricsHook:
+    """Interface of the hooks that receive the instrumentation of `sigpac_tools`
+
+    Spans measure the wall time of a phase ("http.fetch", "json.decode", "tile.lookup", "feature.scan", "reprojection", ...)
+    and counters accumulate values ("http.requests", "http.bytes", "cache.hit", "cache.miss", ...).
+    """
+
+    def on_span(
+        self, name: str, start: float, duration: float, attributes: dict
+    ) -> None:
+        """Called when a span ends
+
+        Parameters
+        ----------
+        name : str
+            Name of the span
+        start : float
+            Start of the span, as returned by `time.time()`
+        duration : float
+            Duration of the span in seconds
+        attributes : dict
+            Attributes of the span
+        """
+
+    def on_counter(self, name: str, value: float, attributes: dict) -> None:
+        """Called when a counter is incremented
+
+        Parameters
+        ----------
+        name : str
+            Name of the counter
+        value : float
+            Increment of the counter
+        attributes : dict
+            Attributes of the increment
+        """
+
+
+class CallbackHook(MetricsHook):
+    """Hook that forwards spans and counters to the given callables
+
+    Parameters
+    ----------
+    on_span : Callable | None
+        Called with (name, start, duration, attributes) when a span ends
+    on_counter : Callable | None
+        Called with (name, value, attributes) when a counter is incremented
+    """
+
+    def __init__(self, on_span=None, on_counter=None):
+        self._on_span = on_span
+        self._on_counter = on_counter
+
+    def on_span(self, name, start, duration, attributes):
+        if self._on_span:
+            self._on_span(name, start, duration, attributes)
+
+    def on_counter(self, name, value, attributes):
+        if self._on_counter:
+            self._on_counter(name, value, attributes)
+
+
+def _labels(attributes: dict) -> str:
+    if not attributes:
+        return ""
+    pairs = ",".join(
+        f'{key}="{str(value)}"'.replace("\n", " ")
+        for key, value in sorted(attributes.items())
+    )
+    return "{" + pairs + "}"
+
+
+def _metric_name(name: str) -> str:
+    return "sigpac_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+class PrometheusHook(MetricsHook):
+    """Hook that aggregates spans and counters and renders them in the Prometheus text exposition format
+
+    Spans become the histogram `sigpac_span_duration_seconds` labelled by span name, counters become `sigpac_<name>_total`.
+    If the "cache.hit" and "cache.miss" counters are present, `sigpac_cache_hit_ratio` is also rendered.
+
+    Parameters
+    ----------
+    buckets : tuple[float, ...]
+        Upper bounds of the latency histogram buckets in seconds
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = {}
+
+    def on_span(self, name, start, duration, attributes):
+        with self._lock:
+            histogram = self._spans.get(name)
+            if histogram is None:
+                histogram = self._spans[name] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += 1
+            histogram[2] += duration
+
+    def on_counter(self, name, value, attributes):
+        key = (name, tuple(sorted(attributes.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counter(self, name: str, **attributes) -> float:
+        """Returns the current value of the given counter, summing every attribute set if none is given"""
+        with self._lock:
+            return sum(
+                value
+                for (counter, attrs), value in self._counters.items()
+                if counter == name
+                and all(dict(attrs).get(k) == v for k, v in attributes.items())
+            )
+
+    def render(self) -> str:
+        """Renders the aggregated metrics in the Prometheus text exposition format
+
+        Returns
+        -------
+        str
+            Metrics in the Prometheus text format
+        """
+        lines = []
+        with self._lock:
+            if self._spans:
+                lines.append(
+                    "# HELP sigpac_span_duration_seconds Wall time of the instrumented phases"
+                )
+                lines.append("# TYPE sigpac_span_duration_seconds histogram")
+            for name, (buckets, count, total) in sorted(self._spans.items()):
+                for bound, bucket in zip(self.buckets, buckets):
+                    labels = _labels({"span": name, "le": bound})
+                    lines.append(
+                        f"sigpac_span_duration_seconds_bucket{labels} {bucket}"
+                    )
+                labels = _labels({"span": name, "le": "+Inf"})
+                lines.append(f"sigpac_span_duration_seconds_bucket{labels} {count}")
+                labels = _labels({"span": name})
+                lines.append(f"sigpac_span_duration_seconds_count{labels} {count}")
+                lines.append(f"sigpac_span_duration_seconds_sum{labels} {total}")
+
+            declared = set()
+            for (name, attributes), value in sorted(self._counters.items()):
+                metric = _metric_name(name) + "_total"
+                if metric not in declared:
+                    declared.add(metric)
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}{_labels(dict(attributes))} {value}")
+
+        hits, misses = self.counter("cache.hit"), self.counter("cache.miss")
+        if hits or misses:
+            lines.append("# TYPE sigpac_cache_hit_ratio gauge")
+            lines.append(f"sigpac_cache_hit_ratio {hits / (hits + misses)}")
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryHook(MetricsHook):
+    """Hook that exports spans and counters through OpenTelemetry. Requires `opentelemetry-api`
+
+    Parameters
+    ----------
+    tracer_provider : TracerProvider | None
+        Tracer provider to use, the global one by default
+    meter_provider : MeterProvider | None
+        Meter provider to use, the global one by default
+    """
+
+    def __init__(self, tracer_provider=None, meter_provider=None):
+        from opentelemetry import metrics, trace
+
+        self._tracer = trace.get_tracer("sigpac_tools", tracer_provider=tracer_provider)
+        self._meter = metrics.get_meter("sigpac_tools", meter_provider=meter_provider)
+        self._counters = {}
+
+    def on_span(self, name, start, duration, attributes):
+        start_ns = int(start * 1e9)
+        span = self._tracer.start_span(
+            name, start_time=start_ns, attributes=_otel_attributes(attributes)
+        )
+        span.end(end_time=start_ns + int(duration * 1e9))
+
+    def on_counter(self, name, value, attributes):
+        counter = self._counters.get(name)
+        if counter is None:
+            counter = self._counters[name] = self._meter.create_counter(
+                _metric_name(name)
+            )
+        counter.add(value, attributes=_otel_attributes(attributes))
+
+
+def _otel_attributes(attributes: dict) -> dict:
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items()
+        if value is not None
+    }
+
+
+class _NullSpan:
+    """Span returned while no hook is registered. It does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, key: str, value) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "attributes", "start", "wall_start")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        for hook in _hooks:
+            hook.on_span(self.name, self.wall_start, duration, self.attributes)
+        return False
+
+    def set(self, key: str, value) -> None:
+        """Sets an attribute of the span"""
+        self.attributes[key] = value
+
+
+def add_hook(hook: MetricsHook) -> MetricsHook:
+    """Registers a hook to receive the spans and counters. Instrumentation is disabled while no hook is registered
+
+    Parameters
+    ----------
+    hook : MetricsHook
+        Hook to register
+
+    Returns
+    -------
+    MetricsHook
+        The registered hook
+    """
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook: MetricsHook) -> None:
+    """Unregisters the given hook
+
+    Parameters
+    ----------
+    hook : MetricsHook
+        Hook to unregister
+    """
+    _hooks.remove(hook)
+
+
+def enabled() -> bool:
+    """Returns whether any hook is registered"""
+    return bool(_hooks)
+
+
+def span(name: str, **attributes):
+    """Returns a context manager that measures the wall time of the block as the span `name`
+
+    While no hook is registered it returns a shared no-op span, so the instrumentation costs a list check.
+
+    Parameters
+    ----------
+    name : str
+        Name of the span
+    **attributes
+        Attributes of the span
+
+    Returns
+    -------
+    context manager
+        Span, whose `set` method adds attributes from inside the block
+    """
+    if not _hooks:
+        return _NULL_SPAN
+    return _Span(name, attributes)
+
+
+def increment(name: str, value: float = 1, **attributes) -> None:
+    """Increments the counter `name` in every registered hook
+
+    Parameters
+    ----------
+    name : str
+        Name of the counter
+    value : float
+        Increment
+    **attributes
+        Attributes of the increment
+    """
+    for hook in _hooks:
+        hook.on_counter(name, value, attributes)
+
+
+def timed(name: str):
+    """Decorator that measures every call of the decorated function as the span `name`
+
+    Parameters
+    ----------
+    name : str
+        Name of the span
+
+    Returns
+    -------
+    Callable
+        Decorator
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,269 @@
+import argparse
+import random
+import sys
+import threading
+import time
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from sigpac_tools import _globals
+from sigpac_tools._logging import get_logger
+
+logger = get_logger()
+
+
+class _RateLimiter:
+    """Token bucket that allows `rate` requests per second with bursts of up to `rate` requests"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def _not_modified(headers, etag: str, mtime: int) -> bool:
+    """Returns whether the conditional headers of a request match the current validators of the response"""
+    if "If-None-Match" in headers:
+        return etag in [tag.strip() for tag in headers["If-None-Match"].split(",")]
+    if "If-Modified-Since" in headers:
+        try:
+            return (
+                mtime <= parsedate_to_datetime(headers["If-Modified-Since"]).timestamp()
+            )
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """Ignores the clients that close the connection before reading the whole response, like the streamed tile
+        lookups that stop at the feature they look for"""
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockSigpacServer:
+    """Local stand-in of the SIGPAC services that replays recorded responses
+
+    The responses are read from a directory that mirrors the paths of the SIGPAC services, e.g.
+    `<fixtures>/fega/serviciosvisorsigpac/query/provincias/1` or `<fixtures>/vectorsdg/vector/parcela@3857/15.1.2.geojson`.
+    Paths without a recorded response are answered with a 404 and a `null` body. Responses carry an ETag (CRC32 of the body)
+    and a Last-Modified (modification time of the file) validator, and conditional requests are answered with a 304.
+
+    Used as a context manager, the server is started and `sigpac_tools` is pointed at it until the block exits:
+
+        with MockSigpacServer("tests/fixtures/sigpac", latency=0.05):
+            search({"community": 1})
+
+    Parameters
+    ----------
+    fixtures_dir : str | Path
+        Directory with the recorded responses
+    host : str
+        Host to listen on
+    port : int
+        Port to listen on, 0 picks a free port
+    latency : float
+        Seconds to wait before answering every request
+    jitter : float
+        Maximum extra seconds added at random to the latency
+    error_rate : float
+        Probability of answering a request with a 503 error
+    max_requests_per_second : float | None
+        If set, requests over this rate are answered with a 429 error
+    seed : int | None
+        Seed of the random generator used for the jitter and the errors
+    """
+
+    def __init__(
+        self,
+        fixtures_dir: str | Path,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        max_requests_per_second: float | None = None,
+        seed: int | None = None,
+    ):
+        self.fixtures_dir = Path(fixtures_dir).resolve()
+        if not self.fixtures_dir.is_dir():
+            raise ValueError(f"Fixtures directory {self.fixtures_dir} does not exist")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.limiter = (
+            _RateLimiter(max_requests_per_second) if max_requests_per_second else None
+        )
+        self.random = random.Random(seed)
+        self.stats = {
+            "requests": 0,
+            "not_found": 0,
+            "not_modified": 0,
+            "errors": 0,
+            "throttled": 0,
+        }
+        self._stats_lock = threading.Lock()
+        self._httpd = _Server((host, port), self._handler())
+        self._thread = None
+        self._previous_base_url = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server, to be used in place of `BASE_URL`"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, headers: dict | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                server._count("requests")
+                if server.limiter and not server.limiter.acquire():
+                    server._count("throttled")
+                    self._send(
+                        429, b'{"error": "Too Many Requests"}', {"Retry-After": "1"}
+                    )
+                    return
+                delay = server.latency + server.random.uniform(0, server.jitter)
+                if delay:
+                    time.sleep(delay)
+                if server.error_rate and server.random.random() < server.error_rate:
+                    server._count("errors")
+                    self._send(503, b'{"error": "Service Unavailable"}')
+                    return
+                path = server.resolve(self.path)
+                if path is None:
+                    server._count("not_found")
+                    self._send(404, b"null")
+                    return
+                content = path.read_bytes()
+                mtime = int(path.stat().st_mtime)
+                validators = {
+                    "ETag": f'"{zlib.crc32(content):08x}"',
+                    "Last-Modified": formatdate(mtime, usegmt=True),
+                }
+                if _not_modified(self.headers, validators["ETag"], mtime):
+                    server._count("not_modified")
+                    self._send(304, b"", validators)
+                    return
+                self._send(200, content, validators)
+
+        return Handler
+
+    def resolve(self, request_path: str) -> Path | None:
+        """Returns the recorded response for the given request path, or `None` if there is not one
+
+        Parameters
+        ----------
+        request_path : str
+            Path of the request, including the query string if any
+
+        Returns
+        -------
+        Path | None
+            File with the recorded response
+        """
+        relative = unquote(urlsplit(request_path).path).lstrip("/")
+        path = (self.fixtures_dir / relative).resolve()
+        if not path.is_relative_to(self.fixtures_dir) or not path.is_file():
+            return None
+        return path
+
+    def start(self) -> "MockSigpacServer":
+        """Starts serving in a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info("Mock SIGPAC server listening", url=self.url)
+        return self
+
+    def stop(self) -> None:
+        """Stops the server and releases its socket"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "MockSigpacServer":
+        self.start()
+        self._previous_base_url = _globals.BASE_URL
+        _globals.BASE_URL = self.url
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _globals.BASE_URL = self._previous_base_url
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in of the SIGPAC services"
+    )
+    parser.add_argument("fixtures", help="Directory with the recorded responses")
+    parser.add_argument("--host", default="127.0.0.1", metavar="STRING")
+    parser.add_argument("--port", type=int, default=8000, metavar="INT")
+    parser.add_argument("--latency", type=float, default=0.0, metavar="FLOAT")
+    parser.add_argument("--jitter", type=float, default=0.0, metavar="FLOAT")
+    parser.add_argument("--error-rate", type=float, default=0.0, metavar="FLOAT")
+    parser.add_argument(
+        "--max-requests-per-second", type=float, default=None, metavar="FLOAT"
+    )
+    args = parser.parse_args()
+
+    server = MockSigpacServer(
+        args.fixtures,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        max_requests_per_second=args.max_requests_per_second,
+    )
+    print(
+        f"Serving {server.fixtures_dir} on {server.url} (SIGPAC_BASE_URL={server.url})"
+    )
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
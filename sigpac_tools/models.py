@@ -0,0 +1,421 @@
+from array import array
+
+# Nesting depth of the coordinates of every GeoJSON geometry type
+GEOMETRY_DEPTH = {
+    "Point": 0,
+    "MultiPoint": 1,
+    "LineString": 1,
+    "MultiLineString": 2,
+    "Polygon": 2,
+    "MultiPolygon": 3,
+}
+
+
+def geojson_rings(geometry: dict) -> list:
+    """Returns the rings (or lines) of a GeoJSON geometry, as lists of positions
+
+    Parameters
+    ----------
+    geometry : dict
+        GeoJSON geometry
+
+    Returns
+    -------
+    list
+        Rings of the polygons, lines of the line strings or nothing for points
+    """
+    depth = GEOMETRY_DEPTH.get(geometry["type"], 0)
+    coordinates = geometry["coordinates"]
+    if depth == 1:
+        return [coordinates]
+    if depth == 2:
+        return coordinates
+    if depth == 3:
+        return [ring for polygon in coordinates for ring in polygon]
+    return []
+
+
+# Marks the properties that were not present in the original GeoJSON
+_MISSING = object()
+
+
+class ParcelProperties:
+    """Properties of a feature of the "parcela" layer
+
+    Keys of the original GeoJSON properties that are not slots of the record are kept in `extra`
+    """
+
+    __slots__ = (
+        "provincia",
+        "municipio",
+        "agregado",
+        "zona",
+        "poligono",
+        "parcela",
+        "superficie",
+        "extra",
+    )
+
+    def __init__(self, **properties):
+        for key in ParcelProperties.__slots__[:-1]:
+            setattr(self, key, properties.pop(key, _MISSING))
+        self.extra = properties or None
+
+    @classmethod
+    def from_dict(cls, properties: dict) -> "ParcelProperties":
+        """Builds the record from the properties of a GeoJSON feature
+
+        Parameters
+        ----------
+        properties : dict
+            Properties of the GeoJSON feature
+
+        Returns
+        -------
+        ParcelProperties
+            Record with the given properties
+        """
+        return cls(**properties)
+
+    def to_dict(self) -> dict:
+        """Returns the properties as a GeoJSON properties dictionary
+
+        Returns
+        -------
+        dict
+            Properties of the record, without the keys that were not present originally
+        """
+        properties = {
+            key: value
+            for key in ParcelProperties.__slots__[:-1]
+            if (value := getattr(self, key)) is not _MISSING
+        }
+        if self.extra:
+            properties.update(self.extra)
+        return properties
+
+    def get(self, key: str, default=None):
+        """Returns the value of the given property, mirroring `dict.get`"""
+        if key in ParcelProperties.__slots__[:-1]:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        return (self.extra or {}).get(key, default)
+
+    def __getitem__(self, key: str):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ParcelProperties):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class EnclosureProperties(ParcelProperties):
+    """Properties of a feature of the "recinto" layer"""
+
+    __slots__ = (
+        "recinto",
+        "pendiente_media",
+        "coef_regadio",
+        "uso_sigpac",
+        "incidencias",
+        "region",
+    )
+
+    def __init__(self, **properties):
+        for key in EnclosureProperties.__slots__:
+            setattr(self, key, properties.pop(key, _MISSING))
+        super().__init__(**properties)
+
+    def to_dict(self) -> dict:
+        properties = super().to_dict()
+        for key in EnclosureProperties.__slots__:
+            if (value := getattr(self, key)) is not _MISSING:
+                properties[key] = value
+        return properties
+
+    def get(self, key: str, default=None):
+        if key in EnclosureProperties.__slots__:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        return super().get(key, default)
+
+
+def properties_from_dict(properties: dict | None) -> ParcelProperties | dict | None:
+    """Builds the most specific properties record for the given GeoJSON properties
+
+    Properties of the "recinto" layer become `EnclosureProperties`, the ones of the "parcela" layer `ParcelProperties`.
+    Any other properties (search results, for example) are returned unchanged.
+
+    Parameters
+    ----------
+    properties : dict | None
+        Properties of the GeoJSON feature
+
+    Returns
+    -------
+    ParcelProperties | dict | None
+        Properties record or the original properties
+    """
+    if not properties:
+        return properties
+    if "recinto" in properties:
+        return EnclosureProperties.from_dict(properties)
+    if "parcela" in properties:
+        return ParcelProperties.from_dict(properties)
+    return properties
+
+
+class Geometry:
+    """GeoJSON geometry with its coordinates held in a flat buffer
+
+    The coordinates of every position are stored one after the other in `coords`. `ring_offsets` holds the index of the first
+    position of every ring (or line) plus the total number of positions, and `part_offsets` the index of the first ring of every
+    polygon of a "MultiPolygon". Numbers are stored as float64, so integer coordinates come back as floats.
+    """
+
+    __slots__ = ("type", "dims", "coords", "ring_offsets", "part_offsets", "extra")
+
+    def __init__(
+        self,
+        type: str,
+        coords: array,
+        ring_offsets: array | None = None,
+        part_offsets: array | None = None,
+        dims: int = 2,
+        extra: dict | None = None,
+    ):
+        self.type = type
+        self.dims = dims
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        self.part_offsets = part_offsets
+        self.extra = extra
+
+    @classmethod
+    def from_geojson(cls, geometry: dict) -> "Geometry":
+        """Builds the compact geometry from a GeoJSON geometry
+
+        Parameters
+        ----------
+        geometry : dict
+            GeoJSON geometry
+
+        Returns
+        -------
+        Geometry
+            Compact geometry
+
+        Raises
+        ------
+        KeyError
+            If the geometry type is not supported
+        """
+        geom_type = geometry["type"]
+        if geom_type not in GEOMETRY_DEPTH:
+            raise KeyError(
+                f"Geometry type not supported. Supported types: {list(GEOMETRY_DEPTH)}"
+            )
+        depth = GEOMETRY_DEPTH[geom_type]
+        coordinates = geometry["coordinates"]
+        extra = {k: v for k, v in geometry.items() if k not in ("type", "coordinates")}
+
+        coords = array("d")
+        if depth == 0:
+            coords.extend(coordinates)
+            return cls(geom_type, coords, dims=len(coordinates), extra=extra or None)
+
+        rings = [coordinates] if depth == 1 else coordinates
+        part_offsets = None
+        if depth == 3:
+            part_offsets = array("L", [0])
+            polygons, rings = rings, []
+            for polygon in polygons:
+                rings.extend(polygon)
+                part_offsets.append(len(rings))
+
+        dims = 2
+        ring_offsets = array("L", [0])
+        for ring in rings:
+            for position in ring:
+                coords.extend(position)
+            if ring:
+                dims = len(ring[0])
+            ring_offsets.append(ring_offsets[-1] + len(ring))
+        return cls(geom_type, coords, ring_offsets, part_offsets, dims, extra or None)
+
+    def rings(self) -> list[list[list[float]]]:
+        """Returns the coordinates of every ring (or line) as lists of positions"""
+        dims, coords = self.dims, self.coords
+        return [
+            [
+                coords[i : i + dims].tolist()
+                for i in range(start * dims, end * dims, dims)
+            ]
+            for start, end in zip(self.ring_offsets, self.ring_offsets[1:])
+        ]
+
+    def to_geojson(self) -> dict:
+        """Returns the geometry as a GeoJSON geometry
+
+        Returns
+        -------
+        dict
+            GeoJSON geometry
+        """
+        depth = GEOMETRY_DEPTH[self.type]
+        if depth == 0:
+            coordinates = self.coords.tolist()
+        else:
+            rings = self.rings()
+            if depth == 1:
+                coordinates = rings[0]
+            elif depth == 2:
+                coordinates = rings
+            else:
+                coordinates = [
+                    rings[start:end]
+                    for start, end in zip(self.part_offsets, self.part_offsets[1:])
+                ]
+        geometry = {"type": self.type, "coordinates": coordinates}
+        if self.extra:
+            geometry.update(self.extra)
+        return geometry
+
+    def as_numpy(self):
+        """Returns a NumPy view (no copy) of the coordinates with one row per position. Requires NumPy"""
+        import numpy as np
+
+        return np.frombuffer(self.coords, dtype=np.float64).reshape(-1, self.dims)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Geometry):
+            other = other.to_geojson()
+        return self.to_geojson() == other
+
+    def __repr__(self) -> str:
+        return (
+            f"Geometry(type={self.type!r}, positions={len(self.coords) // self.dims})"
+        )
+
+
+class Feature:
+    """GeoJSON feature with compact geometry and properties"""
+
+    __slots__ = ("geometry", "properties", "extra")
+
+    def __init__(
+        self,
+        geometry: Geometry | None,
+        properties: ParcelProperties | dict | None,
+        extra: dict | None = None,
+    ):
+        self.geometry = geometry
+        self.properties = properties
+        self.extra = extra
+
+    @classmethod
+    def from_geojson(cls, feature: dict) -> "Feature":
+        """Builds the compact feature from a GeoJSON feature
+
+        Parameters
+        ----------
+        feature : dict
+            GeoJSON feature
+
+        Returns
+        -------
+        Feature
+            Compact feature
+        """
+        geometry = feature.get("geometry")
+        extra = {
+            k: v
+            for k, v in feature.items()
+            if k not in ("type", "geometry", "properties")
+        }
+        return cls(
+            Geometry.from_geojson(geometry) if geometry else geometry,
+            properties_from_dict(feature.get("properties")),
+            extra or None,
+        )
+
+    def to_geojson(self) -> dict:
+        """Returns the feature as a GeoJSON feature
+
+        Returns
+        -------
+        dict
+            GeoJSON feature
+        """
+        properties = self.properties
+        if isinstance(properties, ParcelProperties):
+            properties = properties.to_dict()
+        feature = {
+            "type": "Feature",
+            "geometry": self.geometry.to_geojson()
+            if isinstance(self.geometry, Geometry)
+            else self.geometry,
+            "properties": properties,
+        }
+        if self.extra:
+            feature.update(self.extra)
+        return feature
+
+
+class FeatureCollection:
+    """GeoJSON feature collection made of compact features"""
+
+    __slots__ = ("features", "extra")
+
+    def __init__(self, features: list[Feature], extra: dict | None = None):
+        self.features = features
+        self.extra = extra
+
+    @classmethod
+    def from_geojson(cls, collection: dict) -> "FeatureCollection":
+        """Builds the compact collection from a GeoJSON feature collection
+
+        Parameters
+        ----------
+        collection : dict
+            GeoJSON feature collection
+
+        Returns
+        -------
+        FeatureCollection
+            Compact feature collection
+        """
+        extra = {k: v for k, v in collection.items() if k not in ("type", "features")}
+        return cls(
+            [Feature.from_geojson(feature) for feature in collection["features"]],
+            extra or None,
+        )
+
+    def to_geojson(self) -> dict:
+        """Returns the collection as a GeoJSON feature collection
+
+        Returns
+        -------
+        dict
+            GeoJSON feature collection
+        """
+        collection = {
+            "type": "FeatureCollection",
+            "features": [feature.to_geojson() for feature in self.features],
+        }
+        if self.extra:
+            collection.update(self.extra)
+        return collection
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def __iter__(self):
+        return iter(self.features)
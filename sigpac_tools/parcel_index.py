@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from sigpac_tools._logging import get_logger
+
+logger = get_logger()
+
+_active = []
+
+
+def _key(province: int, municipality: int, polygon: int, parcel: int) -> str:
+    return f"{province},{municipality},{polygon},{parcel}"
+
+
+class ParcelIndex:
+    """Bounding boxes of the SIGPAC parcels, to locate a parcel without searching it
+
+    The index maps (province, municipality, polygon, parcel) to the (min longitude, min latitude, max longitude, max
+    latitude) of the parcel. Used as a context manager, the index is filled with every parcel listed by the `search`
+    responses of the block (the parcels of a polygon or the enclosures of a parcel), `find_from_cadastral_registry` takes
+    the location of the parcels from it instead of searching them, and it is saved to its file when the block exits.
+
+    Parameters
+    ----------
+    path : str | Path | None
+        JSON file of the index. It is loaded if it exists and created on the first `save`. `None` for an index in memory
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path is not None else None
+        self.entries = {}
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def get(
+        self, province: int, municipality: int, polygon: int, parcel: int
+    ) -> tuple[float, float, float, float] | None:
+        """Returns the bounding box of the parcel, `None` if it is not in the index"""
+        bbox = self.entries.get(_key(province, municipality, polygon, parcel))
+        return tuple(bbox) if bbox else None
+
+    def add(
+        self,
+        province: int,
+        municipality: int,
+        polygon: int,
+        parcel: int,
+        bbox: tuple[float, float, float, float],
+    ) -> None:
+        """Stores the bounding box of the parcel, replacing the previous one"""
+        with self._lock:
+            self.entries[_key(province, municipality, polygon, parcel)] = list(bbox)
+
+    def observe(self, data: dict, geojson: dict | None) -> int:
+        """Adds the parcels listed by a `search` response
+
+        Parameters
+        ----------
+        data : dict
+            Location searched, as passed to `search`
+        geojson : dict | None
+            Response of the search. Only the parcels of a polygon and the enclosures of a parcel are used
+
+        Returns
+        -------
+        int
+            Number of parcels added
+        """
+        if not geojson or not geojson.get("features"):
+            return 0
+        try:
+            location = [int(data[k]) for k in ("province", "municipality", "polygon")]
+        except (KeyError, TypeError, ValueError):
+            return 0
+
+        boxes = {}
+        if data.get("parcel"):
+            # Enclosures of the parcel, whose boxes form the box of the parcel
+            box = None
+            for feature in geojson["features"]:
+                p = feature["properties"]
+                x1, y1, x2, y2 = p["x1"], p["y1"], p["x2"], p["y2"]
+                box = (
+                    (x1, y1, x2, y2)
+                    if box is None
+                    else (
+                        min(box[0], x1),
+                        min(box[1], y1),
+                        max(box[2], x2),
+                        max(box[3], y2),
+                    )
+                )
+            boxes[int(data["parcel"])] = box
+        else:
+            for feature in geojson["features"]:
+                p = feature["properties"]
+                boxes[p["codigo"]] = (p["x1"], p["y1"], p["x2"], p["y2"])
+        for parcel, box in boxes.items():
+            self.add(*location, parcel, box)
+        return len(boxes)
+
+    def crawl(self, data: dict, workers: int = 16) -> int:
+        """Fills the index with every parcel under the given location, with `search.fan_out_search`
+
+        Parameters
+        ----------
+        data : dict
+            Location to crawl, with the keys of `search` (community, province, municipality, polygon)
+        workers : int
+            Number of concurrent searches
+
+        Returns
+        -------
+        int
+            Number of parcels added
+        """
+        from sigpac_tools.search import fan_out_search
+
+        added = 0
+        for location, geojson in fan_out_search(data, depth="parcel", workers=workers):
+            if "polygon" in location:
+                added += self.observe(location, geojson)
+        logger.info("Parcel index crawled", parcels=added, **data)
+        return added
+
+    def save(self) -> None:
+        """Writes the index to its file, replacing it atomically"""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with self._lock:
+            temporary.write_text(json.dumps(self.entries), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __enter__(self) -> "ParcelIndex":
+        _active.append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _active.remove(self)
+        self.save()
+
+
+def active() -> bool:
+    """Returns whether there is an active index"""
+    return bool(_active)
+
+
+def observe_search(data: dict, geojson: dict | None) -> None:
+    """Adds the parcels listed by a `search` response to the active indexes"""
+    for index in _active:
+        index.observe(data, geojson)
+
+
+def lookup(
+    province: int, municipality: int, polygon: int, parcel: int
+) -> tuple[float, float, float, float] | None:
+    """Returns the bounding box of the parcel from the active indexes, `None` if none of them has it"""
+    for index in reversed(_active):
+        bbox = index.get(province, municipality, polygon, parcel)
+        if bbox is not None:
+            return bbox
+    return None
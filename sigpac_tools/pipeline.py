@@ -0,0 +1,328 @@
+import os
+import queue
+import threading
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import Iterator
+
+from sigpac_tools import _globals, metrics
+from sigpac_tools._logging import get_logger
+from sigpac_tools.models import Geometry
+from sigpac_tools.simplify import simplify_geometry, vertex_owners
+from sigpac_tools.transport import decode_json, get_content, priority
+from sigpac_tools.utils import lng_lat_to_tile, transform_flat
+
+logger = get_logger()
+
+LAYERS = ("parcela", "recinto")
+
+# Marks the end of the tiles submitted by the feeder thread
+_END = object()
+
+
+def _share(content: bytes) -> shared_memory.SharedMemory:
+    """Copies the given bytes to a new shared memory block"""
+    block = shared_memory.SharedMemory(create=True, size=max(len(content), 1))
+    block.buf[: len(content)] = content
+    return block
+
+
+def _reproject_tile(
+    name: str,
+    size: int,
+    layer: str,
+    references: list[int],
+    projection_id: str,
+    tolerance: float | None = None,
+    precision: int | None = None,
+) -> tuple[str | None, list[tuple]]:
+    """Matches the references in the tile stored in the shared memory block `name` and reprojects their geometries
+
+    Runs in the worker processes. The reprojected coordinates of every matched geometry are written one after the other to a new
+    shared memory block, and only its name and the layout of the geometries are sent back to the parent process.
+
+    Returns
+    -------
+    tuple[str | None, list[tuple]]
+        Name of the block with the coordinates (`None` if nothing matched) and the (reference, type, dims, ring_offsets,
+        part_offsets, extra, start, end) layout of every matched geometry, with `start` and `end` indexes of the coordinates
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        content = bytes(block.buf[:size])
+    finally:
+        block.close()
+
+    collection = decode_json(content)
+    features = collection["features"] if collection else []
+    owners = vertex_owners(features) if tolerance else None
+    wanted = set(references)
+    matched = []
+    for feature in features:
+        reference = feature["properties"].get(layer)
+        if reference in wanted:
+            wanted.discard(reference)
+            geometry = feature["geometry"]
+            if tolerance:
+                simplify_geometry(geometry, tolerance, owners)
+            matched.append((reference, Geometry.from_geojson(geometry)))
+            if not wanted:
+                break
+    if not matched:
+        return None, []
+
+    coords = array("d")
+    layout = []
+    for reference, geometry in matched:
+        transform_flat(geometry.coords, geometry.dims, projection_id, precision)
+        start = len(coords)
+        coords.extend(geometry.coords)
+        layout.append(
+            (
+                reference,
+                geometry.type,
+                geometry.dims,
+                geometry.ring_offsets,
+                geometry.part_offsets,
+                geometry.extra,
+                start,
+                len(coords),
+            )
+        )
+
+    output = _share(coords.tobytes())
+    output.close()
+    return output.name, layout
+
+
+def _collect(name: str, layout: list[tuple], projection_id: str) -> dict[int, Geometry]:
+    """Reads the geometries written by `_reproject_tile` and releases their shared memory block"""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        buffer = block.buf.cast("d")
+        geometries = {}
+        for reference, type, dims, rings, parts, extra, start, end in layout:
+            geometries[reference] = Geometry(
+                type,
+                array("d", buffer[start:end]),
+                rings,
+                parts,
+                dims,
+                {**(extra or {}), "CRS": projection_id},
+            )
+        buffer.release()
+    finally:
+        block.close()
+        block.unlink()
+    return geometries
+
+
+def geometries_from_coords(
+    layer: str,
+    points: list[tuple[float, float, int]],
+    processes: int | None = None,
+    io_workers: int = 8,
+    max_pending: int | None = None,
+    projection_id: str = "epsg:4326",
+    compact: bool = False,
+    executor: ProcessPoolExecutor | None = None,
+    tolerance: float | None = None,
+    precision: int | None = None,
+    memory_budget: int | None = None,
+) -> list[dict | Geometry | None] | Iterator[dict | Geometry | None]:
+    """Gets the geometries of many (latitude, longitude, reference) points, spreading the work across every core
+
+    The points are grouped by tile and every tile is fetched once by a pool of I/O threads. The raw tiles are handed to a pool of
+    processes through shared memory, where the references are matched and their geometries reprojected, and the reprojected
+    coordinates come back through shared memory as well. At most `max_pending` tiles are held between the stages: the I/O threads
+    wait for the processes to catch up instead of piling up tiles in memory.
+
+    The spans of the worker processes are not reported to the metrics hooks of the calling process.
+
+    Parameters
+    ----------
+    layer : str
+        Layer to search from ("parcela", "recinto")
+    points : list[tuple[float, float, int]]
+        (latitude, longitude, reference) of every geometry to get
+    processes : int | None
+        Number of worker processes, the number of CPUs by default
+    io_workers : int
+        Number of threads fetching the tiles
+    max_pending : int | None
+        Maximum number of tiles fetched and not yet collected, twice `processes` by default
+    projection_id : str
+        Identifier of the projection of the returned geometries
+    compact : bool
+        If `True`, returns compact `Geometry` objects instead of GeoJSON geometries
+    executor : ProcessPoolExecutor | None
+        Process pool to use instead of starting one, to share its workers between jobs
+    tolerance : float | None
+        If set, geometries are simplified to this tolerance in EPSG:3857 units, as in `geometry_from_coords`
+    precision : int | None
+        If set, coordinates are rounded to this number of decimals, as in `geometry_from_coords`
+    memory_budget : int | None
+        If set, the geometries are kept in a `batch.SpillBuffer` that spills them to disk past this number of bytes, and
+        they are returned as an iterator that streams them from it
+
+    Returns
+    -------
+    list[dict | Geometry | None] | Iterator[dict | Geometry | None]
+        Geometry of every point, in the same order as the points. `None` for the references not found in their tile
+
+    Raises
+    ------
+    ValueError
+        If the latitude, longitude or reference of a point is not specified
+    KeyError
+        If the layer is not supported
+    """
+    if layer not in LAYERS:
+        raise KeyError(
+            f'Layer "{layer}" not supported. Supported layers: "parcela", "recinto"'
+        )
+
+    tiles = {}
+    for i, (lat, lon, reference) in enumerate(points):
+        if not lat or not lon or not reference:
+            raise ValueError(f"Latitude, longitude or reference not specified: {i}")
+        tile = lng_lat_to_tile(lon, lat, 15)
+        tiles.setdefault(tile, {}).setdefault(reference, []).append(i)
+
+    processes = processes or os.cpu_count() or 1
+    slots = threading.BoundedSemaphore(max_pending or 2 * processes)
+    done = queue.Queue()
+    stop = threading.Event()
+    if memory_budget is not None:
+        from sigpac_tools.batch import SpillBuffer
+
+        results = SpillBuffer(memory_budget)
+    else:
+        results = [None] * len(points)
+    base_url = _globals.BASE_URL
+
+    pool = executor or ProcessPoolExecutor(processes, mp_context=get_context("spawn"))
+    io = ThreadPoolExecutor(io_workers, thread_name_prefix="sigpac-io")
+
+    def fetch(tile: tuple[int, int], references: list[int]) -> None:
+        block = None
+        try:
+            with priority("bulk"):
+                content = get_content(
+                    f"{base_url}/vectorsdg/vector/{layer}@3857/15.{tile[0]}.{tile[1]}.geojson"
+                )
+            block = _share(content)
+            future = pool.submit(
+                _reproject_tile,
+                block.name,
+                len(content),
+                layer,
+                references,
+                projection_id,
+                tolerance,
+                precision,
+            )
+            future.add_done_callback(lambda f: done.put((tile, block, f)))
+        except Exception as e:
+            done.put((tile, block, e))
+
+    def feed() -> None:
+        submitted = 0
+        for tile, references in tiles.items():
+            slots.acquire()
+            if stop.is_set():
+                break
+            io.submit(fetch, tile, list(references))
+            submitted += 1
+        done.put((_END, None, submitted))
+
+    with metrics.span("pipeline", layer=layer, points=len(points), tiles=len(tiles)):
+        feeder = threading.Thread(target=feed, name="sigpac-feed", daemon=True)
+        feeder.start()
+        received, expected, error = 0, None, None
+        try:
+            while expected is None or received < expected:
+                tile, block, outcome = done.get()
+                if tile is _END:
+                    expected = outcome
+                    continue
+                received += 1
+                try:
+                    if isinstance(outcome, Exception):
+                        raise outcome
+                    if error is None:
+                        _store(
+                            tile, outcome, tiles, results, layer, projection_id, compact
+                        )
+                    else:
+                        _discard(outcome)
+                except Exception as e:
+                    error = error or e
+                    stop.set()
+                finally:
+                    if block is not None:
+                        block.close()
+                        block.unlink()
+                    slots.release()
+        finally:
+            feeder.join()
+            io.shutdown()
+            if executor is None:
+                pool.shutdown()
+        if error is not None:
+            if memory_budget is not None:
+                results.close()
+            raise error
+
+    if memory_budget is not None:
+        return _stream(results)
+    return results
+
+
+def _stream(results) -> Iterator[dict | Geometry | None]:
+    """Yields the geometries of a `SpillBuffer` and removes its segments once they are consumed"""
+    try:
+        yield from results
+    finally:
+        results.close()
+
+
+def _discard(future: Future) -> None:
+    """Releases the shared memory block of the geometries of a processed tile whose results are not collected"""
+    name, _ = future.result()
+    if name:
+        block = shared_memory.SharedMemory(name=name)
+        block.close()
+        block.unlink()
+
+
+def _store(
+    tile: tuple[int, int],
+    future: Future,
+    tiles: dict,
+    results: list,
+    layer: str,
+    projection_id: str,
+    compact: bool,
+) -> None:
+    """Stores the geometries of a processed tile in the results of the points that requested them"""
+    name, layout = future.result()
+    geometries = _collect(name, layout, projection_id) if name else {}
+    metrics.increment("pipeline.tiles")
+    for reference, indexes in tiles[tile].items():
+        geometry = geometries.get(reference)
+        for i in indexes:
+            results[i] = (
+                geometry.to_geojson()
+                if geometry is not None and not compact
+                else geometry
+            )
+    missing = [reference for reference in tiles[tile] if reference not in geometries]
+    if missing:
+        logger.warning(
+            "References not found in the layer",
+            layer=layer,
+            tile=tile,
+            references=missing,
+        )
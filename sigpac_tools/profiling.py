@@ -0,0 +1,180 @@
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from sigpac_tools import metrics
+from sigpac_tools._logging import get_logger
+
+logger = get_logger()
+
+# Spans of the metrics (see `metrics.MetricsHook`) whose wall time is reported for every phase
+PHASES = {
+    "network": ("http.fetch",),
+    "queueing": ("http.wait",),
+    "decode": ("json.decode",),
+    "reprojection": ("reprojection",),
+    "matching": ("feature.scan", "reverse.index", "reverse.locate"),
+}
+
+
+class Profiler(metrics.MetricsHook):
+    """Context manager that profiles the code run inside it and writes a report
+
+    While it is active, the profiler records:
+
+    - a CPU profile of the calling thread with `cProfile`, also written next to the report as a `.prof` file that can be
+      opened with `pstats` or any of its viewers
+    - the memory allocated by the block with `tracemalloc`: its peak and the lines that allocated the most
+    - the wall time of every phase in `PHASES` and of every span and counter of the metrics, from every thread. Nested spans
+      and the spans of concurrent threads overlap (e.g. a streamed tile is decoded while it is downloaded), so the phases
+      do not add up to the wall time of the block
+
+    The report is a JSON document, also available as `report` once the block exits.
+
+    Parameters
+    ----------
+    path : str | Path | None
+        JSON file of the report. `None` to only keep it in `report`
+    cpu : bool
+        Whether to record the CPU profile
+    memory : bool
+        Whether to trace the memory allocations, which slows down the block
+    top : int
+        Number of functions and allocating lines listed in the report
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        cpu: bool = True,
+        memory: bool = True,
+        top: int = 25,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top
+        self.report = None
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = {}
+        self._profile = None
+        self._tracing = False
+        self._baseline = 0
+        self._start = 0.0
+
+    def on_span(self, name, start, duration, attributes):
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                span = self._spans[name] = {"count": 0, "seconds": 0.0, "max": 0.0}
+            span["count"] += 1
+            span["seconds"] += duration
+            span["max"] = max(span["max"], duration)
+
+    def on_counter(self, name, value, attributes):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def __enter__(self) -> "Profiler":
+        metrics.add_hook(self)
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self.memory:
+            tracemalloc.reset_peak()
+            self._baseline = tracemalloc.get_traced_memory()[0]
+        if self.cpu:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        wall = time.perf_counter() - self._start
+        if self._profile is not None:
+            self._profile.disable()
+        metrics.remove_hook(self)
+
+        report = {
+            "argv": sys.argv,
+            "python": sys.version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "started_at": time.time() - wall,
+            "wall_seconds": wall,
+            "error": repr(exc) if exc is not None else None,
+            "phases": {},
+            "spans": self._spans,
+            "counters": self._counters,
+        }
+        for phase, names in PHASES.items():
+            spans = [self._spans[name] for name in names if name in self._spans]
+            report["phases"][phase] = {
+                "count": sum(span["count"] for span in spans),
+                "seconds": sum(span["seconds"] for span in spans),
+            }
+
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                ]
+            )
+            current, peak = tracemalloc.get_traced_memory()
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+            report["memory"] = {
+                "current_bytes": current - self._baseline,
+                "peak_bytes": peak - self._baseline,
+                "top": [
+                    {
+                        "file": stat.traceback[0].filename,
+                        "line": stat.traceback[0].lineno,
+                        "bytes": stat.size,
+                        "count": stat.count,
+                    }
+                    for stat in snapshot.statistics("lineno")[: self.top]
+                ],
+            }
+
+        if self._profile is not None:
+            stats = pstats.Stats(self._profile)
+            functions = sorted(
+                stats.stats.items(), key=lambda item: item[1][3], reverse=True
+            )
+            report["cpu"] = {
+                "calls": stats.total_calls,
+                "seconds": stats.total_tt,
+                "top": [
+                    {
+                        "function": name,
+                        "file": file,
+                        "line": line,
+                        "calls": calls,
+                        "own_seconds": own,
+                        "cumulative_seconds": cumulative,
+                    }
+                    for (file, line, name), (_, calls, own, cumulative, _) in functions[
+                        : self.top
+                    ]
+                ],
+            }
+
+        self.report = report
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self._profile is not None:
+                report["cpu"]["profile"] = str(self.path.with_suffix(".prof"))
+                self._profile.dump_stats(report["cpu"]["profile"])
+            self.path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+            logger.info("Profile written", path=str(self.path), wall_seconds=wall)
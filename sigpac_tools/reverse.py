@@ -0,0 +1,202 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+from sigpac_tools import _globals, metrics, transport
+from sigpac_tools._logging import get_logger
+from sigpac_tools.models import geojson_rings
+from sigpac_tools.utils import lng_lat_to_tile, lng_lat_to_web_mercator
+
+logger = get_logger()
+
+# Properties of the enclosures that form the reference returned for every point
+REFERENCE_KEYS = ("provincia", "municipio", "poligono", "parcela", "recinto")
+
+# Number of tile indexes kept for the following calls
+INDEX_CACHE_SIZE = 64
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class TileIndex:
+    """Grid index of the enclosures of a tile, to find the enclosure containing a point
+
+    The bounds of the features are split in `cells` x `cells` squares. Every square lists the features whose bounding box
+    overlaps it, and every row of squares keeps the edges of every feature that cross it, so a point is only tested against
+    the nearby features and, for each of them, the edges a horizontal ray from the point can cross.
+
+    Parameters
+    ----------
+    features : list[dict]
+        GeoJSON features of the tile, in EPSG:3857
+    cells : int
+        Number of squares of every side of the grid
+    """
+
+    def __init__(self, features: list[dict], cells: int = 32):
+        self.references = []
+        boxes, feature_edges = [], []
+        for feature in features:
+            if not feature.get("geometry"):
+                continue
+            edges = []
+            for ring in geojson_rings(feature["geometry"]):
+                for (x1, y1, *_), (x2, y2, *_) in zip(ring, ring[1:]):
+                    if y1 != y2:
+                        edges.append((x1, y1, x2, y2))
+            if not edges:
+                continue
+            xs = [x for edge in edges for x in (edge[0], edge[2])]
+            ys = [y for edge in edges for y in (edge[1], edge[3])]
+            boxes.append((min(xs), min(ys), max(xs), max(ys)))
+            feature_edges.append(edges)
+            properties = feature["properties"]
+            self.references.append(tuple(properties.get(k) for k in REFERENCE_KEYS))
+
+        self._boxes = boxes
+        self._cells = cells
+        if not boxes:
+            self._x0 = self._y0 = 0.0
+            self._size = 1.0
+            self._grid, self._rows = [[]] * cells * cells, [{}] * cells
+            return
+        self._x0 = min(box[0] for box in boxes)
+        self._y0 = min(box[1] for box in boxes)
+        width = max(box[2] for box in boxes) - self._x0
+        height = max(box[3] for box in boxes) - self._y0
+        self._size = (max(width, height) / cells) or 1.0
+
+        self._grid = [[] for _ in range(cells * cells)]
+        self._rows = [{} for _ in range(cells)]
+        for i, (box, edges) in enumerate(zip(boxes, feature_edges)):
+            c0, r0 = self._cell(box[0], box[1])
+            c1, r1 = self._cell(box[2], box[3])
+            for row in range(r0, r1 + 1):
+                for column in range(c0, c1 + 1):
+                    self._grid[row * cells + column].append(i)
+            for edge in edges:
+                low, high = sorted((edge[1], edge[3]))
+                for row in range(self._cell(0, low)[1], self._cell(0, high)[1] + 1):
+                    self._rows[row].setdefault(i, []).append(edge)
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        last = self._cells - 1
+        column = min(max(int((x - self._x0) / self._size), 0), last)
+        row = min(max(int((y - self._y0) / self._size), 0), last)
+        return column, row
+
+    def locate(self, x: float, y: float) -> int | None:
+        """Returns the position in `references` of the feature containing the point, `None` if no feature contains it
+
+        Parameters
+        ----------
+        x : float
+            X coordinate of the point in EPSG:3857
+        y : float
+            Y coordinate of the point in EPSG:3857
+
+        Returns
+        -------
+        int | None
+            Position of the feature containing the point
+        """
+        column = int((x - self._x0) / self._size)
+        row = int((y - self._y0) / self._size)
+        if not (0 <= column < self._cells and 0 <= row < self._cells):
+            return None
+        edges_by_feature = self._rows[row]
+        for i in self._grid[row * self._cells + column]:
+            x0, y0, x1, y1 = self._boxes[i]
+            if x < x0 or x > x1 or y < y0 or y > y1:
+                continue
+            inside = False
+            for ex1, ey1, ex2, ey2 in edges_by_feature.get(i, ()):
+                if (ey1 > y) != (ey2 > y) and x < ex1 + (y - ey1) * (ex2 - ex1) / (
+                    ey2 - ey1
+                ):
+                    inside = not inside
+            if inside:
+                return i
+        return None
+
+
+def _tile_index(tile: tuple[int, int]) -> TileIndex | None:
+    """Returns the index of the enclosures of the tile, reusing the last one built while the tile does not change"""
+    url = f"{_globals.BASE_URL}/vectorsdg/vector/recinto@3857/15.{tile[0]}.{tile[1]}.geojson"
+    with transport.priority("bulk"):
+        content = transport.get_content(url)
+    with _indexes_lock:
+        entry = _indexes.get(url)
+        if entry is not None and entry[0] == content:
+            _indexes.move_to_end(url)
+            return entry[1]
+
+    with metrics.span("reverse.index", tile=f"{tile[0]}.{tile[1]}"):
+        collection = transport.decode_json(content) if content else None
+        if not isinstance(collection, dict) or "features" not in collection:
+            logger.warning("Tile not found", x=tile[0], y=tile[1])
+            index = None
+        else:
+            index = TileIndex(collection["features"])
+    with _indexes_lock:
+        _indexes[url] = (content, index)
+        _indexes.move_to_end(url)
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+@metrics.timed("reverse")
+def references_from_coords(
+    lats: Sequence[float], lons: Sequence[float], workers: int = 8
+) -> list[tuple[int, int, int, int, int] | None]:
+    """Finds the SIGPAC enclosure containing every given point
+
+    Points are grouped by their zoom 15 tile, every tile is fetched once (concurrently) and indexed (see `TileIndex`), and
+    the points are tested in EPSG:3857 against the enclosures near them. Indexes are kept for the following calls while the
+    tiles do not change, so with warm caches the cost is the point-in-polygon tests alone.
+
+    Parameters
+    ----------
+    lats : Sequence[float]
+        Latitudes of the points
+    lons : Sequence[float]
+        Longitudes of the points
+    workers : int
+        Number of threads fetching the tiles
+
+    Returns
+    -------
+    list[tuple[int, int, int, int, int] | None]
+        (province, municipality, polygon, parcel, enclosure) of every point, `None` for the points outside every enclosure
+
+    Raises
+    ------
+    ValueError
+        If the number of latitudes and longitudes differ
+    """
+    if len(lats) != len(lons):
+        raise ValueError("The number of latitudes and longitudes must be the same")
+
+    points_by_tile = {}
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        points_by_tile.setdefault(lng_lat_to_tile(lon, lat, 15), []).append(i)
+
+    tiles = list(points_by_tile)
+    with ThreadPoolExecutor(max(1, min(workers, len(tiles)))) as executor:
+        indexes = list(executor.map(_tile_index, tiles))
+
+    results = [None] * len(lats)
+    with metrics.span("reverse.locate", points=len(lats), tiles=len(tiles)):
+        for tile, index in zip(tiles, indexes):
+            if index is None:
+                continue
+            references = index.references
+            for i in points_by_tile[tile]:
+                found = index.locate(*lng_lat_to_web_mercator(lons[i], lats[i]))
+                if found is not None:
+                    results[i] = references[found]
+    logger.debug("Points located", points=len(lats), tiles=len(tiles))
+    return results
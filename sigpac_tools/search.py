@@ -1,13 +1,28 @@
-import requests
-import structlog
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator
 
-from sigpac_tools._globals import BASE_URL
+from sigpac_tools import _globals, metrics, parcel_index, transport
+from sigpac_tools._globals import PROVINCES_BY_COMMUNITY
+from sigpac_tools._logging import get_logger
+from sigpac_tools.models import FeatureCollection
+from sigpac_tools.transport import get_json
 from sigpac_tools.utils import find_community
 
-logger = structlog.get_logger()
+logger = get_logger()
 
+# Levels of the SIGPAC hierarchy, every one listing the features of the next one
+HIERARCHY = ("community", "province", "municipality", "polygon", "parcel", "enclosure")
 
-def search(data: dict) -> dict:
+
+@metrics.timed("search")
+def _result(geojson: dict | None, compact: bool) -> dict | FeatureCollection | None:
+    """Returns the search response, as a compact `FeatureCollection` if asked. `None` if the response is empty"""
+    if compact and geojson is not None:
+        return FeatureCollection.from_geojson(geojson)
+    return geojson
+
+
+def search(data: dict, compact: bool = False) -> dict | FeatureCollection | None:
     """Search for a specific location in the SIGPAC database
 
     Search for the information of the given location in the SIGPAC database. The search can be done by specifying the community, province, municipality, polygon and parcel.
@@ -16,11 +31,14 @@ def search(data: dict) -> dict:
     ----------
     data : dict
         Dictionary with the data of the location to search. It must be a dictionary with the following keys: [ community, province, municipality, polygon, parcel ]
+    compact : bool
+        If `True`, returns the results as a compact `FeatureCollection` instead of the GeoJSON dictionary
 
     Returns
     -------
-    dict
-        Dictionary with information about the location searched and the coordinates of the polygon or parcels
+    dict | FeatureCollection | None
+        Dictionary with information about the location searched and the coordinates of the polygon or parcels. `None` if
+        SIGPAC has no results for the location
 
     Raises
     ------
@@ -47,43 +65,136 @@ def search(data: dict) -> dict:
                 if polg:
                     if parc:
                         logger.info("Searching for the parcel specified")
-                        response = requests.get(
-                            f"{BASE_URL}/fega/serviciosvisorsigpac/query/recintos/{prov}/{muni}/0/0/{polg}/{parc}"
+                        geojson = get_json(
+                            f"{_globals.BASE_URL}/fega/serviciosvisorsigpac/query/recintos/{prov}/{muni}/0/0/{polg}/{parc}"
+                        )
+                        parcel_index.observe_search(
+                            {
+                                "province": prov,
+                                "municipality": muni,
+                                "polygon": polg,
+                                "parcel": parc,
+                            },
+                            geojson,
                         )
-                        geojson = response.json()
-                        return geojson
+                        return _result(geojson, compact)
                     else:
-                        logger.info(f"Searching for the parcels of the polygon {polg}")
-                        response = requests.get(
-                            f"{BASE_URL}/fega/serviciosvisorsigpac/query/parcelas/{prov}/{muni}/0/0/{polg}"
+                        logger.info(
+                            "Searching for the parcels of the polygon", polygon=polg
                         )
-                        geojson = response.json()
-                        return geojson
+                        geojson = get_json(
+                            f"{_globals.BASE_URL}/fega/serviciosvisorsigpac/query/parcelas/{prov}/{muni}/0/0/{polg}"
+                        )
+                        parcel_index.observe_search(
+                            {"province": prov, "municipality": muni, "polygon": polg},
+                            geojson,
+                        )
+                        return _result(geojson, compact)
                 else:
                     logger.info(
-                        f"Searching for the polygons of the municipality {muni}"
+                        "Searching for the polygons of the municipality",
+                        municipality=muni,
                     )
-                    response = requests.get(
-                        f"{BASE_URL}/fega/serviciosvisorsigpac/query/poligonos/{prov}/{muni}/0/0"
+                    geojson = get_json(
+                        f"{_globals.BASE_URL}/fega/serviciosvisorsigpac/query/poligonos/{prov}/{muni}/0/0"
                     )
-                    geojson = response.json()
-                    return geojson
+                    return _result(geojson, compact)
             else:
-                logger.info(f"Searching for the municipalities of the province {prov}")
-                response = requests.get(
-                    f"{BASE_URL}/fega/serviciosvisorsigpac/query/municipios/{prov}"
+                logger.info(
+                    "Searching for the municipalities of the province", province=prov
+                )
+                geojson = get_json(
+                    f"{_globals.BASE_URL}/fega/serviciosvisorsigpac/query/municipios/{prov}"
                 )
-                geojson = response.json()
-                return geojson
+                return _result(geojson, compact)
         else:
-            logger.info(f"Searching for the provinces of the community {comm}")
-            response = requests.get(
-                f"{BASE_URL}/fega/serviciosvisorsigpac/query/provincias/{comm}"
+            logger.info("Searching for the provinces of the community", community=comm)
+            geojson = get_json(
+                f"{_globals.BASE_URL}/fega/serviciosvisorsigpac/query/provincias/{comm}"
             )
-            geojson = response.json()
-            return geojson
+            return _result(geojson, compact)
 
     else:
         raise ValueError(
             '"Community" has not been specified and it could have not been found from the "province" parameter'
         )
+
+
+def fan_out_search(
+    data: dict, depth: str = "polygon", workers: int = 16
+) -> Iterator[tuple[dict, dict]]:
+    """Expands the hierarchy under the given location concurrently, down to the given depth
+
+    Every location of a level is searched with `search` as soon as the search of its parent returns, with `workers`
+    searches in flight, so the requests share the HTTP client and the caches of `transport` and run with the "bulk"
+    priority. The provinces of a community are taken from `PROVINCES_BY_COMMUNITY` instead of being searched. Results are
+    yielded as they arrive, and the searches still pending are cancelled if the generator is closed.
+
+    Parameters
+    ----------
+    data : dict
+        Location to expand, with the same keys as in `search` (community, province, municipality, polygon)
+    depth : str
+        Level of the deepest features to get ("province", "municipality", "polygon", "parcel", "enclosure")
+    workers : int
+        Number of concurrent searches
+
+    Yields
+    ------
+    tuple[dict, dict]
+        Location searched, with the keys of `search`, and the GeoJSON FeatureCollection with the features of its next level.
+        Locations that do not exist in SIGPAC are left out
+
+    Raises
+    ------
+    ValueError
+        If the depth is not a level under the given location
+    """
+    if depth not in HIERARCHY[1:]:
+        raise ValueError(f"Depth must be one of {', '.join(HIERARCHY[1:])}")
+    location = {key: data[key] for key in HIERARCHY[:-1] if data.get(key)}
+    if "community" not in location and "province" in location:
+        location["community"] = find_community(location["province"])
+    level = max((HIERARCHY.index(key) for key in location), default=0)
+    target = HIERARCHY.index(depth)
+    if not location.get("community") or target <= level:
+        raise ValueError(
+            f'"{depth}" is not a level under the location {location}, which must have a community or province'
+        )
+
+    roots = [location]
+    if level == 0 and target > 1:
+        roots = [
+            {**location, "province": province}
+            for province in PROVINCES_BY_COMMUNITY.get(location["community"], [])
+        ]
+
+    def expand(location: dict) -> dict | None:
+        with transport.priority("bulk"):
+            return search(location)
+
+    searched = 0
+    with metrics.span("search.fan_out", depth=depth) as span:
+        executor = ThreadPoolExecutor(workers, thread_name_prefix="sigpac-search")
+        try:
+            pending = {executor.submit(expand, root): root for root in roots}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    location = pending.pop(future)
+                    geojson = future.result()
+                    searched += 1
+                    if not geojson or "features" not in geojson:
+                        logger.warning("Location not found", **location)
+                        continue
+                    child = HIERARCHY[max(HIERARCHY.index(key) for key in location) + 1]
+                    if HIERARCHY.index(child) < target:
+                        for feature in geojson["features"]:
+                            code = feature["properties"]["codigo"]
+                            pending[
+                                executor.submit(expand, {**location, child: code})
+                            ] = {**location, child: code}
+                    yield location, geojson
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            span.set("searches", searched)
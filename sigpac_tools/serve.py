@@ -0,0 +1,370 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from sigpac_tools import metrics
+from sigpac_tools._logging import get_logger
+from sigpac_tools.cache import configure_cache
+
+logger = get_logger()
+
+# Query parameters of every command and the type they are parsed to
+COMMANDS = {
+    "search": {
+        "community": int,
+        "province": int,
+        "municipality": int,
+        "polygon": int,
+        "parcel": int,
+    },
+    "get-metadata": {
+        "layer": str,
+        "province": int,
+        "municipality": int,
+        "aggregate": int,
+        "zone": int,
+        "polygon": int,
+        "parcel": int,
+        "enclosure": int,
+    },
+    "geometry": {
+        "layer": str,
+        "lat": float,
+        "lon": float,
+        "reference": int,
+        "tolerance": float,
+        "precision": int,
+    },
+    "find": {"registry": str},
+}
+
+STATUS_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+    502: "Bad Gateway",
+}
+
+
+def _validate_command(command: str, params: dict) -> None:
+    """Checks the parameters of the command before any lookup, with the same checks as the library calls
+
+    Raises
+    ------
+    ValueError
+        If a required parameter is missing or not valid
+    KeyError
+        If the layer is not supported
+    NotImplementedError
+        If the cadastral registry is urban
+    """
+    match command:
+        case "search":
+            if not params.get("community"):
+                from sigpac_tools.utils import find_community
+
+                if not params.get("province"):
+                    raise ValueError('"Community" or "province" must be specified')
+                if not find_community(params["province"]):
+                    raise ValueError(
+                        f"No community found for the province {params['province']}"
+                    )
+        case "get-metadata":
+            layer = params.get("layer")
+            if not layer:
+                raise ValueError("Layer not specified")
+            if layer not in ["parcela", "recinto"]:
+                raise KeyError(
+                    "Layer not supported. Supported layers: ['parcela', 'recinto']"
+                )
+            required = ["province", "municipality", "polygon", "parcel"]
+            if layer == "recinto":
+                required.append("enclosure")
+            for key in required:
+                if not params.get(key):
+                    raise ValueError(f"{key.capitalize()} not specified")
+        case "geometry":
+            if (
+                not params.get("layer")
+                or not params.get("lat")
+                or not params.get("lon")
+            ):
+                raise ValueError("Layer, latitude or longitude not specified")
+            if params.get("reference") and params["layer"] not in [
+                "parcela",
+                "recinto",
+            ]:
+                raise KeyError(
+                    f'Layer "{params["layer"]}" not supported. Supported layers: "parcela", "recinto"'
+                )
+        case "find":
+            from sigpac_tools.utils import read_cadastral_registry
+
+            read_cadastral_registry(params.get("registry", ""))
+
+
+def _run_command(command: str, params: dict):
+    """Runs the library call of the given command. It is blocking, so it runs in the worker threads"""
+    match command:
+        case "search":
+            from sigpac_tools.search import search
+
+            return search(params)
+        case "get-metadata":
+            from sigpac_tools.anotate import get_metadata
+
+            layer = params.pop("layer", None)
+            return get_metadata(layer, params)
+        case "geometry":
+            from sigpac_tools.locate import geometry_from_coords
+
+            return geometry_from_coords(
+                params.get("layer"),
+                params.get("lat"),
+                params.get("lon"),
+                params.get("reference"),
+                tolerance=params.get("tolerance"),
+                precision=params.get("precision"),
+            )
+        case "find":
+            from sigpac_tools.find import find_from_cadastral_registry
+
+            geometry, metadata = find_from_cadastral_registry(
+                params.get("registry", "")
+            )
+            return {"geometry": geometry, "metadata": metadata}
+
+
+class SigpacService:
+    """HTTP API over `search`, `get_metadata`, `geometry_from_coords` and `find_from_cadastral_registry`
+
+    The handlers are asynchronous and run the library calls in a thread pool. The tile, metadata and search caches are shared
+    by every request, and concurrent identical requests are coalesced into a single library call.
+
+    Endpoints: `GET /search`, `GET /get-metadata`, `GET /geometry` and `GET /find`, with the same parameters as the CLI commands
+    as query parameters, `GET /metrics` with the Prometheus metrics and `GET /health`.
+
+    Parameters
+    ----------
+    max_workers : int
+        Number of threads running the library calls
+    cache_size : int | None
+        Maximum number of responses of every cache, the defaults of `configure_cache` if `None`
+    cache_ttl : float | None
+        Seconds a cached response is fresh
+    cache_bundle : str | None
+        Bundle of cached responses (see `bundle.export_bundle`) to warm the caches with
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        cache_size: int | None = None,
+        cache_ttl: float | None = 3600,
+        cache_bundle: str | None = None,
+    ):
+        configure_cache(maxsize=cache_size, ttl=cache_ttl)
+        if cache_bundle:
+            from sigpac_tools.bundle import import_bundle
+
+            import_bundle(cache_bundle)
+        self.metrics = metrics.add_hook(metrics.PrometheusHook())
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="sigpac")
+        self._inflight = {}
+        self._server = None
+
+    async def call(self, command: str, params: dict):
+        """Runs the command, sharing the result with the identical calls already in flight
+
+        Parameters
+        ----------
+        command : str
+            Command to run ("search", "get-metadata", "geometry", "find")
+        params : dict
+            Parsed parameters of the command
+
+        Returns
+        -------
+        Any
+            Result of the command
+        """
+        key = (command, tuple(sorted(params.items())))
+        future = self._inflight.get(key)
+        if future is not None:
+            metrics.increment("serve.coalesced", command=command)
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, _run_command, command, dict(params)
+        )
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def dispatch(self, method: str, target: str) -> tuple[int, bytes, str]:
+        """Returns the status, body and content type of the response to the given request"""
+        url = urlsplit(target)
+        path = url.path.strip("/")
+        if method != "GET":
+            return 405, b'{"error": "Method not allowed"}', "application/json"
+        if path == "health":
+            return 200, b'{"status": "ok"}', "application/json"
+        if path == "metrics":
+            return 200, self.metrics.render().encode(), "text/plain; version=0.0.4"
+        if path not in COMMANDS:
+            return 404, b'{"error": "Not found"}', "application/json"
+
+        types = COMMANDS[path]
+        try:
+            params = {
+                key: types[key](value)
+                for key, value in parse_qsl(url.query)
+                if key in types and value != ""
+            }
+        except ValueError as e:
+            return 400, _error(f"Invalid parameter: {e}"), "application/json"
+
+        with metrics.span("serve.request", command=path) as span:
+            try:
+                _validate_command(path, params)
+            except (ValueError, KeyError) as e:
+                status, body = 400, _error(e)
+            except NotImplementedError as e:
+                status, body = 501, _error(e)
+            else:
+                status, body = await self._respond(path, params)
+            span.set("status", status)
+        return status, body, "application/json"
+
+    async def _respond(self, command: str, params: dict) -> tuple[int, bytes]:
+        """Runs a validated command and returns the status and body of the response
+
+        With the parameters already validated, a `ValueError` of the library means that the location does not exist (404),
+        and undecodable or failed SIGPAC responses are upstream failures (502).
+        """
+        try:
+            result = await self.call(command, params)
+            return 200, json.dumps(result).encode()
+        except NotImplementedError as e:
+            return 501, _error(e)
+        except json.JSONDecodeError as e:
+            logger.warning("Undecodable SIGPAC response", command=command, error=str(e))
+            return 502, _error(f"Undecodable SIGPAC response: {e}")
+        except ValueError as e:
+            return 404, _error(e)
+        except Exception as e:
+            logger.exception("Request failed", command=command, params=params)
+            return 502, _error(e)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves the HTTP/1.1 requests of a connection, keeping it alive between requests"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                if length := int(headers.get("content-length", 0)):
+                    await reader.readexactly(length)
+
+                status, body, content_type = await self.dispatch(method, target)
+                keep_alive = (
+                    version == "HTTP/1.1" and headers.get("connection") != "close"
+                )
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.Server:
+        """Starts listening on the given address
+
+        Parameters
+        ----------
+        host : str
+            Host to listen on
+        port : int
+            Port to listen on, 0 picks a free port
+
+        Returns
+        -------
+        asyncio.Server
+            Started server
+        """
+        self._server = await asyncio.start_server(self.handle, host, port)
+        address = self._server.sockets[0].getsockname()
+        logger.info("SIGPAC service listening", host=address[0], port=address[1])
+        return self._server
+
+    def close(self) -> None:
+        """Stops the server, the worker threads and the metrics hook"""
+        if self._server is not None:
+            self._server.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        metrics.remove_hook(self.metrics)
+
+
+def _error(error) -> bytes:
+    message = error.args[0] if isinstance(error, KeyError) and error.args else error
+    return json.dumps({"error": str(message)}).encode()
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    max_workers: int = 16,
+    cache_size: int | None = None,
+    cache_ttl: float | None = 3600,
+    cache_bundle: str | None = None,
+) -> None:
+    """Runs the SIGPAC HTTP service until it is interrupted
+
+    Parameters
+    ----------
+    host : str
+        Host to listen on
+    port : int
+        Port to listen on
+    max_workers : int
+        Number of threads running the library calls
+    cache_size : int | None
+        Maximum number of responses of every cache
+    cache_ttl : float | None
+        Seconds a cached response is fresh
+    cache_bundle : str | None
+        Bundle of cached responses to warm the caches with
+    """
+    service = SigpacService(max_workers, cache_size, cache_ttl, cache_bundle)
+
+    async def run():
+        server = await service.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,328 @@
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from sigpac_tools._globals import PROVINCES_BY_COMMUNITY
+from sigpac_tools._logging import get_logger
+from sigpac_tools.transport import priority
+from sigpac_tools.utils import lng_lat_to_tile
+
+logger = get_logger()
+
+# Keys a job can be partitioned by, from the coarsest to the finest
+SHARD_KEYS = ("province", "municipality", "tile")
+
+# Zoom level of the tiles used as shard keys, the same as the SIGPAC vector tiles
+TILE_ZOOM = 15
+
+_SHARD_FILE = re.compile(r"shard-(\d+)-of-(\d+)\.jsonl")
+
+
+def work_units(community: int, level: str = "municipality") -> list[dict]:
+    """Expands a community into the work units of a bulk job
+
+    Provinces come from `PROVINCES_BY_COMMUNITY`. Municipalities are listed with `search`, and carry the center of their
+    bounding box as "lat" and "lon" so they can also be sharded by tile.
+
+    Parameters
+    ----------
+    community : int
+        Community to expand
+    level : str
+        Level of the work units ("province", "municipality")
+
+    Returns
+    -------
+    list[dict]
+        Work units, with the "community", "province" and, for the municipality level, "municipality", "lat" and "lon" keys
+
+    Raises
+    ------
+    KeyError
+        If the community or the level are not supported
+    """
+    if community not in PROVINCES_BY_COMMUNITY:
+        raise KeyError(f"Community {community} not found")
+    if level not in SHARD_KEYS[:2]:
+        raise KeyError(
+            f'Level "{level}" not supported. Supported levels: {list(SHARD_KEYS[:2])}'
+        )
+
+    units = [
+        {"community": community, "province": province}
+        for province in PROVINCES_BY_COMMUNITY[community]
+    ]
+    if level == "province":
+        return units
+
+    from sigpac_tools.search import search
+
+    municipalities = []
+    for unit in units:
+        result = search(unit)
+        if not result:
+            logger.warning("No municipalities found", **unit)
+            continue
+        for feature in result["features"]:
+            properties = feature["properties"]
+            municipalities.append(
+                {
+                    **unit,
+                    "municipality": properties["codigo"],
+                    "lat": (properties["y1"] + properties["y2"]) / 2,
+                    "lon": (properties["x1"] + properties["x2"]) / 2,
+                }
+            )
+    return municipalities
+
+
+def shard_key(unit: dict, by: str = "municipality") -> tuple:
+    """Returns the key a work unit is sharded by
+
+    Parameters
+    ----------
+    unit : dict
+        Work unit, with the "province" and "municipality" keys or the "lat" and "lon" keys depending on `by`
+    by : str
+        Key to shard by ("province", "municipality", "tile")
+
+    Returns
+    -------
+    tuple
+        Shard key of the unit
+
+    Raises
+    ------
+    KeyError
+        If the key is not supported or the unit lacks the values it needs
+    """
+    match by:
+        case "province":
+            return (unit["province"],)
+        case "municipality":
+            return unit["province"], unit["municipality"]
+        case "tile":
+            return lng_lat_to_tile(unit["lon"], unit["lat"], TILE_ZOOM)
+    raise KeyError(f'Shard key "{by}" not supported. Supported keys: {SHARD_KEYS}')
+
+
+def shard_of(unit: dict, shards: int, by: str = "municipality") -> int:
+    """Returns the shard of a work unit
+
+    The shard is the CRC32 of the shard key modulo the number of shards, so every node computes the same partition without
+    coordinating with the others, whatever the order in which it lists the units.
+
+    Parameters
+    ----------
+    unit : dict
+        Work unit
+    shards : int
+        Number of shards
+    by : str
+        Key to shard by ("province", "municipality", "tile")
+
+    Returns
+    -------
+    int
+        Shard of the unit, from 0 to `shards` - 1
+    """
+    key = ",".join(str(value) for value in shard_key(unit, by))
+    return zlib.crc32(key.encode()) % shards
+
+
+def partition(
+    units: Iterable[dict], shards: int, by: str = "municipality"
+) -> list[list[dict]]:
+    """Splits the work units into `shards` lists with `shard_of`
+
+    Parameters
+    ----------
+    units : Iterable[dict]
+        Work units
+    shards : int
+        Number of shards
+    by : str
+        Key to shard by ("province", "municipality", "tile")
+
+    Returns
+    -------
+    list[list[dict]]
+        Work units of every shard
+    """
+    if shards < 1:
+        raise ValueError("The number of shards must be at least 1")
+    partitioned = [[] for _ in range(shards)]
+    for unit in units:
+        partitioned[shard_of(unit, shards, by)].append(unit)
+    return partitioned
+
+
+def _unit_id(unit: dict) -> str:
+    return json.dumps(unit, sort_keys=True)
+
+
+def _read_records(path: Path) -> list[dict]:
+    """Reads the records of a shard file, skipping a last line left incomplete by an interrupted run"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning("Skipping incomplete checkpoint line", path=str(path))
+    return records
+
+
+class ShardRunner:
+    """Processes the work units of one shard of a bulk job, checkpointing every result to a shared directory
+
+    Every result is appended as a JSON line to `<directory>/shard-<shard>-of-<shards>.jsonl`, which is both the checkpoint and
+    the output of the shard. A rerun skips the units already processed and retries the ones that failed, and `merge` combines
+    the files of every shard once all the nodes are done.
+
+    Parameters
+    ----------
+    directory : str | Path
+        Directory shared by the nodes of the job
+    shard : int
+        Shard processed by this node, from 0 to `shards` - 1
+    shards : int
+        Number of shards of the job
+    by : str
+        Key to shard by ("province", "municipality", "tile")
+    """
+
+    def __init__(
+        self, directory: str | Path, shard: int, shards: int, by: str = "municipality"
+    ):
+        if not 0 <= shard < shards:
+            raise ValueError(f"Shard {shard} out of range for {shards} shards")
+        if by not in SHARD_KEYS:
+            raise KeyError(
+                f'Shard key "{by}" not supported. Supported keys: {SHARD_KEYS}'
+            )
+        self.directory = Path(directory)
+        self.shard = shard
+        self.shards = shards
+        self.by = by
+
+    @property
+    def path(self) -> Path:
+        """File with the checkpoint and the results of the shard"""
+        return self.directory / f"shard-{self.shard:05d}-of-{self.shards:05d}.jsonl"
+
+    def completed(self) -> dict[str, Any]:
+        """Returns the results of the units already processed, by the JSON of the unit"""
+        if not self.path.exists():
+            return {}
+        return {
+            _unit_id(record["unit"]): record["result"]
+            for record in _read_records(self.path)
+            if "error" not in record
+        }
+
+    def run(self, units: Iterable[dict], func: Callable[[dict], Any]) -> dict:
+        """Processes the units of the shard that have not been processed yet
+
+        Parameters
+        ----------
+        units : Iterable[dict]
+            Work units of the whole job. Only the ones of this shard are processed
+        func : Callable[[dict], Any]
+            Function that processes a unit. Its result must be serializable to JSON. Its SIGPAC requests are run with the
+            "bulk" priority (see `transport.set_concurrency`)
+
+        Returns
+        -------
+        dict
+            Number of "processed", "skipped" (already completed) and "failed" units
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        completed = self.completed()
+        summary = {"processed": 0, "skipped": 0, "failed": 0}
+        with open(self.path, "a+", encoding="utf-8") as f:
+            # Terminate a line left incomplete by an interrupted run before appending
+            if f.tell() and (f.seek(f.tell() - 1), f.read(1))[1] != "\n":
+                f.write("\n")
+            for unit in units:
+                if shard_of(unit, self.shards, self.by) != self.shard:
+                    continue
+                if _unit_id(unit) in completed:
+                    summary["skipped"] += 1
+                    continue
+                try:
+                    with priority("bulk"):
+                        record = {"unit": unit, "result": func(unit)}
+                    summary["processed"] += 1
+                except Exception as e:
+                    logger.warning("Work unit failed", unit=unit, error=str(e))
+                    record = {"unit": unit, "error": str(e)}
+                    summary["failed"] += 1
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+            os.fsync(f.fileno())
+        logger.info("Shard done", shard=self.shard, shards=self.shards, **summary)
+        return summary
+
+
+def merge(
+    directory: str | Path,
+    output: str | Path | None = None,
+    partial: bool = False,
+) -> list[dict]:
+    """Combines the results of every shard of a job
+
+    Parameters
+    ----------
+    directory : str | Path
+        Directory shared by the nodes of the job
+    output : str | Path | None
+        If given, the merged records are also written to this file as JSON lines
+    partial : bool
+        If `True`, merges the shards present even if some are missing
+
+    Returns
+    -------
+    list[dict]
+        The {"unit": ..., "result": ...} record of every processed unit, by shard. Units that failed in their last attempt are left out
+
+    Raises
+    ------
+    ValueError
+        If the directory holds files of jobs with different numbers of shards, or if a shard is missing and `partial` is `False`
+    """
+    files = {}
+    for path in Path(directory).iterdir():
+        if match := _SHARD_FILE.fullmatch(path.name):
+            files[int(match[1])] = (int(match[2]), path)
+    counts = {shards for shards, _ in files.values()}
+    if len(counts) > 1:
+        raise ValueError(
+            f"Shard files of jobs with different numbers of shards: {counts}"
+        )
+    if not files:
+        raise ValueError(f"No shard files found in {directory}")
+
+    missing = sorted(set(range(counts.pop())) - set(files))
+    if missing and not partial:
+        raise ValueError(f"Missing shards: {missing}")
+    if missing:
+        logger.warning("Merging without every shard", missing=missing)
+
+    merged = {}
+    for shard in sorted(files):
+        for record in _read_records(files[shard][1]):
+            merged[_unit_id(record["unit"])] = record
+    records = [record for record in merged.values() if "error" not in record]
+    failed = len(merged) - len(records)
+    if failed:
+        logger.warning("Work units without result", failed=failed)
+
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    return records
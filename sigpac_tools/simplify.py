@@ -0,0 +1,169 @@
+from sigpac_tools.models import GEOMETRY_DEPTH, geojson_rings
+
+
+def vertex_owners(features: list[dict]) -> dict[tuple[float, float], set[int]]:
+    """Returns the indexes of the features that contain every vertex
+
+    Vertices shared by the same features form the shared borders, and the vertices where the owners change are the
+    junctions that `simplify_ring` keeps so that neighbouring features are simplified the same way.
+
+    Parameters
+    ----------
+    features : list[dict]
+        GeoJSON features, usually every feature of a tile
+
+    Returns
+    -------
+    dict[tuple[float, float], set[int]]
+        Indexes of the features containing every (x, y) vertex
+    """
+    owners = {}
+    for i, feature in enumerate(features):
+        if not feature.get("geometry"):
+            continue
+        for ring in geojson_rings(feature["geometry"]):
+            for position in ring:
+                owners.setdefault((position[0], position[1]), set()).add(i)
+    return owners
+
+
+def _segment_distance(point, start, end) -> float:
+    """Returns the squared distance from the point to the segment"""
+    x, y = point[0], point[1]
+    x1, y1, x2, y2 = start[0], start[1], end[0], end[1]
+    dx, dy = x2 - x1, y2 - y1
+    if dx or dy:
+        t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)))
+        x1, y1 = x1 + t * dx, y1 + t * dy
+    return (x - x1) ** 2 + (y - y1) ** 2
+
+
+def _douglas_peucker(points: list, tolerance: float) -> list:
+    """Returns the points kept by the Douglas-Peucker algorithm. The first and the last points are always kept"""
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    squared = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, distance = None, squared
+        for i in range(first + 1, last):
+            d = _segment_distance(points[i], points[first], points[last])
+            if d > distance:
+                farthest, distance = i, d
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def _simplify_run(run: list, tolerance: float) -> list:
+    """Simplifies a run of vertices between two junctions, always in the same direction whichever ring it belongs to"""
+    backwards = run[::-1]
+    if backwards < run:
+        return _douglas_peucker(backwards, tolerance)[::-1]
+    return _douglas_peucker(run, tolerance)
+
+
+def simplify_ring(
+    ring: list, tolerance: float, owners: dict[tuple[float, float], set] | None = None
+) -> list:
+    """Simplifies a ring (or line) with the Douglas-Peucker algorithm, preserving the borders shared with other features
+
+    The ring is split at its junctions (the vertices where the features sharing the border change, see `vertex_owners`)
+    and every run between two junctions is simplified on its own, in a direction that does not depend on the ring. The
+    junctions are kept, so a border shared by two features is simplified to the same vertices in both of them and no gaps
+    or overlaps appear between neighbours.
+
+    Parameters
+    ----------
+    ring : list
+        Positions of the ring (closed, first and last positions equal) or line
+    tolerance : float
+        Maximum distance between the original and the simplified ring, in the units of the coordinates
+    owners : dict[tuple[float, float], set] | None
+        Features containing every vertex, as returned by `vertex_owners`. Without it, no border is preserved
+
+    Returns
+    -------
+    list
+        Positions of the simplified ring. Rings that would be left with less than 4 positions are returned unchanged
+    """
+    closed = len(ring) > 3 and ring[0] == ring[-1]
+    points = ring[:-1] if closed else ring
+    n = len(points)
+    if n < 3:
+        return ring
+    owned = [owners.get((p[0], p[1])) for p in points] if owners else [None] * n
+
+    if not closed:
+        anchors = [0]
+        anchors += [
+            i
+            for i in range(1, n - 1)
+            if owned[i] != owned[i - 1] or owned[i] != owned[i + 1]
+        ]
+        anchors.append(n - 1)
+        simplified = []
+        for start, end in zip(anchors, anchors[1:]):
+            simplified.extend(_simplify_run(points[start : end + 1], tolerance)[:-1])
+        simplified.append(points[-1])
+        return simplified
+
+    anchors = [
+        i
+        for i in range(n)
+        if owned[i] != owned[i - 1] or owned[i] != owned[(i + 1) % n]
+    ]
+    if not anchors:
+        # Start from vertices that do not depend on where the ring starts
+        first = min(range(n), key=lambda i: points[i])
+        farthest = max(
+            range(n),
+            key=lambda i: (
+                _segment_distance(points[i], points[first], points[first]),
+                points[i],
+            ),
+        )
+        anchors = sorted({first, farthest})
+
+    simplified = []
+    for start, end in zip(anchors, anchors[1:] + [anchors[0] + n]):
+        run = [points[i % n] for i in range(start, end + 1)]
+        simplified.extend(_simplify_run(run, tolerance)[:-1])
+    if len(simplified) < 3:
+        return ring
+    simplified.append(list(simplified[0]))
+    return simplified
+
+
+def simplify_geometry(
+    geometry: dict, tolerance: float, owners: dict | None = None
+) -> dict:
+    """Simplifies every ring (or line) of a GeoJSON geometry in place with `simplify_ring`
+
+    Parameters
+    ----------
+    geometry : dict
+        GeoJSON geometry
+    tolerance : float
+        Maximum distance between the original and the simplified geometry, in the units of the coordinates
+    owners : dict | None
+        Features containing every vertex, as returned by `vertex_owners`
+
+    Returns
+    -------
+    dict
+        The simplified geometry
+    """
+    depth = GEOMETRY_DEPTH.get(geometry["type"], 0)
+    coordinates = geometry["coordinates"]
+    if depth == 1:
+        geometry["coordinates"] = simplify_ring(coordinates, tolerance, owners)
+    elif depth == 2:
+        coordinates[:] = [simplify_ring(r, tolerance, owners) for r in coordinates]
+    elif depth == 3:
+        for polygon in coordinates:
+            polygon[:] = [simplify_ring(r, tolerance, owners) for r in polygon]
+    return geometry
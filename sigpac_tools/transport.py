@@ -0,0 +1,759 @@
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+from sigpac_tools import metrics
+from sigpac_tools._logging import get_logger
+from sigpac_tools.cache import CachedResponse, cache_kind, get_cache
+from sigpac_tools.hedging import DEFAULT_MAX_WORKERS, RequestHedger
+
+logger = get_logger()
+
+
+def _stdlib_decoder() -> Callable[[bytes], Any]:
+    import json
+
+    return json.loads
+
+
+def _orjson_decoder() -> Callable[[bytes], Any]:
+    import orjson
+
+    return orjson.loads
+
+
+def _msgspec_decoder() -> Callable[[bytes], Any]:
+    import msgspec
+
+    return msgspec.json.Decoder().decode
+
+
+# Factories of the supported JSON decoders. Every decoder takes the raw response bytes
+JSON_DECODERS = {
+    "json": _stdlib_decoder,
+    "orjson": _orjson_decoder,
+    "msgspec": _msgspec_decoder,
+}
+
+# Order in which the decoders are tried when the decoder is "auto"
+_AUTO_ORDER = ["orjson", "msgspec", "json"]
+
+_decoder_name = "auto"
+_decoder = None
+
+# Local sources of responses, consulted before the caches and the network
+_sources = []
+
+_client_name = "requests"
+_client_options = {}
+_client = None
+
+# Default weights of the priority classes of the requests, see `set_concurrency`
+PRIORITY_WEIGHTS = {"interactive": 8, "bulk": 1}
+
+_priority = ContextVar("sigpac_priority", default="interactive")
+_scheduler = None
+
+_hedger = None
+_hedger_workers = DEFAULT_MAX_WORKERS
+
+
+def available_json_decoders() -> list[str]:
+    """Returns the names of the JSON decoders that can be used in the current environment
+
+    Returns
+    -------
+    list[str]
+        Names of the importable decoders, the stdlib decoder is always available
+    """
+    available = []
+    for name, factory in JSON_DECODERS.items():
+        try:
+            factory()
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def set_json_decoder(decoder: str | Callable[[bytes], Any] = "auto") -> None:
+    """Sets the decoder used to parse the JSON bodies of the SIGPAC responses
+
+    Parameters
+    ----------
+    decoder : str | Callable[[bytes], Any]
+        Name of the decoder ("auto", "json", "orjson", "msgspec") or a callable that decodes the raw response bytes.
+        "auto" uses orjson or msgspec if they are installed and falls back to the stdlib decoder
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    KeyError
+        If the decoder name is not supported
+    ImportError
+        If the library of the requested decoder is not installed
+    """
+    global _decoder_name, _decoder
+
+    if callable(decoder):
+        _decoder_name, _decoder = getattr(decoder, "__name__", "custom"), decoder
+        return
+    if decoder != "auto" and decoder not in JSON_DECODERS:
+        raise KeyError(
+            f"JSON decoder not supported. Supported decoders: {['auto', *JSON_DECODERS]}"
+        )
+    # Resolve eagerly so that a missing library is reported here and not on the first request
+    _decoder_name, _decoder = decoder, None
+    get_json_decoder()
+
+
+def get_json_decoder() -> Callable[[bytes], Any]:
+    """Returns the decoder currently used to parse the JSON bodies, resolving it on the first call
+
+    Returns
+    -------
+    Callable[[bytes], Any]
+        Function that decodes the raw bytes of a response
+    """
+    global _decoder
+
+    if _decoder is None:
+        if _decoder_name != "auto":
+            _decoder = JSON_DECODERS[_decoder_name]()
+        else:
+            for name in _AUTO_ORDER:
+                try:
+                    _decoder = JSON_DECODERS[name]()
+                except ImportError:
+                    continue
+                break
+    return _decoder
+
+
+def decode_json(content: bytes) -> Any:
+    """Decodes the given raw JSON bytes with the configured decoder
+
+    Parameters
+    ----------
+    content : bytes
+        Raw JSON body
+
+    Returns
+    -------
+    Any
+        Decoded JSON document
+    """
+    return get_json_decoder()(content)
+
+
+def _requests_client(connections: int | None = None) -> Callable:
+    import requests
+
+    if connections is None:
+
+        def get(url: str, headers: dict | None = None, stream: bool = False):
+            options = {"stream": True} if stream else {}
+            if headers:
+                options["headers"] = headers
+            return requests.get(url, **options)
+
+        return get
+
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session.get
+
+
+def _httpx_client(connections: int = 4, http1: bool = True) -> Callable:
+    import httpx
+
+    client = httpx.Client(
+        http1=http1,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=connections, max_keepalive_connections=connections
+        ),
+    )
+
+    def get(url: str, headers: dict | None = None, stream: bool = False):
+        if stream:
+            return client.send(
+                client.build_request("GET", url, headers=headers), stream=True
+            )
+        return client.get(url, headers=headers)
+
+    return get
+
+
+# Factories of the supported HTTP clients. Every client is a `get(url, headers=None, stream=False)` function returning a
+# response with `status_code`, `content` and `headers`. Streamed responses are read with `iter_content` (requests) or
+# `iter_bytes` (httpx) and released with `close`
+HTTP_CLIENTS = {
+    "requests": _requests_client,
+    "httpx": _httpx_client,
+}
+
+
+def set_http_client(client: str | Callable = "requests", **options) -> None:
+    """Sets the HTTP client used to fetch the SIGPAC responses
+
+    All the SIGPAC traffic goes to the same host, so with "httpx" many concurrent tile and metadata requests are multiplexed
+    over a few HTTP/2 connections instead of needing a pooled HTTP/1.1 connection per concurrent request.
+
+    Parameters
+    ----------
+    client : str | Callable
+        Name of the client or a `get(url, headers=None)` function returning a response with `status_code`, `content` and
+        `headers`. Supported clients:
+
+        - "requests": HTTP/1.1 with `requests`, the default. With the `connections` option, requests share a session with a
+          pool of that many connections
+        - "httpx": HTTP/2 with `httpx` (`pip install sigpac-tools[http2]`), multiplexing the requests over up to `connections`
+          connections (4 by default). Cleartext `http://` servers are only spoken HTTP/2 to with `http1=False`
+    **options
+        Options of the client factory
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    KeyError
+        If the client name is not supported
+    ImportError
+        If the library of the requested client is not installed
+    """
+    global _client_name, _client_options, _client
+
+    if callable(client):
+        _client_name, _client_options, _client = (
+            getattr(client, "__name__", "custom"),
+            {},
+            client,
+        )
+        return
+    if client not in HTTP_CLIENTS:
+        raise KeyError(
+            f"HTTP client not supported. Supported clients: {[*HTTP_CLIENTS]}"
+        )
+    # Resolve eagerly so that a missing library is reported here and not on the first request
+    _client_name, _client_options, _client = client, options, None
+    get_http_client()
+
+
+def get_http_client() -> Callable:
+    """Returns the HTTP client currently used to fetch the responses, creating it on the first call
+
+    Returns
+    -------
+    Callable
+        `get(url, headers=None)` function of the client
+    """
+    global _client
+
+    if _client is None:
+        _client = HTTP_CLIENTS[_client_name](**_client_options)
+        logger.debug("HTTP client created", client=_client_name, **_client_options)
+    return _client
+
+
+class PriorityScheduler:
+    """Limits the number of concurrent requests, sharing the slots between priority classes by weighted fair scheduling
+
+    Requests that find every slot busy wait in the queue of their class. When a slot is released it is handed to the first
+    request of the class with the lowest virtual time, which grows by `1 / weight` every time the class is served, so under
+    load every class gets a share of the slots proportional to its weight and no class starves.
+
+    Parameters
+    ----------
+    limit : int
+        Maximum number of concurrent requests
+    weights : dict[str, float]
+        Weight of every priority class
+    """
+
+    def __init__(self, limit: int, weights: dict[str, float]):
+        if limit < 1:
+            raise ValueError("The concurrency limit must be at least 1")
+        if not weights or min(weights.values()) <= 0:
+            raise ValueError("The weights of the priority classes must be positive")
+        self.limit = limit
+        self.weights = dict(weights)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queues = {name: deque() for name in weights}
+        self._pass = dict.fromkeys(weights, 0.0)
+        self._virtual_time = 0.0
+
+    def acquire(self, priority: str) -> None:
+        """Waits for a free slot for a request of the given class"""
+        if priority not in self.weights:
+            raise KeyError(
+                f"Priority not supported. Supported priorities: {[*self.weights]}"
+            )
+        with self._lock:
+            if self._active < self.limit and not any(self._queues.values()):
+                self._active += 1
+                return
+            queue = self._queues[priority]
+            if not queue:
+                # An idle class does not bank the time it did not use
+                self._pass[priority] = max(self._pass[priority], self._virtual_time)
+            waiter = threading.Event()
+            queue.append(waiter)
+        waiter.wait()
+
+    def release(self) -> None:
+        """Frees a slot, handing it to the next request by weighted fair scheduling"""
+        with self._lock:
+            waiting = [name for name, queue in self._queues.items() if queue]
+            if not waiting:
+                self._active -= 1
+                return
+            name = min(waiting, key=self._pass.__getitem__)
+            self._virtual_time = self._pass[name]
+            self._pass[name] += 1 / self.weights[name]
+            waiter = self._queues[name].popleft()
+        waiter.set()
+
+    @contextmanager
+    def slot(self, priority: str):
+        """Holds a slot for a request of the given class during the block"""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def set_concurrency(
+    limit: int | None = None, weights: dict[str, float] | None = None
+) -> None:
+    """Limits the number of concurrent SIGPAC requests of the process, scheduling them by priority class
+
+    Requests are "interactive" by default. The bulk APIs (`pipeline`, `shard`, `incremental`, `archive` and `reverse`) run
+    their requests as "bulk", and any block can choose the class of its requests with `priority`. With the default weights,
+    interactive requests get 8 of every 9 slots that free up while both classes are waiting, and bulk requests use the
+    whole limit while there are no interactive requests.
+
+    Parameters
+    ----------
+    limit : int | None
+        Maximum number of concurrent requests, `None` to remove the limit
+    weights : dict[str, float] | None
+        Weight of every priority class, `PRIORITY_WEIGHTS` by default
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    ValueError
+        If the limit is lower than 1 or a weight is not positive
+    """
+    global _scheduler
+
+    _scheduler = (
+        PriorityScheduler(limit, weights or PRIORITY_WEIGHTS)
+        if limit is not None
+        else None
+    )
+    if _hedger is not None:
+        # More hedger threads than slots would only wait for a slot
+        _hedger.resize(limit if limit is not None else _hedger_workers)
+
+
+@contextmanager
+def priority(name: str):
+    """Runs the SIGPAC requests of the block, in the current thread, with the given priority class
+
+        with priority("bulk"):
+            search({"community": 1})
+
+    Parameters
+    ----------
+    name : str
+        Priority class, "interactive" or "bulk" with the default weights
+    """
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextmanager
+def _request_slot():
+    """Holds a slot of the concurrency limit, if any, for a request of the current priority class"""
+    scheduler = _scheduler
+    if scheduler is None:
+        yield
+        return
+    name = _priority.get()
+    with metrics.span("http.wait", priority=name):
+        scheduler.acquire(name)
+    try:
+        yield
+    finally:
+        scheduler.release()
+
+
+def set_hedging(
+    percentile: float | None = 0.95, budget: float = 0.05, **options
+) -> None:
+    """Enables hedging of the SIGPAC requests, see `hedging.RequestHedger`
+
+    All the SIGPAC requests are idempotent GETs. With hedging, a request that has not answered after the given percentile of
+    the latency of its kind (tile, metadata, search) is sent again, and the first response wins.
+
+    Parameters
+    ----------
+    percentile : float | None
+        Percentile (0-1) of the latency after which a duplicate is sent, `None` to disable hedging
+    budget : float
+        Maximum fraction of the requests that can be duplicated
+    **options
+        Other options of `hedging.RequestHedger` (`min_delay`, `min_samples`, `window`, `max_workers`). While a limit is
+        set with `set_concurrency`, the hedger has as many threads as the limit instead of `max_workers`
+
+    Returns
+    -------
+    None
+    """
+    global _hedger, _hedger_workers
+
+    _hedger_workers = options.get("max_workers", DEFAULT_MAX_WORKERS)
+    if _scheduler is not None:
+        options["max_workers"] = _scheduler.limit
+    previous = _hedger
+    _hedger = (
+        RequestHedger(percentile, budget, **options) if percentile is not None else None
+    )
+    if previous is not None:
+        previous.close()
+
+
+def _fetch(url: str, headers: dict | None = None) -> tuple[int, bytes, Mapping]:
+    """Performs a single GET request, see `fetch`"""
+    get = get_http_client()
+    with _request_slot(), metrics.span("http.fetch") as span:
+        response = get(url, headers=headers) if headers else get(url)
+        content = response.content
+        span.set("status", response.status_code)
+        span.set("bytes", len(content))
+    if metrics.enabled():
+        metrics.increment("http.requests", status=response.status_code)
+        metrics.increment("http.bytes", len(content))
+    return response.status_code, content, response.headers
+
+
+def fetch(url: str, headers: dict | None = None) -> tuple[int, bytes, Mapping]:
+    """Performs a GET request to the given URL and returns the status code, the raw body and the headers of the response
+
+    The request is performed by the client set with `set_http_client`. Its library is imported on the first call, so importing
+    the modules that depend on the transport does not pay its import cost. With `set_concurrency`, the request waits for a
+    slot of its priority class first, and with `set_hedging` slow requests are sent again.
+
+    Parameters
+    ----------
+    url : str
+        URL to request
+    headers : dict | None
+        Headers of the request
+
+    Returns
+    -------
+    tuple[int, bytes, Mapping]
+        Status code, raw body and case-insensitive headers of the response
+    """
+    hedger = _hedger
+    if hedger is not None:
+        return hedger.run(partial(_fetch, url, headers), cache_kind(url) or "other")
+    return _fetch(url, headers)
+
+
+def add_source(source):
+    """Registers a local source of responses, consulted before the caches and the network (e.g. a `archive.TileArchive`)
+
+    Parameters
+    ----------
+    source : Any
+        Object with a `lookup(url) -> bytes | None` method that returns the raw body of the response to the URL, or `None` if
+        it does not have it
+
+    Returns
+    -------
+    Any
+        The registered source
+    """
+    _sources.append(source)
+    return source
+
+
+def remove_source(source) -> None:
+    """Unregisters the given local source of responses"""
+    _sources.remove(source)
+
+
+def get_content(url: str) -> bytes:
+    """Performs a GET request to the given URL and returns the raw body
+
+    Local sources registered with `add_source` are consulted first.
+    If the cache of the kind of the URL is enabled (see `sigpac_tools.cache.configure_cache`), successful responses are served from it.
+    Expired responses with an ETag or Last-Modified validator are revalidated with a conditional request, and reused if the
+    server answers 304 Not Modified.
+
+    Parameters
+    ----------
+    url : str
+        URL to request
+
+    Returns
+    -------
+    bytes
+        Raw body of the response
+    """
+    for source in _sources:
+        content = source.lookup(url)
+        if content is not None:
+            metrics.increment("source.hit")
+            return content
+
+    kind = cache_kind(url)
+    cache = get_cache(kind) if kind else None
+    if cache is None:
+        return fetch(url)[1]
+
+    cached = None
+    entry = cache.peek(url)
+    if entry is not None:
+        cached, expires = entry
+        if expires is None or expires >= time.time():
+            metrics.increment("cache.hit", cache=kind)
+            return cached.content
+    metrics.increment("cache.miss", cache=kind)
+
+    conditional = cached.conditional_headers() if cached is not None else None
+    status, content, headers = fetch(url, conditional)
+    if status == 304 and cached is not None:
+        metrics.increment("cache.revalidated", cache=kind)
+        cache.set(url, cached)
+        return cached.content
+    if status == 200:
+        cache.set(
+            url,
+            CachedResponse(content, headers.get("ETag"), headers.get("Last-Modified")),
+        )
+    return content
+
+
+def _whole_content(url: str) -> bytes | None:
+    """Returns the whole body of the response when it is not read from the network as a stream, `None` otherwise
+
+    Bodies from the local sources and the caches are already whole, and responses are fetched whole when the cache of
+    their kind is enabled (so that they can be cached) or when the HTTP client does not stream.
+    """
+    for source in _sources:
+        content = source.lookup(url)
+        if content is not None:
+            metrics.increment("source.hit")
+            return content
+    kind = cache_kind(url)
+    if (kind and get_cache(kind) is not None) or _client_name not in HTTP_CLIENTS:
+        return get_content(url)
+    return None
+
+
+def stream_content(url: str, chunk_size: int = 65536) -> Iterator[bytes]:
+    """Performs a GET request to the given URL and yields the raw body in chunks as it arrives
+
+    Responses from the local sources and the caches are yielded in a single chunk, and the response is fetched whole when the
+    cache of its kind is enabled, so that it can be cached. Closing the generator before the end closes the connection
+    without reading the rest of the body.
+
+    Parameters
+    ----------
+    url : str
+        URL to request
+    chunk_size : int
+        Maximum size of every chunk read from the network
+
+    Yields
+    ------
+    bytes
+        Chunks of the raw body of the response
+    """
+    content = _whole_content(url)
+    if content is not None:
+        yield content
+        return
+
+    with _request_slot(), metrics.span("http.fetch", streamed=True) as span:
+        response = get_http_client()(url, stream=True)
+        size = 0
+        try:
+            span.set("status", response.status_code)
+            read = getattr(response, "iter_content", None) or response.iter_bytes
+            for chunk in read(chunk_size):
+                size += len(chunk)
+                yield chunk
+        finally:
+            response.close()
+            span.set("bytes", size)
+            if metrics.enabled():
+                metrics.increment("http.requests", status=response.status_code)
+                metrics.increment("http.bytes", size)
+
+
+_TOKEN = re.compile(rb'[{}\[\]"]')
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_AFTER_STRING = re.compile(rb"\s*(:)?\s*(\S)")
+
+
+def iter_array_items(chunks: Iterable[bytes], key: str = "features") -> Iterator[Any]:
+    """Decodes the items of an array of a JSON object one by one, as the chunks of the body arrive
+
+    Only the boundaries of the items are scanned (braces and strings), and every item is decoded on its own with the
+    configured decoder, so neither the whole body nor its whole decoded tree is held in memory. Reading stops at the end of
+    the array.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        Chunks of the raw JSON body, e.g. from `stream_content`
+    key : str
+        Key of the top level object whose array is iterated, "features" for the GeoJSON feature collections
+
+    Yields
+    ------
+    Any
+        Decoded items of the array. Bodies that are not an object with the array (e.g. `null`) yield nothing
+
+    Raises
+    ------
+    ValueError
+        If the body ends in the middle of the array
+    """
+    target = b'"' + key.encode() + b'"'
+    chunks = iter(chunks)
+    buffer, position, depth, start, in_array = b"", 0, 0, None, False
+    while True:
+        match = _TOKEN.search(buffer, position)
+        if match is not None:
+            token = buffer[match.start() : match.end()]
+            if token != b'"':
+                position = match.end()
+                if token in b"{[":
+                    if in_array and depth == 2 and token == b"{":
+                        start = match.start()
+                    depth += 1
+                    continue
+                depth -= 1
+                if in_array and depth == 1:
+                    return
+                if start is not None and depth == 2:
+                    yield decode_json(buffer[start:position])
+                    start = None
+                continue
+            string = _STRING.match(buffer, match.start())
+            if string is not None:
+                if depth != 1 or in_array or string.group() != target:
+                    position = string.end()
+                    continue
+                # The key is the array only if it is followed by a colon and an opening bracket
+                following = _AFTER_STRING.match(buffer, string.end())
+                if following is not None and following.group(2) != b":":
+                    position = string.end()
+                    if following.group(1) and following.group(2) == b"[":
+                        in_array, depth, position = True, 2, following.end()
+                    continue
+            # The string, or what follows the key, continues in the next chunk
+            position = match.start()
+        else:
+            position = len(buffer)
+
+        chunk = next(chunks, None)
+        if chunk is None:
+            if in_array:
+                raise ValueError("The JSON body ends in the middle of the array")
+            return
+        cut = position if start is None else start
+        buffer, position = buffer[cut:] + chunk, position - cut
+        if start is not None:
+            start = 0
+
+
+def iter_json_items(url: str, key: str = "features") -> Iterator[Any]:
+    """Performs a GET request to the given URL and yields the decoded items of an array of the body as they arrive
+
+    See `stream_content` and `iter_array_items`. Closing the generator early (e.g. once the wanted feature is found) stops
+    reading the response. Bodies that are already whole (from the local sources or the caches, see `stream_content`) are
+    decoded at once instead, which is much faster than scanning them item by item.
+
+    Parameters
+    ----------
+    url : str
+        URL to request
+    key : str
+        Key of the top level object whose array is iterated, "features" for the GeoJSON feature collections
+
+    Yields
+    ------
+    Any
+        Decoded items of the array
+    """
+    content = _whole_content(url)
+    if content is not None:
+        with metrics.span("json.decode", bytes=len(content)) as span:
+            body = decode_json(content)
+            items = body.get(key) if isinstance(body, dict) else None
+            items = items if isinstance(items, list) else []
+            span.set("items", len(items))
+        yield from items
+        return
+
+    chunks = stream_content(url)
+    items = 0
+    with metrics.span("json.decode", streamed=True) as span:
+        try:
+            for item in iter_array_items(chunks, key):
+                items += 1
+                yield item
+        finally:
+            chunks.close()
+            span.set("items", items)
+
+
+def get_json(url: str) -> dict | list | None:
+    """Performs a GET request to the given URL and returns the decoded JSON body
+
+    The body is decoded straight from the raw response bytes, without building an intermediate `str`.
+    If the cache of the kind of the URL is enabled (see `sigpac_tools.cache.configure_cache`), successful responses are served from it.
+
+    Parameters
+    ----------
+    url : str
+        URL to request
+
+    Returns
+    -------
+    dict | list | None
+        Decoded JSON body of the response
+    """
+    content = get_content(url)
+    with metrics.span("json.decode", bytes=len(content)):
+        return decode_json(content)
@@ -1,10 +1,15 @@
 import math
-import pyproj
-import structlog
+from array import array
+from functools import lru_cache
 
 from sigpac_tools._globals import PROVINCES_BY_COMMUNITY
+from sigpac_tools._logging import get_logger
+from sigpac_tools.simplify import simplify_ring
 
-logger = structlog.get_logger()
+logger = get_logger()
+
+# WKT of the EPSG:3857 projection used by the SIGPAC vector tiles
+WEB_MERCATOR_WKT = 'PROJCS["WGS 84 / Pseudo-Mercator",GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS84",6378137,298.257223563,AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]],PROJECTION["Mercator_1SP"],PARAMETER["central_meridian",0],PARAMETER["scale_factor",1],PARAMETER["false_easting",0],PARAMETER["false_northing",0],UNIT["metre",1,AUTHORITY["EPSG","9001"]],AXIS["X",EAST],AXIS["Y",NORTH],EXTENSION["PROJ4","+proj=merc +a=6378137 +b=6378137 +lat_ts=0.0 +lon_0=0.0 +x_0=0.0 +y_0=0 +k=1.0 +units=m +nadgrids=@null +wktext  +no_defs"],AUTHORITY["EPSG","3857"]]'
 
 
 def lng_lat_to_tile(lng: float, lat: float, zoom: float) -> tuple[int, int]:
@@ -56,26 +61,152 @@ def lng_lat_to_tile(lng: float, lat: float, zoom: float) -> tuple[int, int]:
     return tx, ty
 
 
-def transform_coords(feature: dict, projection_id: str = "epsg:4326") -> None:
+def lng_lat_to_web_mercator(lng: float, lat: float) -> tuple[float, float]:
+    """Transforms the given coordinates from longitude and latitude to EPSG:3857, the projection of the SIGPAC vector tiles
+
+    Parameters
+    ----------
+    lng : float
+        Longitude of the location
+    lat : float
+        Latitude of the location
+
+    Returns
+    -------
+    tuple[float, float]
+        Returns a tuple with the x and y coordinates in meters
+    """
+    x = math.radians(lng) * 6378137
+    y = math.log(math.tan((90 + lat) * math.pi / 360.0)) * 6378137
+    return x, y
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> tuple[float, float, float, float]:
+    """Returns the bounds in EPSG:3857 of the given tile, with the same numbering as `lng_lat_to_tile`
+
+    Parameters
+    ----------
+    x : int
+        X coordinate of the tile
+    y : int
+        Y coordinate of the tile, counted from the south
+    zoom : int
+        Zoom level of the tile
+
+    Returns
+    -------
+    tuple[float, float, float, float]
+        Returns a tuple with the min x, min y, max x and max y of the tile in meters
+    """
+    ORIGIN_SHIFT = 2 * math.pi * 6378137 / 2.0
+    size = 2 * ORIGIN_SHIFT / 2**zoom
+    return (
+        x * size - ORIGIN_SHIFT,
+        y * size - ORIGIN_SHIFT,
+        (x + 1) * size - ORIGIN_SHIFT,
+        (y + 1) * size - ORIGIN_SHIFT,
+    )
+
+
+@lru_cache(maxsize=8)
+def _get_transformer(projection_id: str):
+    """Builds the transformer from EPSG:3857 to the given projection. `pyproj` is imported on the first call and the transformer is reused afterwards
+
+    Parameters
+    ----------
+    projection_id : str
+        Identifier of the target projection
+
+    Returns
+    -------
+    pyproj.Transformer
+        Transformer from EPSG:3857 to the given projection
+    """
+    import pyproj
+
+    return pyproj.Transformer.from_proj(WEB_MERCATOR_WKT, pyproj.Proj(projection_id))
+
+
+def transform_coords(
+    feature: dict,
+    projection_id: str = "epsg:4326",
+    tolerance: float | None = None,
+    precision: int | None = None,
+    owners: dict | None = None,
+) -> None:
     """Transforms the coordinates of the given feature from EPSG:3857 to EPSG:4326
 
+    Every ring is transformed with a single call to the transformer instead of one call per position. The optional output
+    transforms are applied in the same pass: rings are simplified before they are transformed, so only the kept positions
+    are reprojected, and the transformed coordinates are rounded as they are written back.
+
     Parameters
     ----------
     feature : dict
         Geojson feature to transform
+    projection_id : str
+        Identifier of the target projection
+    tolerance : float | None
+        If set, rings are simplified with `simplify.simplify_ring`, keeping them within this distance of the original ones, in EPSG:3857 units
+    precision : int | None
+        If set, transformed coordinates are rounded to this number of decimals
+    owners : dict | None
+        Features of the tile containing every vertex (see `simplify.vertex_owners`), so that simplification preserves the
+        borders shared with them
 
     Returns
     -------
     None
     """
-    for coords in feature["geometry"]["coordinates"]:
-        for coord in coords:
-            firstProjection = 'PROJCS["WGS 84 / Pseudo-Mercator",GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS84",6378137,298.257223563,AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]],PROJECTION["Mercator_1SP"],PARAMETER["central_meridian",0],PARAMETER["scale_factor",1],PARAMETER["false_easting",0],PARAMETER["false_northing",0],UNIT["metre",1,AUTHORITY["EPSG","9001"]],AXIS["X",EAST],AXIS["Y",NORTH],EXTENSION["PROJ4","+proj=merc +a=6378137 +b=6378137 +lat_ts=0.0 +lon_0=0.0 +x_0=0.0 +y_0=0 +k=1.0 +units=m +nadgrids=@null +wktext  +no_defs"],AUTHORITY["EPSG","3857"]]'
-            secondProjection = pyproj.Proj(projection_id)
-            optimus_prime = pyproj.Transformer.from_proj(
-                firstProjection, secondProjection
-            )
-            coord[1], coord[0] = optimus_prime.transform(coord[0], coord[1])
+    optimus_prime = _get_transformer(projection_id)
+    rings = feature["geometry"]["coordinates"]
+    for i, coords in enumerate(rings):
+        if tolerance:
+            coords = rings[i] = simplify_ring(coords, tolerance, owners)
+        lats, lons = optimus_prime.transform(
+            [coord[0] for coord in coords], [coord[1] for coord in coords]
+        )
+        if precision is not None:
+            lats = [round(lat, precision) for lat in lats]
+            lons = [round(lon, precision) for lon in lons]
+        for coord, lat, lon in zip(coords, lats, lons):
+            coord[1], coord[0] = lat, lon
+
+
+def transform_flat(
+    coords: array,
+    dims: int = 2,
+    projection_id: str = "epsg:4326",
+    precision: int | None = None,
+) -> None:
+    """Transforms in place a flat buffer of EPSG:3857 positions, like the `coords` of a compact `Geometry`, with a single call to the transformer
+
+    The transformed positions are stored in the same (longitude, latitude) order as `transform_coords` does.
+
+    Parameters
+    ----------
+    coords : array
+        Flat float64 buffer with the coordinates of every position one after the other
+    dims : int
+        Number of coordinates of every position
+    projection_id : str
+        Identifier of the target projection
+    precision : int | None
+        If set, transformed coordinates are rounded to this number of decimals
+
+    Returns
+    -------
+    None
+    """
+    if not coords:
+        return
+    first, second = _get_transformer(projection_id).transform(
+        coords[0::dims], coords[1::dims]
+    )
+    if precision is not None:
+        first = array("d", [round(value, precision) for value in first])
+        second = array("d", [round(value, precision) for value in second])
+    coords[1::dims], coords[0::dims] = first, second
 
 
 def find_community(province_id: int) -> int:
@@ -220,7 +351,7 @@ def validate_cadastral_registry(reference: str) -> None:
             )
 
         if code1 == separated_ref[18] and code2 == separated_ref[19]:
-            logger.info(f"Reference {reference} ({typo}) is valid.")
+            logger.info("Reference is valid", reference=reference, type=typo)
         else:
             raise ValueError(
                 f"Reference {reference} ({typo}) is not valid. Expected control characters: {code1}{code2}, but got {separated_ref[18]}{separated_ref[19]}. Please check the reference and try again."
@@ -0,0 +1,301 @@
+"""Generates the SIGPAC fixtures used by the tests and the benchmarks
+
+The fixtures mimic the responses recorded from the SIGPAC services: a grid of parcels that share their borders, each one split into several enclosures.
+They are generated deterministically, so running this script again produces the same files.
+
+    python tests/fixtures/generate.py
+"""
+
+import json
+import math
+import random
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).parent / "sigpac"
+REGISTRIES_FILE = Path(__file__).parent / "registries.json"
+
+ORIGIN_SHIFT = 2 * math.pi * 6378137 / 2.0
+ZOOM = 15
+TILE_X, TILE_Y = 15930, 20057  # Tile of (37.384, -4.98)
+PROVINCE, MUNICIPALITY, POLYGON = 14, 48, 5
+GRID = 12  # Parcels per tile side
+EDGE_VERTICES = 6  # Intermediate vertices per parcel edge
+QUERIED_PARCELS = range(1, GRID + 1)  # Parcels with search and metadata responses
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> tuple[float, float, float, float]:
+    size = 2 * ORIGIN_SHIFT / 2**zoom
+    return (
+        x * size - ORIGIN_SHIFT,
+        y * size - ORIGIN_SHIFT,
+        (x + 1) * size - ORIGIN_SHIFT,
+        (y + 1) * size - ORIGIN_SHIFT,
+    )
+
+
+def to_lng_lat(x: float, y: float) -> tuple[float, float]:
+    lng = x / ORIGIN_SHIFT * 180.0
+    lat = math.degrees(
+        2 * math.atan(math.exp(y / ORIGIN_SHIFT * math.pi)) - math.pi / 2
+    )
+    return lng, lat
+
+
+def bbox(coordinates: list[list[float]]) -> dict:
+    points = [to_lng_lat(x, y) for x, y in coordinates]
+    return {
+        "x1": round(min(p[0] for p in points), 7),
+        "y1": round(min(p[1] for p in points), 7),
+        "x2": round(max(p[0] for p in points), 7),
+        "y2": round(max(p[1] for p in points), 7),
+    }
+
+
+def control_characters(reference: str) -> str:
+    """Control characters of the first 18 characters of a rural cadastral reference"""
+    pos = [13, 15, 12, 5, 4, 17, 9, 21, 3, 7, 1]
+    letters = "MQWERTYUIOPASDFGHJKLBZX"
+
+    def value(char: str) -> int:
+        if char.isdigit():
+            return ord(char) - 48
+        return ord(char) - 63 if ord(char) > 78 else ord(char) - 64
+
+    mixt = sum(pos[i + 7] * (ord(reference[i + 14]) - 48) for i in range(4))
+    first = sum(pos[i] * value(reference[i]) for i in range(7))
+    second = sum(pos[i] * value(reference[i + 7]) for i in range(7))
+    return letters[(first + mixt) % 23] + letters[(second + mixt) % 23]
+
+
+def cadastral_registry(parcel: int) -> str:
+    reference = f"{PROVINCE:02}{MUNICIPALITY:03}A{POLYGON:03}{parcel:05}0000"
+    return reference + control_characters(reference)
+
+
+def build_grid(rng: random.Random, bounds, cells: int) -> list[list[tuple]]:
+    xmin, ymin, xmax, ymax = bounds
+    step_x = (xmax - xmin) / cells
+    step_y = (ymax - ymin) / cells
+    nodes = []
+    for j in range(cells + 1):
+        row = []
+        for i in range(cells + 1):
+            jitter_x = 0 if i in (0, cells) else rng.uniform(-0.2, 0.2) * step_x
+            jitter_y = 0 if j in (0, cells) else rng.uniform(-0.2, 0.2) * step_y
+            row.append((xmin + i * step_x + jitter_x, ymin + j * step_y + jitter_y))
+        nodes.append(row)
+    return nodes
+
+
+def edge(seed: str, a: tuple, b: tuple) -> list[tuple]:
+    """Intermediate vertices of the edge a-b, identical for both parcels sharing it"""
+    key = tuple(sorted([a, b]))
+    rng = random.Random(f"{seed}{key}")
+    points = []
+    for k in range(1, EDGE_VERTICES + 1):
+        t = k / (EDGE_VERTICES + 1)
+        dx, dy = key[1][0] - key[0][0], key[1][1] - key[0][1]
+        offset = rng.uniform(-0.03, 0.03)
+        points.append(
+            (key[0][0] + dx * t - dy * offset, key[0][1] + dy * t + dx * offset)
+        )
+    return points if key[0] == a else points[::-1]
+
+
+def ring(seed: str, corners: list[tuple]) -> list[list[float]]:
+    coords = []
+    for a, b in zip(corners, corners[1:] + corners[:1]):
+        coords.append(a)
+        coords.extend(edge(seed, a, b))
+    coords.append(corners[0])
+    return [[round(x, 4), round(y, 4)] for x, y in coords]
+
+
+def build_tiles() -> tuple[dict, dict]:
+    rng = random.Random(2024)
+    bounds = tile_bounds(TILE_X, TILE_Y, ZOOM)
+    nodes = build_grid(rng, bounds, GRID)
+    parcels = {"type": "FeatureCollection", "features": []}
+    enclosures = {"type": "FeatureCollection", "features": []}
+    parcel = 0
+    for j in range(GRID):
+        for i in range(GRID):
+            parcel += 1
+            corners = [
+                nodes[j][i],
+                nodes[j][i + 1],
+                nodes[j + 1][i + 1],
+                nodes[j + 1][i],
+            ]
+            properties = {
+                "provincia": PROVINCE,
+                "municipio": MUNICIPALITY,
+                "agregado": 0,
+                "zona": 0,
+                "poligono": POLYGON,
+                "parcela": parcel,
+                "superficie": round(rng.uniform(5000, 15000), 2),
+            }
+            parcels["features"].append(
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "Polygon",
+                        "coordinates": [ring("p", corners)],
+                    },
+                    "properties": properties,
+                }
+            )
+            # Enclosures split the parcel vertically in strips
+            splits = rng.randint(1, 3)
+            left = (corners[0], corners[3])
+            for k in range(1, splits + 1):
+                t = k / splits
+                right = (
+                    tuple(a + (b - a) * t for a, b in zip(corners[0], corners[1])),
+                    tuple(a + (b - a) * t for a, b in zip(corners[3], corners[2])),
+                )
+                strip = [left[0], right[0], right[1], left[1]]
+                enclosures["features"].append(
+                    {
+                        "type": "Feature",
+                        "geometry": {
+                            "type": "Polygon",
+                            "coordinates": [ring("r", strip)],
+                        },
+                        "properties": {
+                            **{
+                                key: properties[key]
+                                for key in properties
+                                if key != "superficie"
+                            },
+                            "recinto": k,
+                            "superficie": round(properties["superficie"] / splits, 2),
+                            "pendiente_media": round(rng.uniform(0, 25), 1),
+                            "coef_regadio": 0,
+                            "uso_sigpac": rng.choice(["TA", "OV", "PS", "FO", "IM"]),
+                            "incidencias": None,
+                            "region": rng.choice(["0201", "0401", None]),
+                        },
+                    }
+                )
+                left = right
+    return parcels, enclosures
+
+
+def write(path: str, document) -> None:
+    target = FIXTURES_DIR / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(json.dumps(document, separators=(",", ":"), ensure_ascii=False))
+
+
+def query_collection(features: list[dict]) -> dict:
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "geometry": None, "properties": properties}
+            for properties in features
+        ],
+    }
+
+
+def build_queries(parcels: dict, enclosures: dict) -> dict[str, dict]:
+    """Responses of the "query" service for the hierarchy of the generated tile"""
+    tile = bbox(
+        [
+            tile_bounds(TILE_X, TILE_Y, ZOOM)[:2],
+            tile_bounds(TILE_X, TILE_Y, ZOOM)[2:],
+        ]
+    )
+    hierarchy = {
+        "provincias/1": [
+            {"id": province, "codigo": province, "descripcion": f"PROVINCIA {province}"}
+            | tile
+            for province in [4, 11, 14, 18, 21, 23, 29, 41]
+        ],
+        f"municipios/{PROVINCE}": [
+            {"id": muni, "codigo": muni, "descripcion": f"MUNICIPIO {muni}"} | tile
+            for muni in range(MUNICIPALITY - 2, MUNICIPALITY + 3)
+        ],
+        f"poligonos/{PROVINCE}/{MUNICIPALITY}/0/0": [
+            {"id": polg, "codigo": polg, "descripcion": f"POLIGONO {polg}"} | tile
+            for polg in range(1, 9)
+        ],
+        f"parcelas/{PROVINCE}/{MUNICIPALITY}/0/0/{POLYGON}": [
+            {"id": f["properties"]["parcela"], "codigo": f["properties"]["parcela"]}
+            | bbox(f["geometry"]["coordinates"][0])
+            for f in parcels["features"]
+        ],
+    }
+    for parcel in QUERIED_PARCELS:
+        hierarchy[f"recintos/{PROVINCE}/{MUNICIPALITY}/0/0/{POLYGON}/{parcel}"] = [
+            {
+                "id": f["properties"]["recinto"],
+                "codigo": f["properties"]["recinto"],
+                "uso_sigpac": f["properties"]["uso_sigpac"],
+                "superficie": f["properties"]["superficie"],
+                "parcela": parcel,
+            }
+            | bbox(f["geometry"]["coordinates"][0])
+            for f in enclosures["features"]
+            if f["properties"]["parcela"] == parcel
+        ]
+    return {path: query_collection(features) for path, features in hierarchy.items()}
+
+
+def build_layerinfo(parcels: dict, enclosures: dict) -> dict[str, dict]:
+    """Responses of the "layerinfo" service for the queried parcels and their enclosures"""
+    responses = {}
+    by_parcel = {f["properties"]["parcela"]: f for f in parcels["features"]}
+    for parcel in QUERIED_PARCELS:
+        parcel_id = f"{PROVINCE},{MUNICIPALITY},0,0,{POLYGON},{parcel}"
+        properties = by_parcel[parcel]["properties"]
+        usos = [
+            {
+                "recinto": f["properties"]["recinto"],
+                "uso_sigpac": f["properties"]["uso_sigpac"],
+                "superficie": f["properties"]["superficie"],
+                "pendiente_media": f["properties"]["pendiente_media"],
+            }
+            for f in enclosures["features"]
+            if f["properties"]["parcela"] == parcel
+        ]
+        responses[f"parcela/{parcel_id}"] = {
+            "id": [PROVINCE, MUNICIPALITY, 0, 0, POLYGON, parcel],
+            "parcelaInfo": {
+                "provincia": f"{PROVINCE} - CORDOBA",
+                "municipio": f"{MUNICIPALITY} - MUNICIPIO {MUNICIPALITY}",
+                "poligono": POLYGON,
+                "parcela": parcel,
+                "referencia_cat": cadastral_registry(parcel),
+                "dn_surface": properties["superficie"],
+            },
+            "vigencia": "2024",
+            "usos": usos,
+        }
+        for uso in usos:
+            responses[f"recinto/{parcel_id},{uso['recinto']}"] = {
+                "id": [PROVINCE, MUNICIPALITY, 0, 0, POLYGON, parcel, uso["recinto"]],
+                "query": [uso | {"coef_regadio": 0, "incidencias": None}],
+                "vigencia": "2024",
+                "convergencia": None,
+            }
+    return responses
+
+
+def main():
+    parcels, enclosures = build_tiles()
+    write(f"vectorsdg/vector/parcela@3857/{ZOOM}.{TILE_X}.{TILE_Y}.geojson", parcels)
+    write(f"vectorsdg/vector/recinto@3857/{ZOOM}.{TILE_X}.{TILE_Y}.geojson", enclosures)
+    for path, document in build_queries(parcels, enclosures).items():
+        write(f"fega/serviciosvisorsigpac/query/{path}", document)
+    for path, document in build_layerinfo(parcels, enclosures).items():
+        write(f"fega/serviciosvisorsigpac/layerinfo/{path}", document)
+    REGISTRIES_FILE.write_text(
+        json.dumps([cadastral_registry(parcel) for parcel in QUERIED_PARCELS], indent=2)
+        + "\n"
+    )
+
+
+if __name__ == "__main__":
+    main()
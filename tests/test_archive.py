@@ -0,0 +1,103 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools import _globals, transport
+from sigpac_tools.archive import TileArchive, build_archive, tile_range
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.mock_server import MockSigpacServer
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+
+LAT, LON = 37.384, -4.98
+BBOX = (-4.981, 37.383, -4.975, 37.39)
+
+
+@pytest.fixture(scope="module")
+def archive_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("archive") / "tiles.sigpac"
+    with MockSigpacServer(FIXTURES_DIR):
+        summary = build_archive(path, BBOX, workers=2)
+    assert summary["tiles"] == 2
+    assert summary["missing"] == 6
+    return path
+
+
+class TestTileArchive:
+    def test_tile_range(self):
+        assert tile_range(BBOX) == (15930, 20057, 15931, 20058)
+        with pytest.raises(ValueError):
+            tile_range((0, 1, 1, 0))
+
+    def test_get(self, archive_path):
+        expected = (
+            FIXTURES_DIR
+            / "vectorsdg"
+            / "vector"
+            / "parcela@3857"
+            / "15.15930.20057.geojson"
+        ).read_bytes()
+        with TileArchive(archive_path) as archive:
+            assert archive.get("parcela", 15930, 20057) == expected
+            assert ("recinto", 15930, 20057) in archive
+            assert archive.get("parcela", 15931, 20057) is None
+            assert archive.get("parcela", 0, 0) is None
+            assert archive.get("other", 15930, 20057) is None
+
+    def test_offline_geometry(self, archive_path, monkeypatch):
+        with MockSigpacServer(FIXTURES_DIR):
+            expected = [
+                geometry_from_coords(layer, LAT, LON, 5)
+                for layer in ("parcela", "recinto")
+            ]
+        monkeypatch.setattr(_globals, "BASE_URL", "http://127.0.0.1:9")
+        with TileArchive(archive_path):
+            results = [
+                geometry_from_coords(layer, LAT, LON, 5)
+                for layer in ("parcela", "recinto")
+            ]
+        assert results == expected
+        assert transport._sources == []
+
+    def test_uncompressed(self, tmp_path):
+        path = tmp_path / "tiles.sigpac"
+        with MockSigpacServer(FIXTURES_DIR):
+            build_archive(path, BBOX, layers=("recinto",), compress=False)
+        with TileArchive(path) as archive:
+            assert not archive.compressed
+            assert archive.layers == ["recinto"]
+            assert archive.get("recinto", 15930, 20057) is not None
+
+    def test_undecodable_tile(self, tmp_path):
+        fixtures = tmp_path / "sigpac"
+        shutil.copytree(FIXTURES_DIR, fixtures)
+        tile = (
+            fixtures
+            / "vectorsdg"
+            / "vector"
+            / "recinto@3857"
+            / "15.15930.20058.geojson"
+        )
+        tile.write_text("<html>Service unavailable</html>")
+        path = tmp_path / "tiles.sigpac"
+        with MockSigpacServer(fixtures):
+            summary = build_archive(path, BBOX, layers=("recinto",), workers=1)
+        assert summary["tiles"] == 1
+        assert summary["missing"] == 3
+        with TileArchive(path) as archive:
+            assert archive.get("recinto", 15930, 20058) is None
+
+    def test_invalid_layer(self, tmp_path):
+        with pytest.raises(KeyError):
+            build_archive(tmp_path / "tiles.sigpac", BBOX, layers=("other",))
+
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / "tiles.sigpac"
+        path.write_bytes(b"not an archive" * 4)
+        with pytest.raises(ValueError):
+            TileArchive(path)
+
+
+if __name__ == "__main__":
+    pytest.main()
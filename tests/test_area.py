@@ -0,0 +1,114 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.area import features_in_area
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.utils import tile_bounds
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+TILE = FIXTURES_DIR / "vectorsdg" / "vector" / "parcela@3857" / "15.15930.20057.geojson"
+
+BBOX = (-4.981, 37.383, -4.979, 37.385)
+
+
+def _square(x0: float, y0: float, x1: float, y1: float) -> list:
+    return [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]
+
+
+def _feature(parcela: int, coordinates: list) -> dict:
+    properties = {"provincia": 14, "municipio": 48, "poligono": 5, "parcela": parcela}
+    return {
+        "type": "Feature",
+        "properties": properties,
+        "geometry": {"type": "Polygon", "coordinates": coordinates},
+    }
+
+
+def _write_tile(directory: Path, zoom: int, x: int, y: int, features: list) -> None:
+    path = (
+        directory / "vectorsdg" / "vector" / "parcela@3857" / f"{zoom}.{x}.{y}.geojson"
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+
+
+class TestFeaturesInArea:
+    def test_falls_back_to_served_zoom(self):
+        references = {
+            tuple(feature["properties"].values())
+            for feature in json.loads(TILE.read_text())["features"]
+        }
+        with MockSigpacServer(FIXTURES_DIR) as server:
+            collection = features_in_area("parcela", BBOX, min_zoom=13)
+        # Zoom 13 and 14 are not served, so the area is covered with the zoom 15 tile
+        assert server.stats["requests"] == 3
+        assert len(collection["features"]) == len(references)
+        lon, lat = collection["features"][0]["geometry"]["coordinates"][0][0]
+        assert -5 < lon < -4.9 and 37.3 < lat < 37.4
+
+    def test_coarse_tile(self, tmp_path):
+        shutil.copytree(FIXTURES_DIR, tmp_path, dirs_exist_ok=True)
+        coarse = (
+            tmp_path / "vectorsdg" / "vector" / "parcela@3857" / "14.7965.10028.geojson"
+        )
+        shutil.copy(TILE, coarse)
+        with MockSigpacServer(tmp_path) as server:
+            features_in_area("parcela", BBOX, min_zoom=14)
+            assert server.stats["requests"] == 1
+
+            # Tiles with too many features are refined
+            features_in_area("parcela", BBOX, min_zoom=14, max_features=100)
+            assert server.stats["requests"] == 3
+
+    def test_joins_clipped_features(self, tmp_path):
+        x0, y0, edge, y1 = tile_bounds(15930, 20057, 15)
+        _write_tile(
+            tmp_path,
+            15,
+            15930,
+            20057,
+            [
+                _feature(1, _square(edge - 100, y0 + 10, edge + 3, y0 + 50)),
+                _feature(2, _square(x0 + 10, y0 + 10, x0 + 50, y0 + 50)),
+                # Also in the next tile, where it is whole
+                _feature(3, _square(edge - 2, y0 + 60, edge + 20, y0 + 90)),
+            ],
+        )
+        _write_tile(
+            tmp_path,
+            15,
+            15931,
+            20057,
+            [
+                _feature(1, _square(edge - 3, y0 + 10, edge + 100, y0 + 50)),
+                _feature(3, _square(edge + 1, y0 + 60, edge + 20, y0 + 90)),
+            ],
+        )
+        bbox = (-4.985, 37.379, -4.97, 37.38)
+        with MockSigpacServer(tmp_path):
+            collection = features_in_area("parcela", bbox, min_zoom=15)
+        by_parcela = {
+            feature["properties"]["parcela"]: feature["geometry"]
+            for feature in collection["features"]
+        }
+        assert by_parcela[1]["type"] == "MultiPolygon"
+        assert len(by_parcela[1]["coordinates"]) == 2
+        assert by_parcela[2]["type"] == "Polygon"
+        assert by_parcela[3]["type"] == "Polygon"
+        assert (
+            by_parcela[3]["coordinates"][0][0][0]
+            > by_parcela[2]["coordinates"][0][2][0]
+        )
+
+    def test_invalid_arguments(self):
+        with pytest.raises(KeyError):
+            features_in_area("invalid", BBOX)
+        with pytest.raises(ValueError):
+            features_in_area("parcela", BBOX, min_zoom=16)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,82 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.anotate import get_metadata
+from sigpac_tools.batch import SpillBuffer, find_batch, metadata_batch, run_batch
+from sigpac_tools.mock_server import MockSigpacServer
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+REGISTRIES = json.loads(
+    (Path(__file__).parent / "fixtures" / "registries.json").read_text()
+)
+
+
+class TestSpillBuffer:
+    def test_in_memory(self, tmp_path):
+        with SpillBuffer(directory=tmp_path) as buffer:
+            buffer[2] = "c"
+            buffer[0] = "a"
+            assert len(buffer) == 3
+            assert list(buffer) == ["a", None, "c"]
+            assert buffer.segments == []
+
+    def test_spills_in_order(self, tmp_path):
+        values = {i: {"index": i, "data": "x" * 100} for i in range(200)}
+        with SpillBuffer(memory_budget=2048, directory=tmp_path) as buffer:
+            for i in sorted(values, key=lambda i: (i * 37) % 200):
+                buffer[i] = values[i]
+            # Stored again after it was spilled
+            buffer[0] = {"index": 0, "data": "new"}
+            assert len(buffer.segments) > 1
+            assert buffer.spilled_bytes > 0
+            results = list(buffer)
+        assert results[0]["data"] == "new"
+        assert results[1:] == [values[i] for i in range(1, 200)]
+        assert not list(tmp_path.iterdir())
+
+    def test_invalid_budget(self):
+        with pytest.raises(ValueError):
+            SpillBuffer(memory_budget=0)
+
+
+class TestRunBatch:
+    def test_order_and_failures(self, tmp_path):
+        def func(item: int) -> int:
+            time.sleep(0.001 * (item % 3))
+            if item == 5:
+                raise ValueError("failed")
+            return item * 2
+
+        results = run_batch(
+            func, iter(range(50)), workers=4, memory_budget=512, directory=tmp_path
+        )
+        assert list(results) == [None if i == 5 else i * 2 for i in range(50)]
+        assert not list(tmp_path.iterdir())
+
+    def test_closed_early(self, tmp_path):
+        results = run_batch(str, range(100), memory_budget=256, directory=tmp_path)
+        assert next(results) == "0"
+        assert list(tmp_path.iterdir())
+        results.close()
+        assert not list(tmp_path.iterdir())
+
+    def test_metadata_and_find(self):
+        records = [
+            {"province": 14, "municipality": 48, "polygon": 5, "parcel": parcel}
+            for parcel in (1, 2, 3)
+        ]
+        with MockSigpacServer(FIXTURES_DIR):
+            expected = [get_metadata("parcela", record) for record in records]
+            assert list(metadata_batch("parcela", records, memory_budget=1024)) == (
+                expected
+            )
+            found = list(find_batch(REGISTRIES[:3] + ["invalid"], workers=2))
+        assert [metadata for _, metadata in found[:3]] == expected
+        assert found[3] is None
+
+
+if __name__ == "__main__":
+    pytest.main()
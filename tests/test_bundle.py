@@ -0,0 +1,202 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools import _globals, transport
+from sigpac_tools.bundle import CacheBundle, export_bundle, import_bundle, warm_caches
+from sigpac_tools.cache import (
+    CachedResponse,
+    configure_cache,
+    disable_cache,
+    get_cache,
+)
+from sigpac_tools.find import find_from_cadastral_registry
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.mock_server import MockSigpacServer
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+REGISTRIES = json.loads(
+    (Path(__file__).parent / "fixtures" / "registries.json").read_text()
+)
+
+LAT, LON = 37.384, -4.98
+BBOX = (-4.981, 37.383, -4.975, 37.39)
+TILE = "/vectorsdg/vector/recinto@3857/15.15930.20057.geojson"
+SEARCH = "/fega/serviciosvisorsigpac/query/municipios/14.geojson"
+
+
+@pytest.fixture
+def caches():
+    configure_cache()
+    yield
+    disable_cache()
+
+
+def _fill(caches: dict[str, list[tuple[str, CachedResponse, float | None]]]) -> None:
+    for kind, entries in caches.items():
+        for path, response, expires in entries:
+            get_cache(kind).set(_globals.BASE_URL + path, response, expires=expires)
+
+
+class TestCacheBundle:
+    def test_round_trip(self, caches, tmp_path, monkeypatch):
+        with MockSigpacServer(FIXTURES_DIR):
+            expected = geometry_from_coords("recinto", LAT, LON, 5)
+            tile = transport.get_content(_globals.BASE_URL + TILE)
+            summary = export_bundle(tmp_path / "cache.bundle")
+        assert summary["entries"] == len(get_cache("tile")) + len(
+            get_cache("metadata")
+        ) + len(get_cache("search"))
+
+        disable_cache()
+        monkeypatch.setattr(_globals, "BASE_URL", "http://127.0.0.1:9")
+        assert import_bundle(tmp_path / "cache.bundle") == {
+            "imported": summary["entries"],
+            "kept": 0,
+            "expired": 0,
+        }
+        assert get_cache("tile").get(_globals.BASE_URL + TILE).content == tile
+        # Served from the imported caches, without the server
+        assert geometry_from_coords("recinto", LAT, LON, 5) == expected
+
+    def test_merge(self, caches, tmp_path):
+        now = time.time()
+        _fill(
+            {
+                "tile": [
+                    ("/a", CachedResponse(b"old"), now + 10),
+                    ("/b", CachedResponse(b"old"), now + 10),
+                ],
+                "search": [("/c", CachedResponse(b"old", etag='"1"'), now - 10)],
+            }
+        )
+        export_bundle(tmp_path / "cache.bundle")
+        disable_cache()
+        configure_cache(["tile"])
+        _fill({"tile": [("/a", CachedResponse(b"new"), now + 100)]})
+
+        summary = import_bundle(tmp_path / "cache.bundle")
+        assert summary == {"imported": 2, "kept": 1, "expired": 0}
+        assert get_cache("tile").get(_globals.BASE_URL + "/a").content == b"new"
+        assert get_cache("tile").get(_globals.BASE_URL + "/b").content == b"old"
+        # Expired entries with a validator are imported to be revalidated
+        response, expires = get_cache("search").peek(_globals.BASE_URL + "/c")
+        assert response.etag == '"1"' and expires < now
+
+    def test_expired_without_validators(self, caches, tmp_path):
+        _fill({"tile": [("/a", CachedResponse(b"a"), time.time() - 1)]})
+        export_bundle(tmp_path / "cache.bundle")
+        disable_cache()
+        assert import_bundle(tmp_path / "cache.bundle")["expired"] == 1
+        assert get_cache("tile") is None
+
+    def test_region(self, caches, tmp_path):
+        response = CachedResponse(b"{}")
+        _fill(
+            {
+                "tile": [
+                    (TILE, response, None),
+                    ("/vectorsdg/vector/recinto@3857/15.1.2.geojson", response, None),
+                ],
+                "search": [
+                    (SEARCH, response, None),
+                    (
+                        "/fega/serviciosvisorsigpac/query/provincias/1.geojson",
+                        response,
+                        None,
+                    ),
+                    (
+                        "/fega/serviciosvisorsigpac/query/provincias/2.geojson",
+                        response,
+                        None,
+                    ),
+                    (
+                        "/fega/serviciosvisorsigpac/query/municipios/41.geojson",
+                        response,
+                        None,
+                    ),
+                ],
+            }
+        )
+        export_bundle(tmp_path / "cache.bundle", bbox=BBOX, provinces=[14])
+        with CacheBundle(tmp_path / "cache.bundle") as bundle:
+            assert sorted(entry["path"] for entry in bundle.entries) == sorted(
+                [TILE, SEARCH, "/fega/serviciosvisorsigpac/query/provincias/1.geojson"]
+            )
+
+    def test_max_age(self, caches, tmp_path):
+        _fill({"tile": [("/a", CachedResponse(b"a"), None)]})
+        export_bundle(tmp_path / "cache.bundle")
+        time.sleep(0.01)
+        with pytest.raises(ValueError):
+            import_bundle(tmp_path / "cache.bundle", max_age=0)
+
+    def test_corrupted(self, caches, tmp_path):
+        _fill({"tile": [("/a", CachedResponse(b"a" * 100), None)]})
+        path = tmp_path / "cache.bundle"
+        export_bundle(path)
+        content = bytearray(path.read_bytes())
+        disable_cache()
+
+        # Index
+        corrupted = content.copy()
+        corrupted[-1] ^= 0xFF
+        path.write_bytes(corrupted)
+        with pytest.raises(ValueError):
+            CacheBundle(path)
+
+        # Body
+        corrupted = content.copy()
+        corrupted[64 + 4] ^= 0xFF
+        path.write_bytes(corrupted)
+        with pytest.raises(ValueError):
+            import_bundle(path)
+
+        path.write_bytes(b"not a bundle")
+        with pytest.raises(ValueError):
+            CacheBundle(path)
+
+    def test_memory_mapped_source(self, caches, tmp_path, monkeypatch):
+        with MockSigpacServer(FIXTURES_DIR):
+            warm_caches(BBOX, ["tile"], layers=("recinto",), workers=2)
+            expected = geometry_from_coords("recinto", LAT, LON, 5)
+            export_bundle(tmp_path / "cache.bundle", kinds=["tile"])
+        disable_cache()
+
+        monkeypatch.setattr(_globals, "BASE_URL", "http://127.0.0.1:9")
+        with CacheBundle(tmp_path / "cache.bundle"):
+            assert geometry_from_coords("recinto", LAT, LON, 5) == expected
+        assert transport._sources == []
+        assert get_cache("tile") is None
+
+    def test_warm_caches(self, tmp_path, monkeypatch):
+        with MockSigpacServer(FIXTURES_DIR):
+            expected = find_from_cadastral_registry(REGISTRIES[0])
+            # Caches far too small for the area are grown instead of evicting the warmed responses
+            configure_cache(maxsize=1)
+            try:
+                summary = warm_caches(BBOX, layers=("parcela",), workers=4)
+                exported = export_bundle(tmp_path / "cache.bundle")
+            finally:
+                disable_cache()
+        # 4 tiles, the polygons of the municipality, the parcels of the polygon and the enclosures and metadata of its
+        # 144 parcels
+        assert summary == {"tile": 4, "search": 2 + 144, "metadata": 144}
+        assert exported["entries"] > 1
+
+        monkeypatch.setattr(_globals, "BASE_URL", "http://127.0.0.1:9")
+        try:
+            import_bundle(tmp_path / "cache.bundle")
+            assert find_from_cadastral_registry(REGISTRIES[0]) == expected
+        finally:
+            disable_cache()
+
+    def test_warm_caches_invalid_kind(self):
+        with pytest.raises(KeyError):
+            warm_caches(BBOX, ["other"])
+
+
+if __name__ == "__main__":
+    pytest.main()
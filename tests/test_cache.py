@@ -0,0 +1,138 @@
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from sigpac_tools import metrics
+from sigpac_tools.cache import (
+    CachedResponse,
+    TTLCache,
+    cache_kind,
+    configure_cache,
+    disable_cache,
+    get_cache,
+)
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.mock_server import MockSigpacServer
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+
+
+@pytest.fixture
+def caches():
+    configure_cache()
+    yield
+    disable_cache()
+
+
+class TestTTLCache:
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+
+    def test_expiration(self):
+        cache = TTLCache(ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2, expires=time.time() - 1)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert len(cache) == 1
+
+    def test_never_expires(self):
+        cache = TTLCache(ttl=None)
+        cache.set("a", 1)
+        assert cache.items() == [("a", 1, None)]
+
+
+class TestCacheKinds:
+    @pytest.mark.parametrize(
+        "url, kind",
+        [
+            ("https://x/vectorsdg/vector/parcela@3857/15.1.2.geojson", "tile"),
+            ("https://x/fega/serviciosvisorsigpac/layerinfo/parcela/1,2", "metadata"),
+            ("https://x/fega/serviciosvisorsigpac/query/provincias/1", "search"),
+            ("https://x/other", None),
+        ],
+    )
+    def test_cache_kind(self, url, kind):
+        assert cache_kind(url) == kind
+
+    def test_unsupported_kind(self):
+        with pytest.raises(KeyError):
+            configure_cache(["images"])
+
+    def test_disabled_by_default(self):
+        assert get_cache("tile") is None
+
+
+class TestTransportCache:
+    def test_tiles_are_fetched_once(self, caches):
+        hook = metrics.add_hook(metrics.PrometheusHook())
+        try:
+            with MockSigpacServer(FIXTURES_DIR) as server:
+                first = geometry_from_coords("parcela", 37.384, -4.98, 1)
+                second = geometry_from_coords("parcela", 37.384, -4.98, 1)
+                assert server.stats["requests"] == 1
+        finally:
+            metrics.remove_hook(hook)
+        # The cached tile is decoded again, so the reprojection is not applied twice
+        assert first == second
+        assert hook.counter("cache.hit", cache="tile") == 1
+        assert hook.counter("cache.miss", cache="tile") == 1
+
+    @patch("sigpac_tools.transport.fetch")
+    def test_errors_are_not_cached(self, mock_fetch, caches):
+        mock_fetch.return_value = (503, b'{"error": "Service Unavailable"}', {})
+        from sigpac_tools.transport import get_json
+
+        url = "http://localhost/fega/serviciosvisorsigpac/query/provincias/1"
+        get_json(url)
+        get_json(url)
+        assert mock_fetch.call_count == 2
+
+
+class TestConditionalRequests:
+    def test_expired_responses_are_revalidated(self, caches):
+        configure_cache(["tile"], ttl=0)
+        hook = metrics.add_hook(metrics.PrometheusHook())
+        try:
+            with MockSigpacServer(FIXTURES_DIR) as server:
+                first = geometry_from_coords("parcela", 37.384, -4.98, 1)
+                second = geometry_from_coords("parcela", 37.384, -4.98, 1)
+                assert server.stats["requests"] == 2
+                assert server.stats["not_modified"] == 1
+        finally:
+            metrics.remove_hook(hook)
+        assert first == second
+        assert hook.counter("cache.revalidated", cache="tile") == 1
+
+    @patch("sigpac_tools.transport.fetch")
+    def test_sends_validators(self, mock_fetch, caches):
+        from sigpac_tools.transport import get_content
+
+        url = "http://localhost/fega/serviciosvisorsigpac/query/provincias/1"
+        get_cache("search").set(
+            url,
+            CachedResponse(b"[]", '"abc"', "Mon, 19 Oct 2026 07:00:00 GMT"),
+            expires=time.time() - 1,
+        )
+        mock_fetch.return_value = (200, b"[1]", {"ETag": '"def"'})
+        assert get_content(url) == b"[1]"
+        mock_fetch.assert_called_once_with(
+            url,
+            {
+                "If-None-Match": '"abc"',
+                "If-Modified-Since": "Mon, 19 Oct 2026 07:00:00 GMT",
+            },
+        )
+        assert get_cache("search").get(url).etag == '"def"'
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,63 @@
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.changes import diff, feature_identity
+from sigpac_tools.models import FeatureCollection
+
+TILE = json.loads(
+    (
+        Path(__file__).parent
+        / "fixtures"
+        / "sigpac"
+        / "vectorsdg"
+        / "vector"
+        / "recinto@3857"
+        / "15.15930.20057.geojson"
+    ).read_text()
+)
+
+
+class TestDiff:
+    def test_identical_snapshots(self):
+        assert diff(TILE, copy.deepcopy(TILE)) == {
+            "added": [],
+            "removed": [],
+            "changed": [],
+        }
+
+    def test_changes(self):
+        new = copy.deepcopy(TILE)
+        removed = new["features"].pop(0)
+        new["features"][0]["properties"]["uso_sigpac"] = "OV"
+        new["features"][1]["geometry"]["coordinates"][0][0][0] += 1.0
+        added = copy.deepcopy(new["features"][2])
+        added["properties"]["recinto"] = 99
+        new["features"].append(added)
+
+        changes = diff(TILE, new)
+        assert changes["removed"] == [dict(feature_identity(removed["properties"]))]
+        assert changes["added"] == [dict(feature_identity(added["properties"]))]
+        assert changes["changed"] == [
+            dict(feature_identity(feature["properties"]))
+            for feature in new["features"][:2]
+        ]
+
+    def test_compact_and_missing_snapshots(self):
+        changes = diff(None, FeatureCollection.from_geojson(TILE))
+        assert len(changes["added"]) == len(TILE["features"])
+        assert changes["added"][0] == {
+            "provincia": 14,
+            "municipio": 48,
+            "agregado": 0,
+            "zona": 0,
+            "poligono": 5,
+            "parcela": 1,
+            "recinto": 1,
+        }
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,125 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.export import ColumnarReader, ColumnarWriter, write_features
+from sigpac_tools.models import Feature, FeatureCollection, Geometry
+
+TILE = json.loads(
+    (
+        Path(__file__).parent
+        / "fixtures"
+        / "sigpac"
+        / "vectorsdg"
+        / "vector"
+        / "recinto@3857"
+        / "15.15930.20057.geojson"
+    ).read_text()
+)
+
+
+class TestColumnarFormat:
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / "tile.sgc"
+        assert write_features(path, TILE["features"], chunk_size=50) == len(
+            TILE["features"]
+        )
+        with ColumnarReader(path) as reader:
+            assert len(reader) == len(TILE["features"])
+            assert list(reader) == TILE["features"]
+
+    def test_random_access(self, tmp_path):
+        path = tmp_path / "tile.sgc"
+        write_features(path, TILE["features"], chunk_size=16)
+        with ColumnarReader(path) as reader:
+            for index in (0, 15, 16, 200, -1):
+                assert reader[index] == TILE["features"][index]
+            with pytest.raises(IndexError):
+                reader[len(TILE["features"])]
+
+    def test_compact_features(self, tmp_path):
+        path = tmp_path / "tile.sgc"
+        write_features(path, FeatureCollection.from_geojson(TILE))
+        with ColumnarReader(path) as reader:
+            feature = reader.feature(3, compact=True)
+            assert isinstance(feature, Feature)
+            assert feature.geometry == TILE["features"][3]["geometry"]
+
+    def test_geometries_and_missing_values(self, tmp_path):
+        path = tmp_path / "geometries.sgc"
+        multipolygon = {
+            "type": "MultiPolygon",
+            "coordinates": [
+                [[[0, 0], [1, 0], [1, 1], [0, 0]]],
+                [
+                    [[2, 2], [3, 2], [3, 3], [2, 2]],
+                    [[2.1, 2.1], [2.2, 2.1], [2.1, 2.1]],
+                ],
+            ],
+        }
+        with ColumnarWriter(path, metadata={"crs": "epsg:4326"}) as writer:
+            writer.write(multipolygon)
+            writer.write(None)
+            writer.write(
+                Geometry.from_geojson({"type": "Point", "coordinates": [1, 2]})
+            )
+            writer.write(
+                {
+                    "type": "Feature",
+                    "geometry": None,
+                    "properties": {"uso": "PS", "tags": [1, 2], "area": 1},
+                }
+            )
+            writer.write(
+                {"type": "Feature", "geometry": None, "properties": {"area": 2.5}}
+            )
+        with ColumnarReader(path) as reader:
+            assert reader.metadata == {"crs": "epsg:4326"}
+            assert reader.geometry(0) == {**multipolygon, "CRS": "epsg:4326"}
+            assert reader.geometry(1) is None
+            assert reader.geometry(2).to_geojson()["coordinates"] == [1.0, 2.0]
+            assert reader.properties(3) == {"uso": "PS", "tags": [1, 2], "area": 1}
+            assert reader.properties(4) == {"area": 2.5}
+
+    def test_property_names_of_buffers(self, tmp_path):
+        path = tmp_path / "colliding.sgc"
+        feature = TILE["features"][0]
+        properties = {
+            "coords": 120.0,
+            "types": "a",
+            "ring_offsets": [1, 2],
+            "a": 1,
+            "pv:a": "b",
+            "po:a": None,
+        }
+        features = [{**feature, "properties": properties}, feature]
+        write_features(path, features)
+        with ColumnarReader(path) as reader:
+            assert list(reader) == features
+
+    def test_numeric_columns(self, tmp_path):
+        path = tmp_path / "numbers.sgc"
+        values = [
+            {"mixed": 1, "big": 2**70, "float": 1.0},
+            {"mixed": 2.5, "big": 1, "float": 2.5},
+        ]
+        features = [
+            {"type": "Feature", "geometry": None, "properties": v} for v in values
+        ]
+        write_features(path, features)
+        with ColumnarReader(path) as reader:
+            assert [reader.properties(i) for i in range(2)] == values
+            assert type(reader.properties(0)["mixed"]) is int
+            assert type(reader.properties(1)["mixed"]) is float
+            assert type(reader.properties(0)["float"]) is float
+
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / "tile.geojson"
+        path.write_text(json.dumps(TILE))
+        with pytest.raises(ValueError):
+            ColumnarReader(path)
+
+
+if __name__ == "__main__":
+    pytest.main()
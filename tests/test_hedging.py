@@ -0,0 +1,165 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from sigpac_tools import metrics, transport
+from sigpac_tools.hedging import DEFAULT_MAX_WORKERS, RequestHedger
+from sigpac_tools.metrics import PrometheusHook
+from sigpac_tools.transport import (
+    fetch,
+    set_concurrency,
+    set_hedging,
+    set_http_client,
+)
+
+
+@pytest.fixture
+def prometheus():
+    hook = metrics.add_hook(PrometheusHook())
+    yield hook
+    metrics.remove_hook(hook)
+
+
+@pytest.fixture
+def hedger():
+    hedger = RequestHedger(percentile=0.9, budget=0.5, min_delay=0.01, min_samples=5)
+    yield hedger
+    hedger.close()
+
+
+def warm_up(hedger: RequestHedger, kind: str = "tile") -> None:
+    for _ in range(hedger.min_samples):
+        hedger.run(lambda: time.sleep(0.001), kind)
+
+
+def slow_first(result_slow, result_fast, seconds: float = 1.0):
+    """Returns a request whose first run takes `seconds` and whose following runs answer at once"""
+    calls, lock = [], threading.Lock()
+
+    def request():
+        with lock:
+            calls.append(None)
+            first = len(calls) == 1
+        if first:
+            time.sleep(seconds)
+            return result_slow
+        return result_fast
+
+    return request, calls
+
+
+class TestRequestHedger:
+    def test_no_hedging_while_warming_up(self, hedger):
+        assert hedger.delay("tile") is None
+        warm_up(hedger)
+        assert hedger.min_delay <= hedger.delay("tile") < 0.5
+        assert hedger.delay("metadata") is None
+
+    def test_hedge_wins(self, hedger, prometheus):
+        warm_up(hedger)
+        request, calls = slow_first("slow", "fast")
+        start = time.perf_counter()
+        assert hedger.run(request, "tile") == "fast"
+        assert time.perf_counter() - start < 0.5
+        assert len(calls) == 2
+        assert prometheus.counter("hedge.sent", kind="tile") == 1
+        assert prometheus.counter("hedge.won", kind="tile") == 1
+
+    def test_budget(self, prometheus):
+        hedger = RequestHedger(budget=0, min_samples=5)
+        try:
+            warm_up(hedger)
+            request, calls = slow_first("slow", "fast", seconds=0.1)
+            assert hedger.run(request, "tile") == "slow"
+            assert len(calls) == 1
+            assert prometheus.counter("hedge.skipped", kind="tile") == 1
+        finally:
+            hedger.close()
+
+    def test_failed_run_falls_back(self, hedger):
+        warm_up(hedger)
+        calls = []
+
+        def request():
+            calls.append(None)
+            if len(calls) == 1:
+                time.sleep(0.1)
+                raise ConnectionError("reset")
+            time.sleep(0.2)
+            return "second"
+
+        assert hedger.run(request, "tile") == "second"
+
+        def failing():
+            time.sleep(0.05)
+            raise ConnectionError("reset")
+
+        with pytest.raises(ConnectionError):
+            hedger.run(failing, "tile")
+
+    def test_queueing_does_not_count(self, prometheus):
+        hedger = RequestHedger(budget=1, min_samples=5, max_workers=1)
+        try:
+            for _ in range(hedger.min_samples):
+                hedger.run(lambda: time.sleep(0.05), "tile")
+            # With a single thread, the last request waits 0.04 s for it and answers 0.06 s after it was sent
+            threads = [
+                threading.Thread(
+                    target=hedger.run, args=(lambda: time.sleep(0.02), "tile")
+                )
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert prometheus.counter("hedge.sent", kind="tile") == 0
+            assert sorted(hedger._samples["tile"])[2] < 0.04
+        finally:
+            hedger.close()
+
+    def test_resized_by_concurrency_limit(self):
+        set_hedging(0.9)
+        try:
+            set_concurrency(4)
+            assert transport._hedger.max_workers == 4
+            set_concurrency(None)
+            assert transport._hedger.max_workers == DEFAULT_MAX_WORKERS
+            set_concurrency(2)
+            set_hedging(0.9, max_workers=8)
+            assert transport._hedger.max_workers == 2
+        finally:
+            set_concurrency(None)
+            set_hedging(None)
+
+    def test_invalid_options(self):
+        with pytest.raises(ValueError):
+            RequestHedger(percentile=1.5)
+        with pytest.raises(ValueError):
+            RequestHedger(budget=-1)
+
+
+class TestTransportHedging:
+    def test_fetch(self):
+        fast = Mock(status_code=200, content=b"fast", headers={})
+        slow = Mock(status_code=200, content=b"slow", headers={})
+        request, _ = slow_first(slow, fast)
+        client = Mock(side_effect=lambda url, headers=None: request())
+        set_http_client(lambda url, headers=None: fast)
+        set_hedging(0.9, budget=0.5, min_samples=5)
+        try:
+            for _ in range(5):
+                fetch("http://localhost/vectorsdg/vector/tile")
+            set_http_client(client)
+            status, content, _ = fetch("http://localhost/vectorsdg/vector/tile")
+            assert (status, content) == (200, b"fast")
+            assert client.call_count == 2
+        finally:
+            set_hedging(None)
+            set_http_client("requests")
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = {"pyproj", "requests", "structlog"}
+
+
+def import_times(statement: str) -> dict:
+    """Runs the statement with `python -X importtime` and returns the cumulative import time (us) of each top level module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime:
+    @pytest.mark.parametrize(
+        "statement",
+        [
+            "import sigpac_tools.find",
+            "import sigpac_tools.locate",
+            "import sigpac_tools.search",
+            "import sigpac_tools.anotate",
+            "from sigpac_tools.__main__ import get_parser",
+        ],
+    )
+    def test_heavy_dependencies_not_imported(self, statement):
+        times = import_times(statement)
+        assert HEAVY_MODULES.isdisjoint(times)
+
+    def test_registry_validation_does_not_import_http_or_projection(self):
+        times = import_times(
+            "from sigpac_tools.utils import read_cadastral_registry; read_cadastral_registry('29008A008005720000EQ')"
+        )
+        assert "pyproj" not in times
+        assert "requests" not in times
+
+    def test_startup_is_a_fraction_of_eager_imports(self):
+        lazy = import_times("import sigpac_tools.find")["sigpac_tools.find"]
+        eager = sum(
+            import_times(f"import {module}")[module] for module in HEAVY_MODULES
+        )
+        assert lazy < eager / 4
+
+
+if __name__ == "__main__":
+    pytest.main()
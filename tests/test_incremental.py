@@ -0,0 +1,108 @@
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from sigpac_tools.changes import field_changes, fingerprint
+from sigpac_tools.incremental import MetadataStore, record_from_identity, record_key
+from sigpac_tools.mock_server import MockSigpacServer
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+
+PARCEL = {"province": 14, "municipality": 48, "polygon": 5, "parcel": 1}
+
+METADATA = {
+    "id": [14, 48, 0, 0, 5, 1],
+    "parcelaInfo": {"parcela": 1, "dn_surface": 5978.83},
+    "vigencia": "2024",
+}
+
+
+def changed_metadata():
+    return {**METADATA, "parcelaInfo": {"parcela": 1, "dn_surface": 6000.0}}
+
+
+class TestFingerprint:
+    def test_key_order_does_not_matter(self):
+        assert fingerprint({"a": 1, "b": [1, 2]}) == fingerprint({"b": [1, 2], "a": 1})
+        assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+
+    def test_field_changes(self):
+        assert field_changes(METADATA, changed_metadata()) == {
+            "parcelaInfo.dn_surface": [5978.83, 6000.0]
+        }
+        assert field_changes({"a": 1}, {"b": 1}) == {"a": [1, None], "b": [None, 1]}
+
+
+class TestRecords:
+    def test_record_key(self):
+        assert record_key("parcela", PARCEL) == "parcela/14,48,0,0,5,1"
+        assert (
+            record_key("recinto", {**PARCEL, "enclosure": 2})
+            == "recinto/14,48,0,0,5,1,2"
+        )
+
+    def test_record_from_identity(self):
+        identity = {"provincia": 14, "municipio": 48, "poligono": 5, "parcela": 1}
+        assert record_key("parcela", record_from_identity(identity)) == record_key(
+            "parcela", PARCEL
+        )
+
+
+class TestMetadataStore:
+    def test_only_stale_records_are_fetched(self, tmp_path):
+        fetch = Mock(return_value=METADATA)
+        store = MetadataStore(tmp_path / "store.json")
+        changelog = store.update("parcela", [PARCEL], fetch=fetch)
+        assert [entry["status"] for entry in changelog] == ["added"]
+
+        store = MetadataStore(tmp_path / "store.json")
+        assert store.update("parcela", [PARCEL], fetch=fetch) == []
+        assert fetch.call_count == 1
+        assert store.get("parcela", PARCEL) == METADATA
+
+    def test_freshness_window(self, tmp_path):
+        fetch = Mock(side_effect=[METADATA, changed_metadata()])
+        store = MetadataStore(tmp_path / "store.json", max_age=0)
+        store.update("parcela", [PARCEL], fetch=fetch)
+        store.entries[record_key("parcela", PARCEL)]["fetched_at"] -= 1
+        changelog = store.update("parcela", [PARCEL], fetch=fetch)
+        assert changelog[0]["status"] == "changed"
+        assert changelog[0]["fields"] == {"parcelaInfo.dn_surface": [5978.83, 6000.0]}
+
+    def test_unchanged_refetch_is_not_logged(self, tmp_path):
+        fetch = Mock(return_value=METADATA)
+        store = MetadataStore(tmp_path / "store.json", max_age=None)
+        store.update("parcela", [PARCEL], fetch=fetch)
+        identity = {"provincia": 14, "municipio": 48, "poligono": 5, "parcela": 1}
+        assert store.update("parcela", [PARCEL], [identity], fetch=fetch) == []
+        assert fetch.call_count == 2
+
+    def test_campaign(self, tmp_path):
+        fetch = Mock(return_value=METADATA)
+        store = MetadataStore(tmp_path / "store.json", max_age=None)
+        store.update("parcela", [PARCEL], fetch=fetch)
+        store.update("parcela", [PARCEL], campaign="2024", fetch=fetch)
+        assert fetch.call_count == 1
+        store.update("parcela", [PARCEL], campaign="2025", fetch=fetch)
+        assert fetch.call_count == 2
+
+    def test_failures_keep_stored_metadata(self, tmp_path):
+        store = MetadataStore(tmp_path / "store.json", max_age=0)
+        store.update("parcela", [PARCEL], fetch=Mock(return_value=METADATA))
+        store.entries[record_key("parcela", PARCEL)]["fetched_at"] -= 1
+        fetch = Mock(side_effect=ValueError("does not exist"))
+        assert store.update("parcela", [PARCEL], fetch=fetch) == []
+        assert store.get("parcela", PARCEL) == METADATA
+
+    def test_get_metadata(self, tmp_path):
+        records = [{**PARCEL, "parcel": parcel} for parcel in (1, 2, 3)]
+        store = MetadataStore(tmp_path / "store.json")
+        with MockSigpacServer(FIXTURES_DIR) as server:
+            assert len(store.update("parcela", records)) == 3
+            assert store.update("parcela", records) == []
+            assert server.stats["requests"] == 3
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,75 @@
+import subprocess
+import sys
+from unittest.mock import Mock
+
+import pytest
+
+from sigpac_tools import _logging, configure_logging
+from sigpac_tools._logging import LEVELS, get_logger
+
+
+@pytest.fixture(autouse=True)
+def restore_level():
+    level = _logging._level
+    yield
+    _logging._level = level
+
+
+class TestLazyLogger:
+    def test_events_below_level_are_dropped(self):
+        configure_logging("WARNING")
+        logger = get_logger()
+        logger._logger = Mock()
+
+        logger.info("Reference is valid", reference="29008A008005720000EQ")
+        logger.warning("Reference not found", reference=1)
+
+        logger._logger.info.assert_not_called()
+        logger._logger.warning.assert_called_once_with(
+            "Reference not found", reference=1
+        )
+
+    def test_is_enabled_for(self):
+        configure_logging("INFO")
+        logger = get_logger()
+        assert logger.is_enabled_for(LEVELS["INFO"])
+        assert not logger.is_enabled_for(LEVELS["DEBUG"])
+
+    def test_invalid_level(self):
+        with pytest.raises(KeyError):
+            configure_logging("VERBOSE")
+
+    def test_off_does_not_import_structlog(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys; import sigpac_tools;"
+                "sigpac_tools.configure_logging('OFF');"
+                "from sigpac_tools.utils import validate_cadastral_registry;"
+                "validate_cadastral_registry('29008A008005720000EQ');"
+                "print('structlog' in sys.modules)",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip() == "False"
+
+    def test_environment_variable(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "from sigpac_tools import _logging; print(_logging._level)",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={"SIGPAC_LOG_LEVEL": "error"},
+        )
+        assert result.stdout.strip() == str(LEVELS["ERROR"])
+
+
+if __name__ == "__main__":
+    pytest.main()
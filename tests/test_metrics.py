@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools import metrics
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.metrics import CallbackHook, PrometheusHook
+from sigpac_tools.mock_server import MockSigpacServer
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+
+
+@pytest.fixture
+def prometheus():
+    hook = metrics.add_hook(PrometheusHook())
+    yield hook
+    metrics.remove_hook(hook)
+
+
+class TestSpans:
+    def test_disabled_span_is_shared_noop(self):
+        assert not metrics.enabled()
+        first = metrics.span("http.fetch", url="a")
+        assert first is metrics.span("json.decode")
+        with first as span:
+            span.set("bytes", 10)
+
+    def test_callback_hook(self):
+        spans, counters = [], []
+        hook = metrics.add_hook(
+            CallbackHook(
+                on_span=lambda *args: spans.append(args),
+                on_counter=lambda *args: counters.append(args),
+            )
+        )
+        try:
+            with metrics.span("tile.lookup", layer="parcela") as span:
+                span.set("tile", "1.2")
+            metrics.increment("cache.hit", cache="tile")
+        finally:
+            metrics.remove_hook(hook)
+
+        name, start, duration, attributes = spans[0]
+        assert name == "tile.lookup"
+        assert duration >= 0
+        assert attributes == {"layer": "parcela", "tile": "1.2"}
+        assert counters == [("cache.hit", 1, {"cache": "tile"})]
+
+    def test_span_records_errors(self, prometheus):
+        spans = []
+        hook = metrics.add_hook(CallbackHook(on_span=lambda *args: spans.append(args)))
+        try:
+            with pytest.raises(ValueError):
+                with metrics.span("find"):
+                    raise ValueError
+        finally:
+            metrics.remove_hook(hook)
+        assert spans[0][3] == {"error": "ValueError"}
+
+    def test_timed(self, prometheus):
+        @metrics.timed("work")
+        def work(value):
+            return value * 2
+
+        assert work(2) == 4
+        assert (
+            'sigpac_span_duration_seconds_count{span="work"} 1' in prometheus.render()
+        )
+
+
+class TestPrometheusHook:
+    def test_render(self, prometheus):
+        with metrics.span("http.fetch"):
+            pass
+        metrics.increment("http.bytes", 100)
+        metrics.increment("cache.hit", cache="tile")
+        metrics.increment("cache.hit", cache="tile")
+        metrics.increment("cache.miss", cache="tile")
+
+        text = prometheus.render()
+        assert "# TYPE sigpac_span_duration_seconds histogram" in text
+        assert (
+            'sigpac_span_duration_seconds_bucket{le="+Inf",span="http.fetch"} 1' in text
+        )
+        assert "sigpac_http_bytes_total 100" in text
+        assert 'sigpac_cache_hit_total{cache="tile"} 2' in text
+        assert f"sigpac_cache_hit_ratio {2 / 3}" in text
+
+    def test_end_to_end(self, prometheus):
+        with MockSigpacServer(FIXTURES_DIR):
+            geometry_from_coords("recinto", 37.384, -4.98, 1)
+
+        text = prometheus.render()
+        for span in (
+            "locate",
+            "tile.lookup",
+            "http.fetch",
+            "json.decode",
+            "feature.scan",
+            "reprojection",
+        ):
+            assert f'span="{span}"' in text
+        assert 'sigpac_http_requests_total{status="200"} 1' in text
+        assert prometheus.counter("http.bytes") > 0
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools import _globals
+from sigpac_tools.anotate import get_metadata
+from sigpac_tools.find import find_from_cadastral_registry
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.search import search
+from sigpac_tools.transport import get_json
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+REGISTRIES = json.loads(
+    (Path(__file__).parent / "fixtures" / "registries.json").read_text()
+)
+
+
+@pytest.fixture(scope="module")
+def server():
+    with MockSigpacServer(FIXTURES_DIR) as server:
+        yield server
+
+
+class TestMockSigpacServer:
+    def test_points_base_url_to_server(self):
+        previous = _globals.BASE_URL
+        with MockSigpacServer(FIXTURES_DIR) as server:
+            assert _globals.BASE_URL == server.url
+        assert _globals.BASE_URL == previous
+
+    def test_search(self, server):
+        result = search({"community": 1})
+        assert len(result["features"]) == 8
+
+    def test_get_metadata(self, server):
+        data = {"province": 14, "municipality": 48, "polygon": 5, "parcel": 1}
+        metadata = get_metadata("parcela", data)
+        assert metadata["parcelaInfo"]["referencia_cat"] == REGISTRIES[0]
+
+    def test_get_metadata_not_found(self, server):
+        data = {"province": 14, "municipality": 48, "polygon": 5, "parcel": 999}
+        with pytest.raises(ValueError, match="does not exist"):
+            get_metadata("parcela", data)
+
+    def test_geometry_from_coords(self, server):
+        geometry = geometry_from_coords("parcela", 37.384, -4.98, 1)
+        assert geometry["type"] == "Polygon"
+        assert geometry["CRS"] == "epsg:4326"
+
+    def test_ignores_client_disconnects(self, server, capfd):
+        # The streamed lookups close the connection once the feature is found
+        for reference in (1, 2, 3):
+            assert geometry_from_coords("recinto", 37.384, -4.98, reference)
+        assert "Error" not in capfd.readouterr().err
+
+    @pytest.mark.parametrize("registry", REGISTRIES[:3])
+    def test_find_from_cadastral_registry(self, server, registry):
+        geometry, metadata = find_from_cadastral_registry(registry)
+        assert geometry is not None
+        assert metadata["parcelaInfo"]["referencia_cat"] == registry
+
+    def test_path_traversal(self, server):
+        assert server.resolve("/../../test_mock_server.py") is None
+
+    def test_errors(self):
+        with MockSigpacServer(FIXTURES_DIR, error_rate=1.0) as server:
+            assert get_json(
+                f"{server.url}/fega/serviciosvisorsigpac/query/provincias/1"
+            ) == {"error": "Service Unavailable"}
+            assert server.stats["errors"] == 1
+
+    def test_throttling(self):
+        with MockSigpacServer(FIXTURES_DIR, max_requests_per_second=2) as server:
+            for _ in range(5):
+                get_json(f"{server.url}/fega/serviciosvisorsigpac/query/provincias/1")
+            assert server.stats["throttled"] >= 2
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,175 @@
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from sigpac_tools.models import (
+    EnclosureProperties,
+    Feature,
+    FeatureCollection,
+    Geometry,
+    ParcelProperties,
+    geojson_rings,
+    properties_from_dict,
+)
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.search import search
+
+TILES_DIR = Path(__file__).parent / "fixtures" / "sigpac" / "vectorsdg" / "vector"
+ENCLOSURES_TILE = TILES_DIR / "recinto@3857" / "15.15930.20057.geojson"
+
+
+class TestProperties:
+    def test_enclosure_round_trip(self):
+        properties = {
+            "provincia": 14,
+            "municipio": 48,
+            "poligono": 5,
+            "parcela": 12,
+            "recinto": 2,
+            "uso_sigpac": "TA",
+            "incidencias": None,
+            "dn_oid": 123,
+        }
+        record = properties_from_dict(properties)
+        assert isinstance(record, EnclosureProperties)
+        assert record.to_dict() == properties
+        assert record["recinto"] == 2
+        assert record.get("dn_oid") == 123
+        assert record.get("agregado", 0) == 0
+        assert record.incidencias is None
+
+    def test_parcel_properties(self):
+        record = properties_from_dict({"provincia": 14, "parcela": 1})
+        assert type(record) is ParcelProperties
+        with pytest.raises(KeyError):
+            record["recinto"]
+
+    def test_other_properties_unchanged(self):
+        properties = {"x1": -4.9, "x2": -4.8}
+        assert properties_from_dict(properties) is properties
+
+    def test_slots(self):
+        record = EnclosureProperties(recinto=1)
+        assert not hasattr(record, "__dict__")
+
+
+class TestGeometry:
+    @pytest.mark.parametrize(
+        "geometry",
+        [
+            {"type": "Point", "coordinates": [1.0, 2.0]},
+            {"type": "LineString", "coordinates": [[1.0, 2.0], [3.0, 4.0]]},
+            {
+                "type": "Polygon",
+                "coordinates": [
+                    [[0.0, 0.0], [4.0, 0.0], [4.0, 4.0], [0.0, 0.0]],
+                    [[1.0, 1.0], [2.0, 1.0], [2.0, 2.0], [1.0, 1.0]],
+                ],
+                "CRS": "epsg:4326",
+            },
+            {
+                "type": "MultiPolygon",
+                "coordinates": [
+                    [[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 0.0]]],
+                    [
+                        [[5.0, 5.0], [6.0, 5.0], [6.0, 6.0], [5.0, 5.0]],
+                        [[5.2, 5.2], [5.4, 5.2], [5.4, 5.4], [5.2, 5.2]],
+                    ],
+                ],
+            },
+        ],
+    )
+    def test_round_trip(self, geometry):
+        compact = Geometry.from_geojson(geometry)
+        assert compact.to_geojson() == geometry
+
+    def test_flat_buffers(self):
+        compact = Geometry.from_geojson(
+            {"type": "Polygon", "coordinates": [[[0, 0], [4, 0], [4, 4], [0, 0]]]}
+        )
+        assert compact.coords.typecode == "d"
+        assert list(compact.ring_offsets) == [0, 4]
+        assert len(compact.coords) == 8
+
+    def test_unsupported_type(self):
+        with pytest.raises(KeyError):
+            Geometry.from_geojson({"type": "Curve", "coordinates": []})
+
+    def test_geojson_rings(self):
+        ring = [[0, 0], [1, 0], [1, 1], [0, 0]]
+        assert geojson_rings({"type": "Point", "coordinates": [0, 0]}) == []
+        assert geojson_rings({"type": "LineString", "coordinates": ring}) == [ring]
+        assert geojson_rings({"type": "Polygon", "coordinates": [ring, ring]}) == [
+            ring,
+            ring,
+        ]
+        multipolygon = {"type": "MultiPolygon", "coordinates": [[ring], [ring]]}
+        assert geojson_rings(multipolygon) == [ring, ring]
+
+
+class TestFeatureCollection:
+    def test_fixture_round_trip(self):
+        collection = json.loads(ENCLOSURES_TILE.read_bytes())
+        compact = FeatureCollection.from_geojson(collection)
+        assert len(compact) == len(collection["features"])
+        assert isinstance(compact.features[0], Feature)
+        assert compact.to_geojson() == collection
+
+    def test_compact_is_smaller(self):
+        collection = json.loads(ENCLOSURES_TILE.read_bytes())
+        compact = FeatureCollection.from_geojson(collection)
+
+        def deep_size(obj, seen):
+            if id(obj) in seen:
+                return 0
+            seen.add(id(obj))
+            size = sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                size += sum(deep_size(v, seen) for v in obj.values())
+            elif isinstance(obj, (list, tuple)):
+                size += sum(deep_size(v, seen) for v in obj)
+            elif hasattr(obj, "__slots__"):
+                for cls in type(obj).__mro__:
+                    for slot in getattr(cls, "__slots__", ()):
+                        size += deep_size(getattr(obj, slot, None), seen)
+            return size
+
+        assert deep_size(compact, set()) < deep_size(collection, set()) / 2
+
+
+class TestCompactResults:
+    @patch("sigpac_tools.search.get_json")
+    def test_search_compact(self, mock_get):
+        mock_get.return_value = {"type": "FeatureCollection", "features": []}
+        result = search({"community": 1}, compact=True)
+        assert isinstance(result, FeatureCollection)
+        assert result.to_geojson() == mock_get.return_value
+
+    @patch("sigpac_tools.locate.get_json", return_value=None)
+    @patch("sigpac_tools.search.get_json", return_value=None)
+    def test_empty_responses(self, mock_search, mock_locate):
+        assert search({"community": 1}, compact=True) is None
+        assert search({"province": 14, "municipality": 48}, compact=True) is None
+        assert (
+            geometry_from_coords("recinto", 37.384, -4.98, None, compact=True) is None
+        )
+
+    @patch("sigpac_tools.locate.iter_json_items")
+    @patch("sigpac_tools.locate.get_json")
+    def test_geometry_from_coords_compact(self, mock_get, mock_iter):
+        mock_get.return_value = json.loads(ENCLOSURES_TILE.read_bytes())
+        collection = geometry_from_coords("recinto", 37.384, -4.98, None, compact=True)
+        assert isinstance(collection, FeatureCollection)
+
+        features = json.loads(ENCLOSURES_TILE.read_bytes())["features"]
+        mock_iter.return_value = (feature for feature in features)
+        geometry = geometry_from_coords("recinto", 37.384, -4.98, 1, compact=True)
+        assert isinstance(geometry, Geometry)
+        assert geometry.extra == {"CRS": "epsg:4326"}
+
+
+if __name__ == "__main__":
+    pytest.main()
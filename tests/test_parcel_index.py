@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools import parcel_index
+from sigpac_tools.find import find_from_cadastral_registry
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.parcel_index import ParcelIndex
+from sigpac_tools.search import search
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+REGISTRIES = json.loads(
+    (Path(__file__).parent / "fixtures" / "registries.json").read_text()
+)
+POLYGON = {"province": 14, "municipality": 48, "polygon": 5}
+
+
+class TestParcelIndex:
+    def test_observes_searches(self):
+        with MockSigpacServer(FIXTURES_DIR), ParcelIndex() as index:
+            enclosures = search({**POLYGON, "parcel": 3})
+            assert len(index) == 1
+            x1, y1, x2, y2 = index.get(14, 48, 5, 3)
+            search(POLYGON)
+        assert len(index) == 144
+        assert not parcel_index.active()
+
+        for feature in enclosures["features"]:
+            assert (
+                x1 <= feature["properties"]["x1"] <= feature["properties"]["x2"] <= x2
+            )
+            assert (
+                y1 <= feature["properties"]["y1"] <= feature["properties"]["y2"] <= y2
+            )
+        assert index.get(14, 48, 5, 999) is None
+
+    def test_find_skips_search(self):
+        with MockSigpacServer(FIXTURES_DIR) as server:
+            expected = [find_from_cadastral_registry(r) for r in REGISTRIES[:3]]
+            assert server.stats["requests"] == 3 * 3
+
+        with MockSigpacServer(FIXTURES_DIR) as server, ParcelIndex():
+            results = [find_from_cadastral_registry(r) for r in REGISTRIES[:3]]
+            # The first lookup searches the parcels of the polygon, the others go straight to the tile and the metadata
+            assert server.stats["requests"] == 3 + 2 * 2
+        assert results == expected
+
+    def test_persistence(self, tmp_path):
+        path = tmp_path / "parcels.json"
+        with MockSigpacServer(FIXTURES_DIR), ParcelIndex(path):
+            search(POLYGON)
+        index = ParcelIndex(path)
+        assert len(index) == 144
+
+        with MockSigpacServer(FIXTURES_DIR) as server, index:
+            find_from_cadastral_registry(REGISTRIES[0])
+            assert server.stats["requests"] == 2
+
+    def test_crawl(self):
+        index = ParcelIndex()
+        with MockSigpacServer(FIXTURES_DIR):
+            assert index.crawl({"province": 14, "municipality": 48}) == 144
+        assert index.get(14, 48, 5, 1) is not None
+
+
+if __name__ == "__main__":
+    pytest.main()
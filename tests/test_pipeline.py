@@ -0,0 +1,111 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.models import Geometry
+from sigpac_tools.pipeline import geometries_from_coords
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+
+LAT, LON = 37.384, -4.98
+
+
+@pytest.fixture(scope="module")
+def server():
+    with MockSigpacServer(FIXTURES_DIR) as server:
+        yield server
+
+
+def shared_blocks() -> set[str]:
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+class TestGeometriesFromCoords:
+    def test_matches_geometry_from_coords(self, server):
+        references = [1, 7, 42, 144]
+        points = [(LAT, LON, reference) for reference in references]
+        results = geometries_from_coords("parcela", points, processes=2)
+        expected = [
+            geometry_from_coords("parcela", LAT, LON, reference)
+            for reference in references
+        ]
+        assert results == expected
+
+    def test_enclosures(self, server):
+        results = geometries_from_coords("recinto", [(LAT, LON, 3)], processes=1)
+        assert results == [geometry_from_coords("recinto", LAT, LON, 3)]
+
+    def test_compact(self, server):
+        results = geometries_from_coords(
+            "parcela", [(LAT, LON, 5)], processes=1, compact=True
+        )
+        assert isinstance(results[0], Geometry)
+        assert results[0].extra["CRS"] == "epsg:4326"
+        assert results[0] == geometry_from_coords("parcela", LAT, LON, 5)
+
+    def test_not_found(self, server):
+        points = [(LAT, LON, 2), (LAT, LON, 9999), (40.0, -3.0, 2)]
+        results = geometries_from_coords("parcela", points, processes=1)
+        assert results[0] is not None
+        assert results[1] is None
+        assert results[2] is None
+
+    def test_backpressure(self, server):
+        points = [(LAT, LON, reference) for reference in range(1, 40)]
+        points += [(40.0 + i / 100, -3.0, 1) for i in range(10)]
+        results = geometries_from_coords(
+            "parcela", points, processes=2, io_workers=4, max_pending=1
+        )
+        assert all(result is not None for result in results[:39])
+        assert all(result is None for result in results[39:])
+
+    def test_memory_budget(self, server, tmp_path, monkeypatch):
+        monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+        points = [(LAT, LON, reference) for reference in range(1, 40)]
+        expected = geometries_from_coords("parcela", points, processes=2)
+        results = geometries_from_coords(
+            "parcela", points, processes=2, memory_budget=4096
+        )
+        assert not isinstance(results, list)
+        assert list(tmp_path.iterdir())
+        assert list(results) == expected
+        assert not list(tmp_path.iterdir())
+
+    def test_releases_shared_memory(self, server):
+        before = shared_blocks()
+        geometries_from_coords(
+            "parcela", [(LAT, LON, reference) for reference in range(1, 20)], 2
+        )
+        assert shared_blocks() == before
+
+    def test_releases_shared_memory_on_error(self, tmp_path):
+        shutil.copytree(FIXTURES_DIR, tmp_path, dirs_exist_ok=True)
+        broken = (
+            tmp_path
+            / "vectorsdg"
+            / "vector"
+            / "parcela@3857"
+            / "15.15931.20057.geojson"
+        )
+        broken.write_text("<html>")
+        points = [(LAT, LON, reference) for reference in range(1, 20)]
+        before = shared_blocks()
+        with MockSigpacServer(tmp_path), pytest.raises(ValueError):
+            geometries_from_coords("parcela", [(LAT, -4.97, 1), *points], 2)
+        assert shared_blocks() == before
+
+    def test_invalid_layer(self):
+        with pytest.raises(KeyError):
+            geometries_from_coords("invalid", [(LAT, LON, 1)])
+
+    def test_missing_reference(self):
+        with pytest.raises(ValueError):
+            geometries_from_coords("parcela", [(LAT, LON, None)])
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,71 @@
+import json
+import pstats
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools import __main__, metrics
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.profiling import PHASES, Profiler
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+
+LAT, LON = 37.384, -4.98
+
+
+class TestProfiler:
+    def test_report(self, tmp_path):
+        path = tmp_path / "profile.json"
+        with MockSigpacServer(FIXTURES_DIR), Profiler(path, top=5) as profiler:
+            geometry_from_coords("parcela", LAT, LON, 5, tolerance=1)
+
+        report = json.loads(path.read_text())
+        assert report == json.loads(json.dumps(profiler.report))
+        assert set(report["phases"]) == set(PHASES)
+        for phase in ("network", "decode", "reprojection", "matching"):
+            assert report["phases"][phase]["count"] >= 1
+        assert report["spans"]["locate"]["count"] == 1
+        assert report["counters"]["http.requests"] == 1
+        assert report["memory"]["peak_bytes"] > 0
+        assert len(report["memory"]["top"]) == 5
+        assert len(report["cpu"]["top"]) == 5
+        assert pstats.Stats(report["cpu"]["profile"]).total_calls > 0
+
+        assert profiler not in metrics._hooks
+        assert not tracemalloc.is_tracing()
+
+    def test_without_cpu_and_memory(self):
+        with Profiler(cpu=False, memory=False) as profiler:
+            with metrics.span("json.decode"):
+                pass
+        assert "cpu" not in profiler.report
+        assert "memory" not in profiler.report
+        assert profiler.report["phases"]["decode"]["count"] == 1
+
+    def test_error(self):
+        with pytest.raises(ValueError):
+            with Profiler(memory=False) as profiler:
+                raise ValueError("slow")
+        assert profiler.report["error"] == "ValueError('slow')"
+
+    def test_cli(self, tmp_path, monkeypatch):
+        path = tmp_path / "profile.json"
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            ["sigpac_tools", "--profile", str(path), "geometry", "--layer", "parcela"]
+            + ["--lat", str(LAT), "--lon", str(LON), "--reference", "5"],
+        )
+        with MockSigpacServer(FIXTURES_DIR):
+            geometry = __main__.main()
+        assert geometry["type"] == "Polygon"
+        report = json.loads(path.read_text())
+        assert report["argv"] == sys.argv
+        assert report["spans"]["locate"]["count"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
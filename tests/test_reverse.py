@@ -0,0 +1,101 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.reverse import TileIndex, references_from_coords
+from sigpac_tools.utils import lng_lat_to_web_mercator
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+
+TILE = json.loads(
+    (
+        FIXTURES_DIR
+        / "vectorsdg"
+        / "vector"
+        / "recinto@3857"
+        / "15.15930.20057.geojson"
+    ).read_text()
+)
+
+
+def contains(geometry: dict, x: float, y: float) -> bool:
+    inside = False
+    for ring in geometry["coordinates"]:
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+    return inside
+
+
+@pytest.fixture(scope="module")
+def server():
+    with MockSigpacServer(FIXTURES_DIR) as server:
+        yield server
+
+
+class TestTileIndex:
+    def test_matches_full_scan(self):
+        index = TileIndex(TILE["features"], cells=8)
+        rnd = random.Random(0)
+        for _ in range(2000):
+            x, y = rnd.uniform(-555300, -554000), rnd.uniform(4492000, 4493300)
+            found = index.locate(x, y)
+            expected = [
+                i
+                for i, f in enumerate(TILE["features"])
+                if contains(f["geometry"], x, y)
+            ]
+            assert (found is None) == (not expected)
+            if found is not None:
+                assert found in expected
+
+    def test_outside(self):
+        index = TileIndex(TILE["features"])
+        assert index.locate(0, 0) is None
+        assert TileIndex([]).locate(0, 0) is None
+
+
+class TestReferencesFromCoords:
+    def test_references(self, server):
+        results = references_from_coords([37.384, 37.384], [-4.98, -4.98])
+        assert results == [(14, 48, 5, 81, 2)] * 2
+
+    def test_matches_tile_features(self, server):
+        rnd = random.Random(1)
+        lats = [rnd.uniform(37.3789, 37.3876) for _ in range(500)]
+        lons = [rnd.uniform(-4.9878, -4.9768) for _ in range(500)]
+        results = references_from_coords(lats, lons, workers=2)
+        for lat, lon, result in zip(lats, lons, results):
+            x, y = lng_lat_to_web_mercator(lon, lat)
+            expected = [
+                tuple(
+                    f["properties"][k]
+                    for k in (
+                        "provincia",
+                        "municipio",
+                        "poligono",
+                        "parcela",
+                        "recinto",
+                    )
+                )
+                for f in TILE["features"]
+                if contains(f["geometry"], x, y)
+            ]
+            assert result in expected if expected else result is None
+
+    def test_missing_tile(self, server):
+        assert references_from_coords([40.4168], [-3.7038]) == [None]
+
+    def test_empty(self):
+        assert references_from_coords([], []) == []
+
+    def test_length_mismatch(self):
+        with pytest.raises(ValueError):
+            references_from_coords([37.384], [])
+
+
+if __name__ == "__main__":
+    pytest.main()
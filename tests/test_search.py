@@ -1,8 +1,12 @@
 import pytest
-from unittest.mock import patch, Mock
-from sigpac_tools.search import search
+from pathlib import Path
+from unittest.mock import patch
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.search import fan_out_search, search
 from sigpac_tools._globals import BASE_URL
 
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+
 # Mock data for responses
 provinces_response = {"type": "FeatureCollection", "features": []}
 municipalities_response = {"type": "FeatureCollection", "features": []}
@@ -12,11 +16,9 @@ parcel_response = {"type": "FeatureCollection", "features": [{"id": "parcel"}]}
 
 
 class TestSearch:
-    @patch("sigpac_tools.search.requests.get")
+    @patch("sigpac_tools.search.get_json")
     def test_search_provinces(self, mock_get):
-        mock_response = Mock()
-        mock_response.json.return_value = provinces_response
-        mock_get.return_value = mock_response
+        mock_get.return_value = provinces_response
 
         data = {"community": 1}
         search(data)
@@ -25,11 +27,9 @@ class TestSearch:
             f"{BASE_URL}/fega/serviciosvisorsigpac/query/provincias/1"
         )
 
-    @patch("sigpac_tools.search.requests.get")
+    @patch("sigpac_tools.search.get_json")
     def test_search_municipalities(self, mock_get):
-        mock_response = Mock()
-        mock_response.json.return_value = municipalities_response
-        mock_get.return_value = mock_response
+        mock_get.return_value = municipalities_response
 
         data = {"province": 1}
         search(data)
@@ -38,11 +38,9 @@ class TestSearch:
             f"{BASE_URL}/fega/serviciosvisorsigpac/query/municipios/1"
         )
 
-    @patch("sigpac_tools.search.requests.get")
+    @patch("sigpac_tools.search.get_json")
     def test_search_polygons(self, mock_get):
-        mock_response = Mock()
-        mock_response.json.return_value = polygons_response
-        mock_get.return_value = mock_response
+        mock_get.return_value = polygons_response
 
         data = {"province": 1, "municipality": 1}
         search(data)
@@ -51,11 +49,9 @@ class TestSearch:
             f"{BASE_URL}/fega/serviciosvisorsigpac/query/poligonos/1/1/0/0"
         )
 
-    @patch("sigpac_tools.search.requests.get")
+    @patch("sigpac_tools.search.get_json")
     def test_search_parcels(self, mock_get):
-        mock_response = Mock()
-        mock_response.json.return_value = parcels_response
-        mock_get.return_value = mock_response
+        mock_get.return_value = parcels_response
 
         data = {"province": 1, "municipality": 1, "polygon": 1}
         search(data)
@@ -64,11 +60,9 @@ class TestSearch:
             f"{BASE_URL}/fega/serviciosvisorsigpac/query/parcelas/1/1/0/0/1"
         )
 
-    @patch("sigpac_tools.search.requests.get")
+    @patch("sigpac_tools.search.get_json")
     def test_search_specific_parcel(self, mock_get):
-        mock_response = Mock()
-        mock_response.json.return_value = parcel_response
-        mock_get.return_value = mock_response
+        mock_get.return_value = parcel_response
 
         data = {"province": 1, "municipality": 1, "polygon": 1, "parcel": 1}
         search(data)
@@ -94,5 +88,43 @@ class TestSearch:
             search(data)
 
 
+class TestFanOutSearch:
+    def test_community(self):
+        with MockSigpacServer(FIXTURES_DIR) as server:
+            results = list(fan_out_search({"community": 1}, depth="parcel"))
+        # The 8 provinces come from PROVINCES_BY_COMMUNITY, only 14/48/5 has fixtures under them
+        assert server.stats["requests"] == 8 + 5 + 8
+        assert [location for location, _ in results] == [
+            {"community": 1, "province": 14},
+            {"community": 1, "province": 14, "municipality": 48},
+            {"community": 1, "province": 14, "municipality": 48, "polygon": 5},
+        ]
+        assert len(results[-1][1]["features"]) == 144
+
+    def test_streams_enclosures(self):
+        location = {"province": 14, "municipality": 48, "polygon": 5}
+        with MockSigpacServer(FIXTURES_DIR):
+            results = list(fan_out_search(location, depth="enclosure", workers=4))
+        parcels = sorted(
+            location["parcel"] for location, _ in results if "parcel" in location
+        )
+        assert len(results) == 13
+        assert parcels == list(range(1, 13))
+
+    def test_provinces_of_community(self):
+        with MockSigpacServer(FIXTURES_DIR):
+            results = list(fan_out_search({"community": 1}, depth="province"))
+        assert len(results) == 1
+        assert len(results[0][1]["features"]) == 8
+
+    def test_invalid_depth(self):
+        with pytest.raises(ValueError):
+            list(fan_out_search({"community": 1}, depth="region"))
+        with pytest.raises(ValueError):
+            list(fan_out_search({"province": 14, "municipality": 48}, depth="province"))
+        with pytest.raises(ValueError):
+            list(fan_out_search({"municipality": 48}))
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from sigpac_tools.cache import disable_cache
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.serve import SigpacService
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+REGISTRIES = json.loads((FIXTURES_DIR / "registries.json").read_text())
+
+
+@pytest.fixture(scope="module")
+def service():
+    with MockSigpacServer(FIXTURES_DIR / "sigpac") as sigpac:
+        service = SigpacService(max_workers=4)
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(service.start("127.0.0.1", 0))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        host, port = server.sockets[0].getsockname()[:2]
+        yield f"http://{host}:{port}", service, sigpac
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        service.close()
+        disable_cache()
+
+
+class TestSigpacService:
+    def test_health(self, service):
+        url, _, _ = service
+        assert requests.get(f"{url}/health").json() == {"status": "ok"}
+
+    def test_search(self, service):
+        url, _, _ = service
+        response = requests.get(f"{url}/search", params={"community": 1})
+        assert response.status_code == 200
+        assert len(response.json()["features"]) == 8
+
+    def test_get_metadata(self, service):
+        url, _, _ = service
+        params = {
+            "layer": "parcela",
+            "province": 14,
+            "municipality": 48,
+            "polygon": 5,
+            "parcel": 1,
+        }
+        response = requests.get(f"{url}/get-metadata", params=params)
+        assert response.json()["parcelaInfo"]["referencia_cat"] == REGISTRIES[0]
+
+    def test_geometry(self, service):
+        url, _, _ = service
+        params = {"layer": "recinto", "lat": 37.384, "lon": -4.98, "reference": 1}
+        response = requests.get(f"{url}/geometry", params=params)
+        assert response.json()["type"] == "Polygon"
+
+    def test_find_uses_shared_caches(self, service):
+        url, _, sigpac = service
+        first = requests.get(f"{url}/find", params={"registry": REGISTRIES[1]})
+        served = sigpac.stats["requests"]
+        second = requests.get(f"{url}/find", params={"registry": REGISTRIES[1]})
+        assert first.json() == second.json()
+        assert sigpac.stats["requests"] == served
+
+    def test_errors(self, service):
+        url, _, _ = service
+        assert requests.get(f"{url}/find", params={"registry": "1"}).status_code == 400
+        assert (
+            requests.get(
+                f"{url}/find", params={"registry": "9872023VH5797S0001WX"}
+            ).status_code
+            == 501
+        )
+        assert (
+            requests.get(f"{url}/search", params={"province": "a"}).status_code == 400
+        )
+        assert requests.get(f"{url}/unknown").status_code == 404
+        assert requests.get(f"{url}/search").status_code == 400
+        assert (
+            requests.get(
+                f"{url}/get-metadata", params={"layer": "parcela", "province": 14}
+            ).status_code
+            == 400
+        )
+
+    def test_upstream_errors(self, service):
+        url, _, _ = service
+
+        def undecodable(command, params):
+            raise json.JSONDecodeError("Expecting value", "<html>", 0)
+
+        with patch("sigpac_tools.serve._run_command", undecodable):
+            response = requests.get(f"{url}/search", params={"community": 3})
+        assert response.status_code == 502
+
+        params = {
+            "layer": "parcela",
+            "province": 14,
+            "municipality": 48,
+            "polygon": 5,
+            "parcel": 999,
+        }
+        assert requests.get(f"{url}/get-metadata", params=params).status_code == 404
+
+    def test_metrics(self, service):
+        url, _, _ = service
+        requests.get(f"{url}/search", params={"community": 1})
+        text = requests.get(f"{url}/metrics").text
+        assert 'span="serve.request"' in text
+        assert "sigpac_cache_hit_ratio" in text
+
+    def test_coalescing(self, service):
+        _, svc, _ = service
+        calls = []
+        release = threading.Event()
+
+        def slow_command(command, params):
+            calls.append(command)
+            release.wait(5)
+            return {"command": command}
+
+        async def concurrent():
+            tasks = [
+                asyncio.ensure_future(svc.call("search", {"community": 2}))
+                for _ in range(5)
+            ]
+            await asyncio.sleep(0.1)
+            release.set()
+            return await asyncio.gather(*tasks)
+
+        with patch("sigpac_tools.serve._run_command", slow_command):
+            results = asyncio.run(concurrent())
+        assert calls == ["search"]
+        assert results == [{"command": "search"}] * 5
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,131 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.shard import (
+    ShardRunner,
+    merge,
+    partition,
+    shard_key,
+    shard_of,
+    work_units,
+)
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+
+UNITS = [
+    {"province": province, "municipality": municipality, "lat": 37.0, "lon": -4.0}
+    for province in (4, 14, 41)
+    for municipality in range(1, 30)
+]
+
+
+class TestPartition:
+    @pytest.mark.parametrize("by", ["province", "municipality", "tile"])
+    def test_every_unit_in_one_shard(self, by):
+        shards = partition(UNITS, 4, by)
+        assert sorted(map(json.dumps, sum(shards, []))) == sorted(
+            map(json.dumps, UNITS)
+        )
+
+    def test_deterministic(self):
+        assert partition(UNITS, 5) == partition(UNITS, 5)
+        reversed_shards = partition(reversed(UNITS), 5)
+        assert [sorted(map(json.dumps, s)) for s in partition(UNITS, 5)] == [
+            sorted(map(json.dumps, s)) for s in reversed_shards
+        ]
+        assert shard_of({"province": 14, "municipality": 48}, 8) == 0
+
+    def test_province_keeps_municipalities_together(self):
+        shards = partition(UNITS, 3, "province")
+        for province in (4, 14, 41):
+            assert sum(any(u["province"] == province for u in s) for s in shards) == 1
+
+    def test_tile_key(self):
+        assert shard_key({"lat": 37.384, "lon": -4.98}, "tile") == (15930, 20057)
+
+    def test_invalid_key(self):
+        with pytest.raises(KeyError):
+            shard_of(UNITS[0], 2, "polygon")
+
+
+class TestWorkUnits:
+    def test_provinces(self):
+        units = work_units(1, "province")
+        assert [unit["province"] for unit in units] == [4, 11, 14, 18, 21, 23, 29, 41]
+
+    def test_municipalities(self, tmp_path):
+        shutil.copytree(FIXTURES_DIR, tmp_path, dirs_exist_ok=True)
+        path = (
+            tmp_path / "fega" / "serviciosvisorsigpac" / "query" / "municipios" / "14"
+        )
+        municipalities = json.loads(path.read_text())
+        # The items of the SIGPAC lists are identified by "codigo", their "id" is not the code
+        for feature in municipalities["features"]:
+            feature["properties"]["id"] += 1000
+        path.write_text(json.dumps(municipalities))
+
+        with MockSigpacServer(tmp_path):
+            units = work_units(1)
+        assert {unit["province"] for unit in units} == {14}
+        assert {"municipality", "lat", "lon"} <= set(units[0])
+        assert [unit["municipality"] for unit in units] == [
+            feature["properties"]["codigo"] for feature in municipalities["features"]
+        ]
+
+    def test_invalid_community(self):
+        with pytest.raises(KeyError):
+            work_units(99)
+
+
+class TestShardRunner:
+    def test_run_and_merge(self, tmp_path):
+        for shard in range(3):
+            ShardRunner(tmp_path, shard, 3).run(UNITS, lambda u: u["municipality"])
+        records = merge(tmp_path, tmp_path / "merged.jsonl")
+        assert len(records) == len(UNITS)
+        assert all(r["result"] == r["unit"]["municipality"] for r in records)
+        assert len((tmp_path / "merged.jsonl").read_text().splitlines()) == len(UNITS)
+
+    def test_resume(self, tmp_path):
+        runner = ShardRunner(tmp_path, 0, 2)
+        calls = []
+
+        def process(unit):
+            calls.append(unit)
+            if len(calls) == 3:
+                raise RuntimeError("Service unavailable")
+            return 1
+
+        first = runner.run(UNITS, process)
+        assert first["failed"] == 1
+        calls.clear()
+        second = runner.run(UNITS, process)
+        assert second == {"processed": 1, "skipped": first["processed"], "failed": 0}
+        assert len(calls) == 1
+
+    def test_incomplete_line(self, tmp_path):
+        runner = ShardRunner(tmp_path, 0, 1)
+        runner.run(UNITS[:2], lambda unit: 1)
+        with open(runner.path, "a") as f:
+            f.write('{"unit": {"prov')
+        summary = runner.run(UNITS[:3], lambda unit: 2)
+        assert summary == {"processed": 1, "skipped": 2, "failed": 0}
+        assert len(merge(tmp_path)) == 3
+
+    def test_missing_shard(self, tmp_path):
+        ShardRunner(tmp_path, 0, 2).run(UNITS, lambda unit: 1)
+        with pytest.raises(ValueError, match="Missing shards"):
+            merge(tmp_path)
+        assert merge(tmp_path, partial=True)
+
+    def test_invalid_shard(self, tmp_path):
+        with pytest.raises(ValueError):
+            ShardRunner(tmp_path, 2, 2)
+
+
+if __name__ == "__main__":
+    pytest.main()
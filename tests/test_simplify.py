@@ -0,0 +1,104 @@
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from sigpac_tools.locate import geometry_from_coords
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.pipeline import geometries_from_coords
+from sigpac_tools.simplify import simplify_geometry, simplify_ring, vertex_owners
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "sigpac"
+TILE = json.loads(
+    (
+        FIXTURES_DIR
+        / "vectorsdg"
+        / "vector"
+        / "recinto@3857"
+        / "15.15930.20057.geojson"
+    ).read_text()
+)
+
+
+@pytest.fixture(scope="module")
+def server():
+    with MockSigpacServer(FIXTURES_DIR) as server:
+        yield server
+
+
+class TestSimplifyRing:
+    def test_removes_collinear_positions(self):
+        ring = [[0, 0], [5, 0], [10, 0], [10, 5], [10, 10], [0, 10], [0, 0]]
+        assert simplify_ring(ring, 0.1) == [
+            [0, 0],
+            [10, 0],
+            [10, 10],
+            [0, 10],
+            [0, 0],
+        ]
+
+    def test_keeps_positions_over_tolerance(self):
+        ring = [[0, 0], [5, 1], [10, 0], [10, 10], [0, 10], [0, 0]]
+        assert [5, 1] in simplify_ring(ring, 0.5)
+        assert [5, 1] not in simplify_ring(ring, 2)
+
+    def test_small_rings_are_unchanged(self):
+        ring = [[0, 0], [1, 0], [0, 1], [0, 0]]
+        assert simplify_ring(ring, 100) == ring
+
+    def test_line(self):
+        line = [[0, 0], [1, 0.01], [2, 0], [3, 0]]
+        assert simplify_ring(line, 0.1) == [[0, 0], [3, 0]]
+
+
+class TestSharedBorders:
+    @pytest.mark.parametrize("tolerance", [0.5, 2, 10])
+    def test_neighbours_keep_the_same_vertices(self, tolerance):
+        owners = vertex_owners(TILE["features"])
+        simplified = copy.deepcopy(TILE["features"])
+        for feature in simplified:
+            simplify_geometry(feature["geometry"], tolerance, owners)
+
+        kept = vertex_owners(simplified)
+        assert sum(map(len, kept)) < sum(map(len, owners))
+        # A vertex of a shared border is either kept by every feature sharing it or by none
+        assert all(features == owners[vertex] for vertex, features in kept.items())
+
+    def test_rings_stay_closed(self):
+        owners = vertex_owners(TILE["features"])
+        for feature in copy.deepcopy(TILE["features"]):
+            for ring in simplify_geometry(feature["geometry"], 10, owners)[
+                "coordinates"
+            ]:
+                assert ring[0] == ring[-1] and len(ring) >= 4
+
+
+class TestOutputTransforms:
+    def test_geometry_from_coords(self, server):
+        full = geometry_from_coords("recinto", 37.384, -4.98, 2)
+        simplified = geometry_from_coords(
+            "recinto", 37.384, -4.98, 2, tolerance=2, precision=6
+        )
+        assert len(simplified["coordinates"][0]) < len(full["coordinates"][0])
+        assert all(round(c, 6) == c for p in simplified["coordinates"][0] for c in p)
+
+    def test_quantization(self, server):
+        full = geometry_from_coords("parcela", 37.384, -4.98, 1)
+        rounded = geometry_from_coords("parcela", 37.384, -4.98, 1, precision=5)
+        assert rounded["coordinates"] == [
+            [[round(c, 5) for c in p] for p in ring] for ring in full["coordinates"]
+        ]
+
+    def test_pipeline_matches_geometry_from_coords(self, server):
+        expected = geometry_from_coords(
+            "parcela", 37.384, -4.98, 3, tolerance=2, precision=6
+        )
+        results = geometries_from_coords(
+            "parcela", [(37.384, -4.98, 3)], 1, tolerance=2, precision=6
+        )
+        assert results == [expected]
+
+
+if __name__ == "__main__":
+    pytest.main()
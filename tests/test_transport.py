@@ -0,0 +1,257 @@
+import json
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch, Mock
+
+import pytest
+
+from sigpac_tools import transport
+from sigpac_tools.mock_server import MockSigpacServer
+from sigpac_tools.transport import (
+    PriorityScheduler,
+    available_json_decoders,
+    decode_json,
+    fetch,
+    get_http_client,
+    get_json,
+    get_json_decoder,
+    iter_array_items,
+    iter_json_items,
+    priority,
+    set_concurrency,
+    set_http_client,
+    set_json_decoder,
+    stream_content,
+)
+
+TILE_FIXTURE = (
+    Path(__file__).parent
+    / "fixtures"
+    / "sigpac"
+    / "vectorsdg"
+    / "vector"
+    / "recinto@3857"
+    / "15.15930.20057.geojson"
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_decoder():
+    yield
+    set_json_decoder("auto")
+    set_http_client("requests")
+    set_concurrency(None)
+
+
+class TestJsonDecoders:
+    def test_stdlib_always_available(self):
+        assert "json" in available_json_decoders()
+
+    @pytest.mark.parametrize("decoder", available_json_decoders())
+    def test_decoders_agree_on_fixture(self, decoder):
+        content = TILE_FIXTURE.read_bytes()
+        set_json_decoder(decoder)
+        assert decode_json(content) == json.loads(content)
+
+    def test_custom_decoder(self):
+        decoder = Mock(return_value={"features": []})
+        set_json_decoder(decoder)
+        assert decode_json(b"{}") == {"features": []}
+        decoder.assert_called_once_with(b"{}")
+
+    def test_unsupported_decoder(self):
+        with pytest.raises(KeyError):
+            set_json_decoder("yaml")
+
+    def test_auto_falls_back_to_stdlib(self):
+        def missing():
+            raise ImportError
+
+        with patch.dict(
+            transport.JSON_DECODERS, {"orjson": missing, "msgspec": missing}
+        ):
+            set_json_decoder("auto")
+            assert get_json_decoder() is json.loads
+
+
+class TestGetJson:
+    @patch("requests.get")
+    def test_decodes_raw_content(self, mock_get):
+        mock_response = Mock()
+        mock_response.content = b'{"type": "FeatureCollection", "features": []}'
+        mock_get.return_value = mock_response
+
+        assert get_json("http://localhost/tile") == {
+            "type": "FeatureCollection",
+            "features": [],
+        }
+        mock_get.assert_called_once_with("http://localhost/tile")
+        mock_response.json.assert_not_called()
+
+
+class TestHttpClients:
+    def test_custom_client(self):
+        response = Mock(status_code=200, content=b"{}", headers={"ETag": '"1"'})
+        client = Mock(return_value=response)
+        set_http_client(client)
+        assert get_http_client() is client
+        assert fetch("http://localhost/tile") == (200, b"{}", {"ETag": '"1"'})
+        client.assert_called_once_with("http://localhost/tile")
+
+    def test_pooled_requests(self):
+        set_http_client("requests", connections=2)
+        with MockSigpacServer(TILE_FIXTURE.parents[3]) as server:
+            status, content, _ = fetch(
+                f"{server.url}/vectorsdg/vector/recinto@3857/15.15930.20057.geojson"
+            )
+        assert status == 200
+        assert content == TILE_FIXTURE.read_bytes()
+
+    def test_unsupported_client(self):
+        with pytest.raises(KeyError):
+            set_http_client("curl")
+
+    def test_missing_library(self):
+        def missing(**options):
+            raise ImportError
+
+        with patch.dict(transport.HTTP_CLIENTS, {"httpx": missing}):
+            with pytest.raises(ImportError):
+                set_http_client("httpx")
+
+
+class TestStreaming:
+    @pytest.mark.parametrize("size", [1, 7, 4096, 1 << 24])
+    def test_items_across_chunks(self, size):
+        content = TILE_FIXTURE.read_bytes()
+        chunks = [content[i : i + size] for i in range(0, len(content), size)]
+        assert list(iter_array_items(chunks)) == json.loads(content)["features"]
+
+    def test_only_the_top_level_array(self):
+        content = json.dumps(
+            {
+                "type": "features",
+                "nested": {"features": [1]},
+                "text": 'a"]}{',
+                "features": [{"a": "}"}, {"b": [{}]}],
+                "after": 1,
+            }
+        ).encode()
+        chunks = [content[i : i + 3] for i in range(0, len(content), 3)]
+        assert list(iter_array_items(chunks)) == [{"a": "}"}, {"b": [{}]}]
+
+    def test_no_array(self):
+        assert list(iter_array_items([b"null"])) == []
+        assert list(iter_array_items([b'{"features": []}'])) == []
+
+    def test_truncated(self):
+        with pytest.raises(ValueError):
+            list(iter_array_items([b'{"features": [{"a": 1}, {"b"']))
+
+    def test_stops_early(self):
+        with MockSigpacServer(TILE_FIXTURE.parents[3]) as server:
+            url = f"{server.url}/vectorsdg/vector/recinto@3857/15.15930.20057.geojson"
+            read = []
+            chunks = stream_content(url, chunk_size=1024)
+            items = iter_array_items(read.append(chunk) or chunk for chunk in chunks)
+            first = next(items)
+            chunks.close()
+            assert first == json.loads(TILE_FIXTURE.read_bytes())["features"][0]
+            assert sum(map(len, read)) < TILE_FIXTURE.stat().st_size / 10
+
+            assert (
+                list(iter_json_items(url))
+                == json.loads(TILE_FIXTURE.read_bytes())["features"]
+            )
+
+    def test_whole_bodies(self):
+        class Source:
+            def lookup(self, url):
+                return TILE_FIXTURE.read_bytes() if url == "tile" else None
+
+        source = Source()
+        transport.add_source(source)
+        try:
+            with patch("sigpac_tools.transport.iter_array_items") as scan:
+                features = list(iter_json_items("tile"))
+            scan.assert_not_called()
+        finally:
+            transport.remove_source(source)
+        assert features == json.loads(TILE_FIXTURE.read_bytes())["features"]
+
+
+class TestPriorityScheduling:
+    def test_concurrency_limit(self):
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        def client(url, headers=None):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return Mock(status_code=200, content=b"{}", headers={})
+
+        set_http_client(client)
+        set_concurrency(2)
+        threads = [
+            threading.Thread(target=fetch, args=("http://localhost/tile",))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert peak[0] == 2
+
+    def test_weighted_fair_order(self):
+        scheduler = PriorityScheduler(1, {"interactive": 8, "bulk": 1})
+        scheduler.acquire("interactive")
+        order, lock = [], threading.Lock()
+
+        def request(name):
+            with scheduler.slot(name):
+                with lock:
+                    order.append(name)
+
+        threads = []
+        for name in ["bulk"] * 10 + ["interactive"] * 10:
+            threads.append(threading.Thread(target=request, args=(name,)))
+            threads[-1].start()
+            while sum(map(len, scheduler._queues.values())) < len(threads):
+                time.sleep(0.001)
+        scheduler.release()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(order) == sorted(["bulk"] * 10 + ["interactive"] * 10)
+        assert order[:10].count("interactive") >= 8
+        assert "bulk" in order[:10]
+
+    def test_priority_context(self):
+        seen = []
+        scheduler = PriorityScheduler(1, {"interactive": 1, "bulk": 1})
+        scheduler.acquire = lambda name: seen.append(name)
+        scheduler.release = lambda: None
+        set_http_client(
+            Mock(return_value=Mock(status_code=200, content=b"", headers={}))
+        )
+        with patch.object(transport, "_scheduler", scheduler):
+            fetch("http://localhost/tile")
+            with priority("bulk"):
+                fetch("http://localhost/tile")
+        assert seen == ["interactive", "bulk"]
+
+    def test_invalid_configuration(self):
+        with pytest.raises(ValueError):
+            set_concurrency(0)
+        with pytest.raises(ValueError):
+            set_concurrency(4, {"bulk": 0})
+        with pytest.raises(KeyError):
+            PriorityScheduler(1, {"bulk": 1}).acquire("interactive")
+
+
+if __name__ == "__main__":
+    pytest.main()
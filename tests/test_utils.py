@@ -1,8 +1,12 @@
+from array import array
+
 import pytest
 
 from sigpac_tools.utils import (
     lng_lat_to_tile,
+    lng_lat_to_web_mercator,
     transform_coords,
+    transform_flat,
     find_community,
     read_cadastral_registry,
     validate_cadastral_registry,
@@ -26,6 +30,19 @@ class TestLngLatToTile:
         assert lng_lat_to_tile(lng, lat, zoom) == expected
 
 
+class TestLngLatToWebMercator:
+    def test_matches_pyproj(self):
+        import pyproj
+
+        transformer = pyproj.Transformer.from_crs(
+            "epsg:4326", "epsg:3857", always_xy=True
+        )
+        for lng, lat in [(0, 0), (-4.98, 37.384), (-3.7038, 40.4168)]:
+            assert lng_lat_to_web_mercator(lng, lat) == pytest.approx(
+                transformer.transform(lng, lat), abs=1e-6
+            )
+
+
 class TestTransformCoords:
     def test_transform_coordinates(self):
         feature = {
@@ -43,6 +60,18 @@ class TestTransformCoords:
         assert abs(round(coords[0], 6) - round(expected_coords[0], 6)) < 0.05
         assert abs(round(coords[1], 6) - round(expected_coords[1], 6)) < 0.05
 
+    def test_transform_flat(self):
+        positions = [[1492237.0, 6894685.0], [-554371.0, 4493000.0]]
+        feature = {"geometry": {"coordinates": [[list(p) for p in positions]]}}
+        transform_coords(feature)
+
+        coords = array("d", [c for position in positions for c in position])
+        transform_flat(coords)
+
+        assert coords.tolist() == [
+            c for position in feature["geometry"]["coordinates"][0] for c in position
+        ]
+
 
 class TestFindCommunity:
     def test_existing_province_id(self):